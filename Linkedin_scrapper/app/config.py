@@ -7,10 +7,39 @@ class Settings(BaseSettings):
     # Anthropic
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "*******")
     
+    # LLM enrichment (gender / age): parallel calls, rate limits and retries on 429/5xx
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "claude-sonnet-4-5-20250929")
+    LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", "8"))
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "50"))
+    LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    LLM_MAX_BACKOFF: float = float(os.getenv("LLM_MAX_BACKOFF", "30"))
+    # Disk cache of LLM responses: off | on | record | replay (cache only, for offline runs)
+    LLM_CACHE_MODE: str = os.getenv("LLM_CACHE_MODE", "on")
+    LLM_CACHE_TTL: float = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+    LLM_CACHE_MAX_MB: float = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+    # Names classified per gender detection call
+    LLM_GENDER_BATCH_SIZE: int = int(os.getenv("LLM_GENDER_BATCH_SIZE", "40"))
+    # First-name gender cache: minimum share of agreeing observations to skip the LLM
+    GENDER_CACHE_MIN_CONFIDENCE: float = float(os.getenv("GENDER_CACHE_MIN_CONFIDENCE", "0.9"))
+    # ... and minimum number of observations (a single LLM answer is not trusted on its own)
+    GENDER_CACHE_MIN_SAMPLES: int = int(os.getenv("GENDER_CACHE_MIN_SAMPLES", "2"))
+    # Local age rules: max disagreement (years) between education entries before asking the LLM
+    AGE_RULES_MAX_SPREAD: int = int(os.getenv("AGE_RULES_MAX_SPREAD", "3"))
+    
     # LinkedIn Credentials
     LINKEDIN_EMAIL: str = os.getenv("LINKEDIN_EMAIL", "*********@gmail.com")
     LINKEDIN_PASSWORD: str = os.getenv("LINKEDIN_PASSWORD", "*********")
     
+    # Browser tabs used at once to visit profiles (capped by LINKEDIN_PAGE_POOL_SIZE on the MCP server)
+    LINKEDIN_PAGE_CONCURRENCY: int = int(os.getenv("LINKEDIN_PAGE_CONCURRENCY", "4"))
+    
+    # MCP server pool: processes started with the app (0 = one server per scrape, as before)
+    MCP_POOL_SIZE: int = int(os.getenv("MCP_POOL_SIZE", "1"))
+    MCP_HEALTH_INTERVAL: float = float(os.getenv("MCP_HEALTH_INTERVAL", "30"))
+    MCP_PING_TIMEOUT: float = float(os.getenv("MCP_PING_TIMEOUT", "10"))
+    MCP_STARTUP_TIMEOUT: float = float(os.getenv("MCP_STARTUP_TIMEOUT", "60"))
+    
     # Paths
     BASE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     MCP_SERVER_SCRIPT: str = os.path.join(BASE_DIR, "linkedin_mcp_server.py")
@@ -19,5 +48,6 @@ class Settings(BaseSettings):
     # Output
     JSON_OUTPUT_FILE: str = os.path.join(BASE_DIR, "linkedin_profiles_age.json")
     DB_FILE: str = os.path.join(BASE_DIR, "linkedin_profiles.db")
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, "llm_cache.db"))
 
 settings = Settings()
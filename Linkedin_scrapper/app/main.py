@@ -1,7 +1,10 @@
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from app.routes import scraper, filter, agent, email_campaign
+from app.services.llm_client import llm_client
+from app.services.mcp_pool import mcp_pool
 import logging
 
 # Configure logging
@@ -10,7 +13,15 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-app = FastAPI(title="LinkedIn MCP Scraper")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the MCP servers once; workflows lease them instead of spawning their own
+    await mcp_pool.start()
+    yield
+    await mcp_pool.stop()
+    await llm_client.close()
+
+app = FastAPI(title="LinkedIn MCP Scraper", lifespan=lifespan)
 
 # Include routers
 app.include_router(scraper.router)
@@ -8,6 +8,7 @@ from app.utils.locations import AVAILABLE_LOCATIONS
 import os
 
 from app.services.log_service import LogCollector
+from app.services.mcp_pool import mcp_pool
 
 router = APIRouter()
 
@@ -22,6 +23,11 @@ async def get_logs():
     """Get current logs"""
     return {"logs": LogCollector.get_logs()}
 
+@router.get("/mcp/status")
+async def mcp_status():
+    """Health of the pooled MCP servers (ready, uptime, restarts, last ping)"""
+    return mcp_pool.status()
+
 @router.post("/scrape/linkedin")
 async def scrape_linkedin(request: ScrapeRequest):
     """
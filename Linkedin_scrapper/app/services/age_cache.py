@@ -0,0 +1,62 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.age_rules import normalize
+
+logger = logging.getLogger(__name__)
+
+
+def education_fingerprint(education: List[Dict[str, Any]], current_year: Optional[int] = None) -> str:
+    """
+    Stable hash of an education list: normalized (school, degree, date_range) triples, in any order.
+    The current year is part of it since the estimated age changes every year.
+    """
+    entries = sorted(
+        [normalize(edu.get("school")).strip(), normalize(edu.get("degree")).strip(),
+         normalize(edu.get("date_range")).strip()]
+        for edu in education or []
+    )
+    payload = json.dumps([current_year or datetime.now().year, entries], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AgeCache:
+    """Age estimates by education fingerprint, so identical education lists are sent to the LLM only once"""
+
+    def __init__(self, db_path: str = settings.DB_FILE):
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS age_estimates (
+                    fingerprint TEXT PRIMARY KEY,
+                    estimated_age INTEGER,
+                    source TEXT,
+                    created_at REAL
+                )
+            """)
+            conn.commit()
+
+    def get(self, fingerprint: str) -> Tuple[bool, Optional[int]]:
+        """(found, age); a cached None means the LLM could not estimate this list either"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT estimated_age FROM age_estimates WHERE fingerprint = ?",
+                               (fingerprint,)).fetchone()
+        return (True, row[0]) if row else (False, None)
+
+    def put(self, fingerprint: str, age: Optional[int], source: str = "llm"):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT OR REPLACE INTO age_estimates (fingerprint, estimated_age, source, created_at) "
+                         "VALUES (?, ?, ?, ?)", (fingerprint, age, source, time.time()))
+            conn.commit()
+
+
+age_cache = AgeCache()
@@ -4,17 +4,16 @@ import csv
 import os
 import uuid
 from typing import Any, Dict, List, Optional
-import anthropic
-from app.config import settings
 from app.services.db_service import db_service
 from app.models.request_models import AdvancedFilterRequest
+from app.services.llm_client import llm_client
 from app.services.log_service import LogCollector
 
 logger = logging.getLogger(__name__)
 
 class AgentService:
     def __init__(self):
-        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self.llm = llm_client
         self.tools = [
             {
                 "name": "filter_profiles_tool",
@@ -128,12 +127,7 @@ class AgentService:
         
         try:
             for turn in range(5): # Max 5 turns to prevent infinite loops
-                response = self.client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=4096,
-                    tools=self.tools,
-                    messages=messages
-                )
+                response = await self.llm.create(messages, max_tokens=4096, tools=self.tools)
                 
                 has_tool_use = False
                 tool_results_for_claude = []
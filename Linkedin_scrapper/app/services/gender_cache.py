@@ -0,0 +1,205 @@
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Titles and prefixes skipped before the first name ("Dr. Salma ...", "Ing Youssef ...")
+NAME_PREFIXES = {"dr", "pr", "prof", "mr", "mrs", "ms", "mme", "mlle", "ing", "eng", "sir", "hajj", "el", "al"}
+
+
+def normalize_first_name(name: Optional[str]) -> Optional[str]:
+    """'Dr. Íñigo-Luis Martín' -> 'inigo-luis'. None when no usable first name is found."""
+    if not name:
+        return None
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    for token in re.split(r"[\s,;|/()]+", ascii_name):
+        token = re.sub(r"[^a-z-]", "", token).strip("-")
+        if len(token) > 1 and token not in NAME_PREFIXES:
+            return token
+    return None
+
+
+class GenderCache:
+    """
+    Normalized first name -> gender, learned from LLM answers and saved profiles.
+
+    Each entry counts how often the name was seen as Male / Female; the majority is the
+    cached gender and its share the confidence. Only entries seen at least
+    GENDER_CACHE_MIN_SAMPLES times with a confidence at or above GENDER_CACHE_MIN_CONFIDENCE
+    are served, so ambiguous and unconfirmed names keep going to the LLM.
+    """
+
+    def __init__(self, db_path: str = settings.DB_FILE):
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS first_name_gender (
+                    first_name TEXT PRIMARY KEY,
+                    male INTEGER NOT NULL DEFAULT 0,
+                    female INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    source TEXT,
+                    updated_at REAL
+                )
+            """)
+            conn.commit()
+
+    @staticmethod
+    def _entry(male: int, female: int) -> Tuple[str, float]:
+        gender = "Male" if male >= female else "Female"
+        return gender, max(male, female) / (male + female)
+
+    @staticmethod
+    def _servable(confidence: float, samples: int) -> bool:
+        return (confidence >= settings.GENDER_CACHE_MIN_CONFIDENCE
+                and samples >= settings.GENDER_CACHE_MIN_SAMPLES)
+
+    def lookup_many(self, names: Iterable[Optional[str]]) -> Dict[str, str]:
+        """{first_name: gender} for the cached, confirmed first names among `names` (counts a hit for each)"""
+        first_names = sorted({fn for fn in map(normalize_first_name, names) if fn})
+        if not first_names:
+            return {}
+        placeholders = ",".join("?" * len(first_names))
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                f"SELECT first_name, male, female FROM first_name_gender WHERE first_name IN ({placeholders})",
+                first_names
+            ).fetchall()
+            found = {}
+            for first_name, male, female in rows:
+                if male + female == 0:
+                    continue
+                gender, confidence = self._entry(male, female)
+                if self._servable(confidence, male + female):
+                    found[first_name] = gender
+            if found:
+                conn.executemany("UPDATE first_name_gender SET hits = hits + 1 WHERE first_name = ?",
+                                 [(fn,) for fn in found])
+            conn.commit()
+        return found
+
+    def record_many(self, observations: Iterable[Tuple[Optional[str], str]], source: str = "llm"):
+        """Add (name, gender) observations; Unknown answers and names without a first name are ignored"""
+        rows = []
+        for name, gender in observations:
+            first_name = normalize_first_name(name)
+            if first_name and gender in ("Male", "Female"):
+                rows.append((first_name, int(gender == "Male"), int(gender == "Female"), source, time.time()))
+        if not rows:
+            return
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany("""
+                INSERT INTO first_name_gender (first_name, male, female, source, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(first_name) DO UPDATE SET
+                    male = male + excluded.male,
+                    female = female + excluded.female,
+                    source = excluded.source,
+                    updated_at = excluded.updated_at
+            """, rows)
+            conn.commit()
+
+    def warm_from_profiles(self) -> int:
+        """
+        Seed the cache from the genders already stored in `profiles`.
+        Only first names not cached yet are added, so warming twice does not double count.
+        """
+        counts: Dict[str, list] = {}
+        with sqlite3.connect(self.db_path) as conn:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profiles'").fetchone():
+                return 0
+            for name, gender in conn.execute(
+                "SELECT name, gender FROM profiles WHERE gender IN ('Male', 'Female')"
+            ):
+                first_name = normalize_first_name(name)
+                if first_name:
+                    entry = counts.setdefault(first_name, [0, 0])
+                    entry[gender == "Female"] += 1
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO first_name_gender (first_name, male, female, source, updated_at)
+                VALUES (?, ?, ?, 'profiles', ?)
+            """, [(fn, male, female, time.time()) for fn, (male, female) in counts.items()])
+            conn.commit()
+            return conn.total_changes - before
+
+    def evict(self, below: float, max_samples: Optional[int] = None, min_samples: int = 0) -> int:
+        """
+        Delete entries whose confidence is below `below` or seen fewer than `min_samples` times
+        (optionally only those seen at most `max_samples` times)
+        """
+        query = """
+            DELETE FROM first_name_gender
+            WHERE male + female = 0
+               OR ((CAST(MAX(male, female) AS REAL) / (male + female) < ? OR male + female < ?)
+        """
+        params: list = [below, min_samples]
+        if max_samples is not None:
+            query += " AND male + female <= ?"
+            params.append(max_samples)
+        with sqlite3.connect(self.db_path) as conn:
+            deleted = conn.execute(query + ")", params).rowcount
+            conn.commit()
+        return deleted
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("SELECT first_name, male, female, hits FROM first_name_gender").fetchall()
+        entries = [(fn, *self._entry(male, female), male + female, hits)
+                   for fn, male, female, hits in rows if male + female]
+        served = [e for e in entries if self._servable(e[2], e[3])]
+        return {
+            "entries": len(entries),
+            "served": len(served),
+            "low_confidence": sum(1 for e in entries if e[2] < settings.GENDER_CACHE_MIN_CONFIDENCE),
+            "unconfirmed": sum(1 for e in entries if e[3] < settings.GENDER_CACHE_MIN_SAMPLES),
+            "male": sum(1 for e in served if e[1] == "Male"),
+            "female": sum(1 for e in served if e[1] == "Female"),
+            "total_hits": sum(e[4] for e in entries),
+            "min_confidence": settings.GENDER_CACHE_MIN_CONFIDENCE,
+            "min_samples": settings.GENDER_CACHE_MIN_SAMPLES,
+            "top": [{"first_name": fn, "gender": gender, "confidence": round(confidence, 3),
+                     "samples": samples, "hits": hits}
+                    for fn, gender, confidence, samples, hits in sorted(entries, key=lambda e: -e[4])[:top]],
+        }
+
+
+gender_cache = GenderCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="First-name gender cache (python -m app.services.gender_cache)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("warm", help="seed the cache from the genders stored in profiles")
+    stats = sub.add_parser("stats", help="print cache statistics as JSON")
+    stats.add_argument("--top", type=int, default=10, help="most used first names to list")
+    evict = sub.add_parser("evict", help="delete low-confidence entries")
+    evict.add_argument("--below", type=float, default=settings.GENDER_CACHE_MIN_CONFIDENCE,
+                       help="confidence threshold (default: GENDER_CACHE_MIN_CONFIDENCE)")
+    evict.add_argument("--max-samples", type=int, default=None,
+                       help="only evict entries seen at most this many times")
+    evict.add_argument("--min-samples", type=int, default=settings.GENDER_CACHE_MIN_SAMPLES,
+                       help="also evict entries seen fewer times (default: GENDER_CACHE_MIN_SAMPLES, 0 keeps them)")
+    args = parser.parse_args()
+
+    if args.command == "warm":
+        print(f"✅ {gender_cache.warm_from_profiles()} first names added from profiles")
+    elif args.command == "stats":
+        print(json.dumps(gender_cache.stats(args.top), indent=2, ensure_ascii=False))
+    elif args.command == "evict":
+        print(f"🗑️ {gender_cache.evict(args.below, args.max_samples, args.min_samples)} entries evicted")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,23 @@ import json
 import logging
 import os
 import csv
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from urllib.parse import quote
 from datetime import datetime
 import sys
 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-
-import anthropic
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
 
 from app.config import settings
+from app.services.age_cache import age_cache, education_fingerprint
 from app.services.db_service import db_service
+from app.services.gender_cache import gender_cache, normalize_first_name
+from app.services.llm_client import llm_client
 from app.services.log_service import LogCollector
+from app.services.mcp_pool import mcp_pool
+from app.utils.age_rules import estimate_age_from_rules
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -54,6 +57,30 @@ def build_linkedin_search_url(keywords: str, location_id: str) -> str:
         f"&origin=FACETED_SEARCH"
     )
 
+# Structured output for batched gender classification: Claude is forced to call this tool
+GENDER_VALUES = ("Male", "Female", "Unknown")
+GENDER_BATCH_TOOL = {
+    "name": "record_genders",
+    "description": "Record the gender detected for every person of the list.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "gender": {"type": "string", "enum": list(GENDER_VALUES)}
+                    },
+                    "required": ["id", "gender"]
+                }
+            }
+        },
+        "required": ["results"]
+    }
+}
+
 # ============================================================================
 # Data Model
 # ============================================================================
@@ -90,15 +117,20 @@ class LinkedInAutonomousAgent:
         self.password = linkedin_password
         self.session_id: Optional[str] = None
         self.collected_profiles: List[ProfileData] = []
-        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self.llm = llm_client
         self.tools = [] # Initialize tools list if needed, though not used directly in these methods
 
-    async def call_tool(self, mcp_session: ClientSession, tool_name: str, arguments: dict) -> dict:
-        """Call MCP tool and parse JSON response"""
+    async def call_tool(self, mcp_session: ClientSession, tool_name: str, arguments: dict,
+                        progress_callback=None) -> dict:
+        """
+        Call MCP tool and parse JSON response.
+        Errors reported by the server become {"success": False}; transport errors (server
+        process gone, stream closed) propagate so that mcp_pool health-checks the server.
+        """
         try:
-            result = await mcp_session.call_tool(tool_name, arguments=arguments)
+            result = await mcp_session.call_tool(tool_name, arguments=arguments, progress_callback=progress_callback)
             return json.loads(result.content[0].text)
-        except Exception as e:
+        except (McpError, ValueError, IndexError, AttributeError) as e:
             LogCollector.add(f"❌ Tool {tool_name} failed: {e}")
             return {"success": False, "error": str(e)}
 
@@ -110,43 +142,14 @@ class LinkedInAutonomousAgent:
             ]
             
             if image_url:
-                # Claude expects image data or a specific image block structure. 
-                # Since we have a URL, we might need to fetch it if we were sending base64, 
-                # but Claude 3.5 Sonnet supports image URLs in some contexts or we might need to just pass the URL as text if the model can browse (it can't here).
-                # However, the user request specifically asked to use `self.client.messages.create`.
-                # Standard Anthropic API for images usually requires base64. 
-                # BUT, if the previous code was sending a URL to Azure, Azure might have been downloading it.
-                # Let's check if we can just pass the URL in text for now, or if we should try to use the image block.
-                # The user prompt example showed `messages=messages` and `tools=self.tools`.
-                # For simplicity and robustness given I can't easily fetch/encode images here without more deps/async complexity in a sync client call (Anthropic client is sync by default unless AsyncAnthropic is used),
-                # I will pass the image URL in the text and ask Claude to infer from it if possible (unlikely without vision) OR just rely on the name if the image can't be processed.
-                # WAIT, the user said "Use always the Claude... response = self.client.messages.create(...)".
-                # I will stick to the text prompt with the name, and mention the image URL in text. 
-                # If I really need vision, I'd need to download and base64 encode. 
-                # Let's try to be safe and just use the name for now if image handling is complex, 
-                # OR better: The previous code sent `{"type": "image_url", "image_url": {"url": image_url}}`.
-                # Anthropic API supports `{"type": "image", "source": {"type": "base64", "media_type": ..., "data": ...}}`. It does NOT support remote URLs directly in the API yet (usually).
-                # Given I am using the standard `anthropic` library, I should probably just rely on the name to be safe, OR try to implement fetching.
-                # But `detect_gender` is `async`. The `anthropic` client I initialized is SYNC (`anthropic.Anthropic`).
-                # I should probably wrap the call or use `AsyncAnthropic`.
-                # The user code snippet `response = self.client.messages.create` suggests sync usage.
-                # But `detect_gender` is `async def`.
-                # I'll use the sync client inside the async function (it will block the loop briefly, but acceptable for this scale).
-                
-                # RE-READING USER REQUEST: "Use always the Claude ... response = self.client.messages.create ... so delete Azure"
-                # It doesn't explicitly say "support images via URL".
-                # I will pass the image URL in the text description so if the model has any knowledge (unlikely) or just to keep the prompt similar.
+                # The Messages API does not fetch remote image URLs: the URL is only mentioned in the prompt
                 user_content[0]["text"] += f" Image URL: {image_url}"
 
             messages = [
                 {"role": "user", "content": user_content}
             ]
 
-            response = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=4096,
-                messages=messages
-            )
+            response = await self.llm.create(messages, max_tokens=10)
             
             gender = response.content[0].text.strip().lower()
 
@@ -160,8 +163,94 @@ class LinkedInAutonomousAgent:
             LogCollector.add(f"Gender detection failed: {e}")
             return "Unknown"
 
-    async def estimate_age_from_education_llm(self, education_data: List[Dict[str, Any]]) -> Optional[int]:
-        """Use Azure OpenAI LLM to analyze education data and estimate age"""
+    @staticmethod
+    def parse_gender_batch(response, count: int) -> Dict[int, str]:
+        """Validated {id: gender} from a batch answer (tool call, or a JSON array in text as a fallback)"""
+        items = None
+        for block in response.content:
+            if block.type == "tool_use":
+                items = block.input.get("results")
+                break
+            if block.type == "text" and "[" in block.text:
+                try:
+                    items = json.loads(block.text[block.text.index("["):block.text.rindex("]") + 1])
+                except ValueError:
+                    pass
+        genders = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            item_id, gender = item.get("id"), str(item.get("gender", "")).capitalize()
+            if isinstance(item_id, int) and 0 <= item_id < count and gender in GENDER_VALUES:
+                genders[item_id] = gender
+        return genders
+
+    async def detect_genders_batch(self, names: List[Optional[str]]) -> List[str]:
+        """
+        Classify names from the first-name cache, then tens of names per LLM call for the rest.
+        Each uncached first name is asked once; names missing from an answer fall back to detect_gender.
+        """
+        first_names = [normalize_first_name(name) for name in names]
+        cached = await asyncio.to_thread(gender_cache.lookup_many, names)
+        genders: List[Optional[str]] = [cached.get(fn) for fn in first_names]
+
+        # One representative per uncached first name (names without one are sent as they are)
+        ask: List[Optional[str]] = []
+        asked: Dict[Any, int] = {}
+        for i, (name, first_name) in enumerate(zip(names, first_names)):
+            if name and genders[i] is None and (first_name or i) not in asked:
+                asked[first_name or i] = len(ask)
+                ask.append(name)
+        LogCollector.add(f"   🗂️ Gender cache: {sum(g is not None for g in genders)}/{len(names)} names cached, "
+                         f"{len(ask)} to ask")
+
+        answers = await self._classify_genders_llm(ask)
+        await asyncio.to_thread(gender_cache.record_many, list(zip(ask, answers)))
+        for i, first_name in enumerate(first_names):
+            if genders[i] is None and (first_name or i) in asked:
+                genders[i] = answers[asked[first_name or i]]
+        return [gender or "Unknown" for gender in genders]
+
+    async def _classify_genders_llm(self, names: List[str]) -> List[str]:
+        """Batched LLM classification of `names`, with per-name fallback"""
+        genders: List[Optional[str]] = [None] * len(names)
+        size = max(1, settings.LLM_GENDER_BATCH_SIZE)
+
+        async def classify(start: int):
+            chunk = names[start:start + size]
+            people = [{"id": i, "name": name} for i, name in enumerate(chunk) if name]
+            if not people:
+                return
+            prompt = (
+                "Detect the gender of each person below from their name. Answer Unknown when the "
+                "name does not tell. Call record_genders with one result per id.\n"
+                + json.dumps(people, ensure_ascii=False)
+            )
+            try:
+                response = await self.llm.create(
+                    [{"role": "user", "content": prompt}],
+                    max_tokens=30 * len(people) + 100,
+                    tools=[GENDER_BATCH_TOOL],
+                    tool_choice={"type": "tool", "name": GENDER_BATCH_TOOL["name"]}
+                )
+                for i, gender in self.parse_gender_batch(response, len(chunk)).items():
+                    genders[start + i] = gender
+            except Exception as e:
+                LogCollector.add(f"⚠️ Batch gender detection failed ({len(people)} names): {e}")
+
+        await asyncio.gather(*(classify(start) for start in range(0, len(names), size)))
+
+        missing = [i for i, name in enumerate(names) if name and genders[i] is None]
+        if missing:
+            LogCollector.add(f"⚠️ {len(missing)} names missing from batch answers, classifying them one by one")
+            fallback = await asyncio.gather(*(self.detect_gender(names[i], None) for i in missing))
+            for i, gender in zip(missing, fallback):
+                genders[i] = gender
+        return [gender or "Unknown" for gender in genders]
+
+    async def estimate_age_from_education_llm(self, education_data: List[Dict[str, Any]],
+                                              raise_errors: bool = False) -> Optional[int]:
+        """Use Claude to analyze education data and estimate age (None when it answers Unknown)"""
         if not education_data:
             return None
 
@@ -188,15 +277,7 @@ Based on this education history, estimate the person's current age. Consider:
 
 Respond with ONLY a number representing the estimated age (e.g., 28). If you cannot estimate, respond with "Unknown"."""
 
-            response = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=4096,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-
-            age_text = response.content[0].text.strip()
+            age_text = await self.llm.complete(prompt, max_tokens=10)
 
             try:
                 age = int(age_text)
@@ -209,8 +290,36 @@ Respond with ONLY a number representing the estimated age (e.g., 28). If you can
 
         except Exception as e:
             LogCollector.add(f"Age estimation via LLM failed: {e}")
+            if raise_errors:
+                raise
             return None
 
+    async def estimate_age(self, education_data: List[Dict[str, Any]]) -> Tuple[Optional[int], str]:
+        """
+        Age from the local rules (microseconds); only ambiguous education lists go to the LLM,
+        and its answers are cached by education fingerprint.
+
+        Returns:
+            (age, source) with source "rules", "cache" or "llm".
+        """
+        age, reason = estimate_age_from_rules(education_data, max_spread=settings.AGE_RULES_MAX_SPREAD)
+        if age is not None or not education_data:
+            return age, "rules"
+
+        fingerprint = education_fingerprint(education_data)
+        found, age = await asyncio.to_thread(age_cache.get, fingerprint)
+        if found:
+            return age, "cache"
+
+        LogCollector.add(f"   Ambiguous education ({reason}), asking the LLM...")
+        try:
+            age = await self.estimate_age_from_education_llm(education_data, raise_errors=True)
+        except Exception:
+            # Not cached: the next run should ask again
+            return None, "llm"
+        await asyncio.to_thread(age_cache.put, fingerprint, age)
+        return age, "llm"
+
     async def extract_education_for_profile(self, mcp_session: ClientSession, profile_url: str) -> Dict[str, Any]:
         try:
             result = await self.call_tool(
@@ -222,6 +331,62 @@ Respond with ONLY a number representing the estimated age (e.g., 28). If you can
             LogCollector.add(f"Failed to extract education for {profile_url}: {e}")
             return {"success": False, "education": []}
 
+    async def extract_education_batch(self, mcp_session: ClientSession, profile_urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Extract education for many profiles in parallel tabs, logging each result as it streams back"""
+        async def on_progress(progress: float, total: Optional[float], message: Optional[str]):
+            if not message:
+                return
+            try:
+                result = json.loads(message)
+            except ValueError:
+                return
+            status = f"{len(result.get('education', []))} entries" if result.get("success") else "failed"
+            LogCollector.add(f"  🎓 [{int(progress)}/{int(total or 0)}] {result.get('url')}: {status}")
+
+        result = await self.call_tool(
+            mcp_session, "extract_education_batch",
+            {"session_id": self.session_id, "profile_urls": profile_urls,
+             "concurrency": settings.LINKEDIN_PAGE_CONCURRENCY},
+            progress_callback=on_progress
+        )
+        if not result.get("success"):
+            LogCollector.add(f"❌ Batch education extraction failed: {result.get('message') or result.get('error')}")
+            return {}
+        return result.get("results", {})
+
+    async def enrich_genders(self, profiles: List[ProfileData]):
+        """Detect the gender of all profiles with batched LLM calls"""
+        LogCollector.add(f"   Detecting gender for {len(profiles)} profiles "
+                         f"(batches of {settings.LLM_GENDER_BATCH_SIZE})...")
+        genders = await self.detect_genders_batch([profile.name for profile in profiles])
+        for profile, gender in zip(profiles, genders):
+            profile.gender = gender
+            LogCollector.add(f"  ✅ [{profile.search_rank}/{len(profiles)}] {profile.name} Gender: {gender}")
+
+    async def enrich_age(self, profile: ProfileData, total: int, edu_result: Optional[Dict[str, Any]]):
+        """Estimate the age of one profile from its extracted education"""
+        tag = f"[{profile.search_rank}/{total}] {profile.name}"
+        if edu_result is None:
+            return
+        if not edu_result.get("success"):
+            LogCollector.add(f"  ❌ {tag} Education extraction failed")
+            return
+        education_list = edu_result.get("education", [])
+        profile.education = education_list
+        if not education_list:
+            LogCollector.add(f"  ⚠️ {tag} No education data found")
+            return
+
+        entries = "".join(f"\n     - {edu.get('school')} | {edu.get('degree')} | {edu.get('date_range')}"
+                          for edu in education_list)
+        LogCollector.add(f"  📚 {tag} Found {len(education_list)} education entries:{entries}")
+
+        profile.estimated_age, source = await self.estimate_age(education_list)
+        if profile.estimated_age:
+            LogCollector.add(f"   {tag} Estimated Age: {profile.estimated_age} years old ({source})")
+        else:
+            LogCollector.add(f"  ⚠️ {tag} Could not estimate age")
+
     async def extract_and_analyze_all_profiles(
         self,
         mcp_session: ClientSession,
@@ -241,6 +406,9 @@ Respond with ONLY a number representing the estimated age (e.g., 28). If you can
             return []
 
         raw_profiles = result.get("profiles", [])
+        waits = (result.get("timings") or {}).get("waits", [])
+        if waits:
+            LogCollector.add("⏱️ Search page waits: " + ", ".join(f"{w['wait']} {w['ms']:.0f}ms" for w in waits))
         
         # === LIMIT TO REQUESTED NUMBER OF PROFILES ===
         if len(raw_profiles) > limit:
@@ -249,10 +417,16 @@ Respond with ONLY a number representing the estimated age (e.g., 28). If you can
             
         profiles = []
 
-        for i, raw_profile in enumerate(raw_profiles, 1):
-            LogCollector.add(f"Processing profile {i}/{len(raw_profiles)}: {raw_profile.get('name')}")
+        # Visit all profiles up front, several tabs at a time
+        education_results = {}
+        if extract_education:
+            profile_urls = [p.get("url") for p in raw_profiles if p.get("url")]
+            LogCollector.add(f"🎓 Extracting education for {len(profile_urls)} profiles "
+                             f"({settings.LINKEDIN_PAGE_CONCURRENCY} tabs)...")
+            education_results = await self.extract_education_batch(mcp_session, profile_urls)
 
-            profile = ProfileData(
+        for i, raw_profile in enumerate(raw_profiles, 1):
+            profiles.append(ProfileData(
                 name=raw_profile.get("name"),
                 url=raw_profile.get("url"),
                 location=location_name,
@@ -260,81 +434,70 @@ Respond with ONLY a number representing the estimated age (e.g., 28). If you can
                 image_url=raw_profile.get("imageUrl"),
                 search_rank=i,
                 position=raw_profile.get("position")
-            )
-
-            LogCollector.add(f"   Detecting gender for {profile.name}...")
-            profile.gender = await self.detect_gender(profile.name, profile.image_url)
-            LogCollector.add(f"  ✅ Gender: {profile.gender}")
-
-            if extract_education and profile.url:
-                LogCollector.add(f"  🎓 Extracting education data...")
-                edu_result = await self.extract_education_for_profile(mcp_session, profile.url)
-
-                if edu_result.get("success"):
-                    education_list = edu_result.get("education", [])
-                    profile.education = education_list
-                    
-                    if education_list:
-                        LogCollector.add(f"  📚 Found {len(education_list)} education entries:")
-                        for edu in education_list:
-                            LogCollector.add(f"     - {edu.get('school')} | {edu.get('degree')} | {edu.get('date_range')}")
-
-                        # Use LLM to estimate age
-                        LogCollector.add(f"   Using LLM to estimate age...")
-                        profile.estimated_age = await self.estimate_age_from_education_llm(education_list)
-
-                        if profile.estimated_age:
-                            LogCollector.add(f"   Estimated Age: {profile.estimated_age} years old")
-                        else:
-                            LogCollector.add(f"  ⚠️ Could not estimate age")
-                    else:
-                        LogCollector.add(f"  ⚠️ No education data found")
-                else:
-                    LogCollector.add(f"  ❌ Education extraction failed")
-                
-                await asyncio.sleep(2.0)
-
-            profiles.append(profile)
-            await asyncio.sleep(0.5)
+            ))
+
+        # Enrich all profiles at once: llm_client caps concurrency and paces the API calls
+        LogCollector.add(f"🤖 Enriching {len(profiles)} profiles (gender, age) with up to "
+                         f"{settings.LLM_CONCURRENCY} parallel LLM calls...")
+        await asyncio.gather(self.enrich_genders(profiles), *(
+            self.enrich_age(profile, len(profiles),
+                            education_results.get(profile.url, {"success": False, "education": []})
+                            if extract_education and profile.url else None)
+            for profile in profiles
+        ))
+        self.llm.log_stats()
 
         return profiles
 
-    async def run(self, search_url: str, keywords: str, location_name: str, limit: int = 2, extract_education: bool = True) -> Dict[str, Any]:
-        # Use the configured python environment to run the server script
-        LogCollector.add(f"🚀 Starting MCP server with: {sys.executable} {settings.MCP_SERVER_SCRIPT}")
-        server_params = StdioServerParameters(command=sys.executable, args=[settings.MCP_SERVER_SCRIPT], env=None)
+    async def close_browser_session(self, mcp_session: ClientSession) -> Dict[str, Any]:
+        """Close the run's browser session on the MCP server and return its network stats"""
         try:
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as mcp_session:
-                    await mcp_session.initialize()
-
-                    # Login
-                    LogCollector.add("🔐 Logging into LinkedIn...")
-                    login_result = await self.call_tool(mcp_session, "login_linkedin",
-                                                       {"email": self.email, "password": self.password})
-                    if not login_result.get("success"):
-                        return {"success": False, "error": "Login failed", "profiles": []}
-
-                    self.session_id = login_result.get("session_id")
-                    LogCollector.add("✅ Login successful")
+            close_result = await self.call_tool(mcp_session, "close_browser", {"session_id": self.session_id})
+        except Exception as e:
+            LogCollector.add(f"⚠️ Could not close browser session {self.session_id}: {e}")
+            return {}
+        finally:
+            self.session_id = None
+        return close_result.get("network") or {}
 
-                    LogCollector.add("🔍 Extracting profiles from search results...")
+    async def run(self, search_url: str, keywords: str, location_name: str, limit: int = 2, extract_education: bool = True) -> Dict[str, Any]:
+        # Lease a running MCP server from the pool (started with the app)
+        try:
+            async with mcp_pool.session() as mcp_session:
+                # Login
+                LogCollector.add("🔐 Logging into LinkedIn...")
+                login_result = await self.call_tool(mcp_session, "login_linkedin",
+                                                   {"email": self.email, "password": self.password})
+                if not login_result.get("success"):
+                    return {"success": False, "error": "Login failed", "profiles": []}
+
+                self.session_id = login_result.get("session_id")
+                how = "stored session reused" if login_result.get("reused_session") else "logged in with form"
+                LogCollector.add(f"✅ Login successful ({how}, {login_result.get('login_seconds')}s)")
+
+                LogCollector.add("🔍 Extracting profiles from search results...")
+                try:
                     self.collected_profiles = await self.extract_and_analyze_all_profiles(
                         mcp_session, search_url, keywords, location_name, limit, extract_education
                     )
-
-                    await self.call_tool(mcp_session, "close_browser", {"session_id": self.session_id})
-
-                    complete_profiles = [p for p in self.collected_profiles if p.is_complete()]
-                    LogCollector.add(f"✅ Workflow complete. Processed {len(self.collected_profiles)} profiles.")
-                    
-                    return {
-                        "success": True,
-                        "total_profiles": len(self.collected_profiles),
-                        "complete_profiles": len(complete_profiles),
-                        "profiles": [p.to_dict() for p in complete_profiles],
-                        "all_profiles": [p.to_dict() for p in self.collected_profiles]
-                    }
+                finally:
+                    # The MCP server outlives this run: always release the browser context and its tabs
+                    network = await self.close_browser_session(mcp_session)
+                if network.get("blocked_requests"):
+                    LogCollector.add(f"🚫 Blocked {network['blocked_requests']} requests {network['blocked_by_reason']} "
+                                     f"(~{network['blocked_bytes_estimate'] / 1e6:.1f} MB saved, "
+                                     f"{network['loaded_bytes'] / 1e6:.1f} MB loaded)")
+
+                complete_profiles = [p for p in self.collected_profiles if p.is_complete()]
+                LogCollector.add(f"✅ Workflow complete. Processed {len(self.collected_profiles)} profiles.")
+                
+                return {
+                    "success": True,
+                    "total_profiles": len(self.collected_profiles),
+                    "complete_profiles": len(complete_profiles),
+                    "profiles": [p.to_dict() for p in complete_profiles],
+                    "all_profiles": [p.to_dict() for p in self.collected_profiles]
+                }
 
         except Exception as e:
             LogCollector.add(f"❌ Agent failed: {e}")
@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from anthropic.types import Message
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "on", "record", "replay")
+
+
+class LLMCacheMiss(Exception):
+    """Raised in replay mode when a request has no cached response"""
+
+
+def canonical_json(value: Any) -> str:
+    """Deterministic JSON of a request: sorted keys, SDK content blocks dumped as plain dicts"""
+    def default(obj):
+        if hasattr(obj, "model_dump"):
+            return obj.model_dump(mode="json", exclude_none=True)
+        return str(obj)
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=default)
+
+
+class LLMResponseCache:
+    """
+    Disk cache of Anthropic responses, keyed by model + hash of the canonicalized request.
+
+    Modes (LLM_CACHE_MODE):
+      - off: every call goes to the API
+      - on: fresh cached responses are served, API answers are stored
+      - record: always call the API and store (refreshes the recordings)
+      - replay: served from the cache only (expired entries included); a miss raises
+        LLMCacheMiss, so a workflow runs offline and deterministically
+
+    Entries expire after LLM_CACHE_TTL seconds (0 = never); once the cache grows past
+    LLM_CACHE_MAX_MB, expired then least recently used entries are evicted. The size is
+    kept as a running total, so storing a response does not scan the table.
+
+    Calls do blocking SQLite I/O: async code runs them through asyncio.to_thread.
+    """
+
+    def __init__(self, db_path: str = settings.LLM_CACHE_PATH, mode: str = settings.LLM_CACHE_MODE,
+                 ttl: float = settings.LLM_CACHE_TTL, max_mb: float = settings.LLM_CACHE_MAX_MB):
+        if mode not in CACHE_MODES:
+            logger.warning(f"Unknown LLM_CACHE_MODE={mode!r}, using 'on'")
+            mode = "on"
+        self.db_path = db_path
+        self.mode = mode
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            self.init_db()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.commit()
+            self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+
+    @staticmethod
+    def key(model: str, request: Dict[str, Any]) -> str:
+        digest = hashlib.sha256(canonical_json(request).encode()).hexdigest()
+        return f"{model}:{digest}"
+
+    def get(self, key: str) -> Optional[Message]:
+        if self.mode not in ("on", "replay"):
+            return None
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            response, created_at = row
+            if self.mode == "on" and self.ttl and time.time() - created_at > self.ttl:
+                return None
+            conn.execute("UPDATE llm_responses SET hits = hits + 1, last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        return Message.model_validate_json(response)
+
+    def put(self, key: str, model: str, response: Message):
+        if self.mode not in ("on", "record"):
+            return
+        data = response.model_dump_json()
+        now = time.time()
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            replaced = conn.execute("SELECT size FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            conn.execute("""
+                INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, data, len(data), now, now))
+            conn.commit()
+            self.total_bytes += len(data) - (replaced[0] if replaced else 0)
+            over_limit = self.max_bytes and self.total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries (except in replay mode), then least recently used ones beyond the size limit"""
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            deleted = 0
+            if self.ttl and self.mode != "replay":
+                deleted += conn.execute("DELETE FROM llm_responses WHERE created_at < ?",
+                                        (time.time() - self.ttl,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                for key, size in conn.execute("SELECT key, size FROM llm_responses ORDER BY last_used").fetchall():
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    deleted += 1
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+            conn.commit()
+            self.total_bytes = total
+        return deleted
+
+    def clear(self) -> int:
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            deleted = conn.execute("DELETE FROM llm_responses").rowcount
+            conn.commit()
+            self.total_bytes = 0
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with sqlite3.connect(self.db_path) as conn:
+            entries, size, hits = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM llm_responses"
+            ).fetchone()
+            models = dict(conn.execute("SELECT model, COUNT(*) FROM llm_responses GROUP BY model").fetchall())
+        return {"mode": self.mode, "path": self.db_path, "entries": entries, "size_mb": round(size / 1024 / 1024, 2),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 2), "ttl_seconds": self.ttl, "hits": hits,
+                "models": models}
+
+
+llm_cache = LLMResponseCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM response cache (python -m app.services.llm_cache)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="print cache statistics as JSON")
+    sub.add_parser("evict", help="drop expired entries and shrink the cache to LLM_CACHE_MAX_MB")
+    sub.add_parser("clear", help="delete every cached response")
+    args = parser.parse_args()
+
+    cache = llm_cache if llm_cache.enabled else LLMResponseCache(mode="on")
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "evict":
+        print(f"🗑️ {cache.evict()} entries evicted")
+    elif args.command == "clear":
+        print(f"🗑️ {cache.clear()} entries deleted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Optional
+
+import anthropic
+
+from app.config import settings
+from app.services.llm_cache import LLMCacheMiss, canonical_json, llm_cache
+from app.services.log_service import LogCollector
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at `per_minute` units per minute.
+    Waiters are served in arrival order; a rate of 0 disables the limit.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Wait until `amount` units are available and take them. Returns the seconds waited."""
+        if self.capacity <= 0:
+            return 0.0
+        # A single request larger than the whole bucket would wait forever
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                delay = (amount - self.tokens) * 60 / self.capacity
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= amount
+        return waited
+
+    def give_back(self, amount: float):
+        """Return units that were reserved but not used"""
+        if self.capacity > 0 and amount > 0:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AsyncLLMClient:
+    """
+    Shared async Anthropic client for profile enrichment.
+
+    Calls run concurrently up to LLM_CONCURRENCY, are paced by request and token
+    buckets (LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE) and are retried with
+    exponential backoff on 429, 5xx and connection errors, so enrichment never
+    blocks the event loop nor trips the API rate limits. Responses go through the
+    disk cache (llm_cache) first, which also provides the offline replay mode.
+    """
+
+    def __init__(self):
+        # Retries are handled here so that they go through the rate limiters too
+        self.client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY, max_retries=0)
+        self.model = settings.LLM_MODEL
+        self.semaphore = asyncio.Semaphore(max(1, settings.LLM_CONCURRENCY))
+        self.requests = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(settings.LLM_TOKENS_PER_MINUTE)
+        self.stats = {"requests": 0, "cached": 0, "retries": 0, "failures": 0, "input_tokens": 0,
+                      "output_tokens": 0, "throttled_seconds": 0.0}
+
+    @staticmethod
+    def estimate_tokens(messages: Any, max_tokens: int) -> int:
+        """Upper bound reserved before the call: ~4 characters per input token plus the full output budget"""
+        return len(canonical_json(messages)) // 4 + max_tokens
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying `error`, or None if it is not retryable"""
+        if isinstance(error, anthropic.APIStatusError):
+            if error.status_code != 429 and error.status_code < 500:
+                return None
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), settings.LLM_MAX_BACKOFF)
+                except ValueError:
+                    pass
+        elif not isinstance(error, anthropic.APIConnectionError):
+            return None
+        return min(2 ** attempt, settings.LLM_MAX_BACKOFF) * (0.5 + random.random() / 2)
+
+    async def create(self, messages: list, max_tokens: int = 1024, **kwargs) -> anthropic.types.Message:
+        """`messages.create` with response cache, concurrency cap, rate limiting and retries"""
+        model = kwargs.pop("model", self.model)
+        cache_key = None
+        if llm_cache.enabled:
+            cache_key = llm_cache.key(model, {"model": model, "max_tokens": max_tokens, "messages": messages, **kwargs})
+            cached = await asyncio.to_thread(llm_cache.get, cache_key)
+            if cached is not None:
+                self.stats["cached"] += 1
+                return cached
+            if llm_cache.mode == "replay":
+                self.stats["failures"] += 1
+                raise LLMCacheMiss(f"No cached response for {cache_key} (LLM_CACHE_MODE=replay)")
+
+        reserved = self.estimate_tokens(messages, max_tokens)
+        attempt = 0
+        while True:
+            async with self.semaphore:
+                waited = await self.requests.acquire(1)
+                waited += await self.tokens.acquire(reserved)
+                self.stats["throttled_seconds"] += waited
+                self.stats["requests"] += 1
+                try:
+                    response = await self.client.messages.create(
+                        model=model,
+                        max_tokens=max_tokens,
+                        messages=messages,
+                        **kwargs
+                    )
+                except Exception as e:
+                    # Nothing was generated: the reserved tokens go back to the bucket
+                    self.tokens.give_back(reserved)
+                    delay = self._retry_delay(e, attempt)
+                    if delay is None or attempt >= settings.LLM_MAX_RETRIES:
+                        self.stats["failures"] += 1
+                        raise
+                    error = e
+                else:
+                    used = response.usage.input_tokens + response.usage.output_tokens
+                    self.stats["input_tokens"] += response.usage.input_tokens
+                    self.stats["output_tokens"] += response.usage.output_tokens
+                    self.tokens.give_back(reserved - used)
+                    if cache_key:
+                        await asyncio.to_thread(llm_cache.put, cache_key, model, response)
+                    return response
+
+            # Back off outside the semaphore so other calls keep going
+            attempt += 1
+            self.stats["retries"] += 1
+            logger.warning(f"LLM call failed ({type(error).__name__}), retry {attempt} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def complete(self, prompt: str, max_tokens: int = 1024) -> str:
+        """Single user prompt, returns the text of the answer"""
+        response = await self.create([{"role": "user", "content": prompt}], max_tokens=max_tokens)
+        return response.content[0].text.strip()
+
+    def log_stats(self):
+        s = self.stats
+        LogCollector.add(f"🤖 LLM: {s['requests']} requests, {s['cached']} from cache, {s['retries']} retries, "
+                         f"{s['failures']} failures, "
+                         f"{s['input_tokens']}+{s['output_tokens']} tokens, "
+                         f"throttled {s['throttled_seconds']:.1f}s")
+
+    async def close(self):
+        await self.client.close()
+
+
+llm_client = AsyncLLMClient()
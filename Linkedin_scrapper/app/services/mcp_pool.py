@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from app.config import settings
+from app.services.log_service import LogCollector
+
+logger = logging.getLogger(__name__)
+
+
+class MCPServerProcess:
+    """
+    One long-lived `linkedin_mcp_server.py` subprocess and its client session.
+
+    The stdio transport must be opened and closed by the same task, so a background
+    task owns the connection: it starts the server, pings it periodically and starts
+    it again (with backoff) whenever it crashes or stops answering.
+    """
+
+    def __init__(self, index: int, server_params: StdioServerParameters,
+                 on_ready: Optional[Callable[[], Awaitable[None]]] = None):
+        self.index = index
+        self.server_params = server_params
+        self.on_ready = on_ready
+        self.session: Optional[ClientSession] = None
+        self.ready = asyncio.Event()
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        self.last_ping_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._stop = asyncio.Event()
+        self._check_now = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-server-{self.index}")
+
+    async def stop(self):
+        self._stop.set()
+        self._check_now.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=10)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready.is_set() and self.session is not None
+
+    def check_now(self):
+        """Ping immediately (called when a workflow failed while using this server)"""
+        self._check_now.set()
+
+    async def _health_loop(self, session: ClientSession):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._check_now.wait(), timeout=settings.MCP_HEALTH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._check_now.clear()
+            if self._stop.is_set():
+                return
+            start = time.perf_counter()
+            await asyncio.wait_for(session.send_ping(), timeout=settings.MCP_PING_TIMEOUT)
+            self.last_ping_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _run(self):
+        consecutive_failures = 0
+        while not self._stop.is_set():
+            try:
+                async with stdio_client(self.server_params) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        self.session = session
+                        self.started_at = time.time()
+                        self.ready.set()
+                        consecutive_failures = 0
+                        LogCollector.add(f"🟢 MCP server #{self.index} ready")
+                        if self.on_ready:
+                            await self.on_ready()
+                        await self._health_loop(session)
+            except Exception as e:
+                # anyio wraps transport failures in exception groups: report the root cause
+                while getattr(e, "exceptions", None):
+                    e = e.exceptions[0]
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"MCP server #{self.index} failed: {self.last_error}")
+            finally:
+                self.ready.clear()
+                self.session = None
+
+            if self._stop.is_set():
+                break
+            consecutive_failures += 1
+            self.restarts += 1
+            delay = min(2 ** consecutive_failures, 30)
+            LogCollector.add(f"🔄 Restarting MCP server #{self.index} in {delay}s ({self.last_error})")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "ready": self.ready.is_set(),
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.ready.is_set() else None,
+            "restarts": self.restarts,
+            "last_ping_ms": self.last_ping_ms,
+            "last_error": self.last_error,
+        }
+
+
+class MCPPool:
+    """
+    Pool of MCP server processes started once with the FastAPI app.
+    Each workflow leases one server (and its browser) exclusively for its duration.
+    """
+
+    def __init__(self, size: int, server_script: str):
+        self.size = size
+        self.server_params = StdioServerParameters(command=sys.executable, args=[server_script], env=None)
+        self.servers: List[MCPServerProcess] = []
+        self._idle: Optional[List[MCPServerProcess]] = None
+        self._available: Optional[asyncio.Condition] = None
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    async def start(self):
+        if self.started or self.size <= 0:
+            return
+        LogCollector.add(f"🚀 Starting {self.size} MCP server(s): {sys.executable} {settings.MCP_SERVER_SCRIPT}")
+        self._idle = []
+        self._available = asyncio.Condition()
+        for index in range(self.size):
+            server = MCPServerProcess(index, self.server_params, on_ready=self._notify)
+            server.start()
+            self.servers.append(server)
+            self._idle.append(server)
+
+    async def stop(self):
+        await asyncio.gather(*(server.stop() for server in self.servers))
+        self.servers = []
+        self._idle = None
+        self._available = None
+
+    async def _notify(self):
+        """Wake the callers waiting for a server (one was released or became ready)"""
+        async with self._available:
+            self._available.notify_all()
+
+    def _take_ready(self) -> Optional[MCPServerProcess]:
+        # Idle servers that crashed or are in restart backoff stay in place for later callers
+        for server in self._idle:
+            if server.is_ready:
+                self._idle.remove(server)
+                return server
+        return None
+
+    async def _lease(self) -> MCPServerProcess:
+        """An idle server that is ready, waiting up to MCP_STARTUP_TIMEOUT for one"""
+        try:
+            async with self._available:
+                return await asyncio.wait_for(self._available.wait_for(self._take_ready),
+                                              timeout=settings.MCP_STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            errors = "; ".join(f"#{s.index}: {s.last_error}" for s in self.servers if s.last_error)
+            raise TimeoutError(f"No MCP server ready after {settings.MCP_STARTUP_TIMEOUT:.0f}s"
+                               + (f" ({errors})" if errors else ""))
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        Lease an initialized MCP session, preferring servers that are ready. Without a
+        started pool (MCP_POOL_SIZE=0, or outside the FastAPI app) a dedicated server
+        is started for this call only.
+        """
+        if not self.started:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    yield session
+            return
+
+        server = await self._lease()
+        try:
+            try:
+                yield server.session
+            except Exception:
+                # The workflow may have failed because the server died: check it right away
+                server.check_now()
+                raise
+        finally:
+            self._idle.append(server)
+            await self._notify()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "started": self.started,
+            "idle": len(self._idle) if self._idle else 0,
+            "servers": [server.status() for server in self.servers],
+        }
+
+
+mcp_pool = MCPPool(settings.MCP_POOL_SIZE, settings.MCP_SERVER_SCRIPT)
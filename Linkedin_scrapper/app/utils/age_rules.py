@@ -0,0 +1,104 @@
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Typical age at graduation for each level (same rules as the LLM prompt)
+LEVEL_AGES = {
+    "bac": 18,
+    "prep": 20,
+    "bachelor": 22,
+    "master": 24,
+    "medicine": 25,
+    "phd": 28,
+}
+
+# Checked in this order: the first level whose keywords match wins
+# (so "Doctorat en médecine" is medicine and "Master ingénierie" is a master)
+LEVEL_KEYWORDS = [
+    ("medicine", r"\b(md|dmd|dds|pharmd)\b|docteur en (medecine|pharmacie)|doctorat en (medecine|pharmacie)"
+                 r"|doctor of (medicine|dental|pharmacy)|medecine dentaire"),
+    ("phd", r"\bph\.? ?d\b|doctorat|doctorate|doctor of philosophy|\bthese\b"),
+    ("master", r"\bmaster|\bmastere\b|\bmba\b|\bm\.? ?sc?\b|\bmeng\b|\bdess\b|\bdea\b|ingenieur\b|\bengineer\b"
+               r"|engineering degree"),
+    ("bachelor", r"bachelor|\blicen[cs]e|licentiate|\bb\.? ?sc?\b|\bba\b|\bbasc\b|\bbeng\b|undergraduate"),
+    ("prep", r"\bcpge\b|classes? prep|\b(mpsi|pcsi|ptsi|tsi|mp|psi|pc|ecs|ect)\b|\bdut\b|\bbts\b|\bdeug\b|\bdeust\b"
+             r"|\btechnicien\b|associate|diplome universitaire de technologie"),
+    ("bac", r"baccalaur|\bbac\b|high school|\blycee\b|secondary|terminale"),
+]
+SCHOOL_KEYWORDS = [
+    ("prep", r"\bcpge\b|classes? preparatoires"),
+    ("bac", r"\blycee\b|high school|secondary school"),
+    ("master", r"ingenieurs?\b|engineering school"),
+]
+
+LEVEL_KEYWORDS = [(level, re.compile(pattern)) for level, pattern in LEVEL_KEYWORDS]
+SCHOOL_KEYWORDS = [(level, re.compile(pattern)) for level, pattern in SCHOOL_KEYWORDS]
+
+PRESENT_MARKERS = re.compile(r"\b(present|current|now|today|aujourd|en cours|actuel(le)?(ment)?|ce jour|auj)\b")
+YEAR = re.compile(r"\b(19[5-9]\d|20\d\d)\b")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lower case, accents removed, typographic apostrophes unified"""
+    text = unicodedata.normalize("NFKD", (text or "").replace("’", "'"))
+    return text.encode("ascii", "ignore").decode().lower()
+
+
+def classify_level(degree: Optional[str], school: Optional[str] = None) -> Optional[str]:
+    """Education level of an entry from its degree title (before the first comma first), then its school"""
+    degree = normalize(degree)
+    for text in (degree.split(",")[0], degree):
+        for level, pattern in LEVEL_KEYWORDS:
+            if pattern.search(text):
+                return level
+    school = normalize(school)
+    for level, pattern in SCHOOL_KEYWORDS:
+        if pattern.search(school):
+            return level
+    return None
+
+
+def parse_end_year(date_range: Optional[str], current_year: int) -> Optional[int]:
+    """
+    Graduation year from a LinkedIn date range, in French or English:
+    "Sep 2019 - Jul 2021", "sept. 2016 – juin 2019", "2023", "2022 - aujourd'hui", "Oct 2024 - Present".
+    """
+    text = normalize(date_range)
+    years = [int(y) for y in YEAR.findall(text) if int(y) <= current_year + 8]
+    if PRESENT_MARKERS.search(text):
+        # Still studying: graduates this year at the earliest
+        return max(years + [current_year])
+    return max(years) if years else None
+
+
+def estimate_age_from_rules(education: List[Dict[str, Any]],
+                            current_year: Optional[int] = None,
+                            max_spread: int = 3) -> Tuple[Optional[int], str]:
+    """
+    Deterministic age estimate from the education list: birth year = graduation year
+    minus the typical graduation age of the level, taken from the latest dated entry
+    whose level is known.
+
+    Returns:
+        (age, "rules") or (None, reason) when the entries are ambiguous and an LLM should decide.
+    """
+    current_year = current_year or datetime.now().year
+    births = []
+    for edu in education or []:
+        level = classify_level(edu.get("degree"), edu.get("school"))
+        end_year = parse_end_year(edu.get("date_range"), current_year)
+        if level and end_year:
+            births.append((end_year, end_year - LEVEL_AGES[level]))
+
+    if not births:
+        return None, "no dated entry with a known degree"
+    spread = max(b for _, b in births) - min(b for _, b in births)
+    if spread > max_spread:
+        return None, f"entries disagree by {spread} years"
+
+    _, birth_year = max(births)
+    age = current_year - birth_year
+    if not 18 <= age <= 80:
+        return None, f"implausible age {age}"
+    return age, "rules"
@@ -4,14 +4,20 @@ Extracts ALL data directly from search results page
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 import os
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
-from mcp.server.fastmcp import FastMCP
-from playwright.async_api import async_playwright, Page
+from mcp.server.fastmcp import FastMCP, Context
+from playwright.async_api import async_playwright, Page, BrowserContext, Route
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
 # Configure logging
 logging.basicConfig(
@@ -26,30 +32,492 @@ app = FastMCP("LinkedIn Profile Analyzer")
 # Global browser state
 _browser_context = {}
 
+# Where authenticated storage states (cookies + localStorage) are kept between runs
+SESSION_DIR = Path(os.getenv("LINKEDIN_SESSION_DIR", Path(__file__).resolve().parent / ".linkedin_sessions"))
+
+# Selectors only present when logged in
+LOGGED_IN_SELECTOR = '.global-nav__me-photo, .feed-identity-module, #global-nav'
+
+# Maximum number of tabs opened per session for profile visits
+PAGE_POOL_SIZE = int(os.getenv("LINKEDIN_PAGE_POOL_SIZE", "4"))
+
+# Requests aborted on every browser context: resource types not needed for extraction
+# (image URLs are read from the DOM, the files themselves are never used) and trackers.
+# LINKEDIN_BLOCK_RESOURCES="" and LINKEDIN_BLOCK_TRACKERS=false disable blocking.
+BLOCKED_RESOURCE_TYPES = {t.strip() for t in os.getenv("LINKEDIN_BLOCK_RESOURCES", "image,media,font").split(",") if t.strip()}
+BLOCK_TRACKERS = os.getenv("LINKEDIN_BLOCK_TRACKERS", "true").lower() == "true"
+TRACKER_URL_PATTERNS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'bat.bing.com', 'connect.facebook.net',
+    'px.ads.linkedin.com', 'dc.ads.linkedin.com', 'snap.licdn.com', 'demdex.net', 'omtrdc.net',
+    '/li/track', '/tscp-serving/', '/sensorCollect', '/collect/', '/platform-telemetry/', '/realtime/connect'
+)
+# Always let through (login challenges need their images and scripts), plus LINKEDIN_ALLOW_URLS
+ALLOWED_URL_PATTERNS = ('/checkpoint/', 'captcha', 'arkoselabs.com', 'funcaptcha') + tuple(
+    p.strip() for p in os.getenv("LINKEDIN_ALLOW_URLS", "").split(",") if p.strip()
+)
+# Rough transfer sizes of blocked responses (they are aborted before any byte is known)
+TYPICAL_BYTES = {"image": 40_000, "media": 500_000, "font": 60_000, "script": 80_000, "stylesheet": 30_000}
+
+# Readiness waits: what each extractor waits for instead of fixed sleeps
+READY_TIMEOUT_MS = int(os.getenv("LINKEDIN_READY_TIMEOUT_MS", "15000"))
+# Longest pause after a scroll step when the DOM does not change (lazy sections usually insert sooner)
+SCROLL_SETTLE_MS = int(os.getenv("LINKEDIN_SCROLL_SETTLE_MS", "1500"))
+LOGIN_FORM_SELECTOR = 'input[name="session_key"]'
+SEARCH_RESULT_SELECTOR = ('li.reusable-search__result-container, div.entity-result, '
+                          'div[data-chameleon-result-urn], div[class*="search-result"]')
+# Rendered below the last result: once visible, every result card of the page is in the DOM
+SEARCH_PAGINATION_SELECTOR = '.artdeco-pagination, button.artdeco-pagination__button--next'
+PROFILE_READY_SELECTOR = 'main h1'
+EDUCATION_ANCHOR_SELECTOR = '#education, section[id*="education"]'
+EDUCATION_ITEM_SELECTOR = 'div.display-flex.flex-row.justify-space-between'
+
+# Scrolls one viewport at a time until `selector` (or a section whose h2 contains `headingText`)
+# exists, waiting for DOM mutations rather than a fixed delay after each step, then brings it
+# into view and resolves once an IntersectionObserver reports it rendered in the viewport.
+SCROLL_TO_SECTION_JS = '''async ({selector, headingText, settleMs, maxSteps}) => {
+    const find = () => {
+        let el = document.querySelector(selector);
+        if (!el && headingText) {
+            el = [...document.querySelectorAll("section h2")]
+                .find(h => h.textContent.toLowerCase().includes(headingText));
+        }
+        return el ? (el.closest("section") || el) : null;
+    };
+    const mutation = () => new Promise(resolve => {
+        const observer = new MutationObserver(() => { observer.disconnect(); resolve(true); });
+        observer.observe(document.body, {childList: true, subtree: true});
+        setTimeout(() => { observer.disconnect(); resolve(false); }, settleMs);
+    });
+    const intersecting = (el) => new Promise(resolve => {
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(e => e.isIntersecting)) { observer.disconnect(); resolve(true); }
+        });
+        observer.observe(el);
+        setTimeout(() => { observer.disconnect(); resolve(false); }, settleMs);
+    });
+
+    for (let step = 0; step < maxSteps; step++) {
+        const el = find();
+        if (el) {
+            el.scrollIntoView({block: "center"});
+            return {found: await intersecting(el), steps: step};
+        }
+        const atBottom = window.innerHeight + window.scrollY >= document.body.scrollHeight - 2;
+        const changed = mutation();
+        window.scrollBy(0, window.innerHeight * 0.8);
+        // Nothing left to scroll and nothing new rendered: the section does not exist
+        if (!(await changed) && atBottom) return {found: false, steps: step};
+    }
+    return {found: !!find(), steps: maxSteps};
+}'''
+
+# True once the education section contains at least one entry
+EDUCATION_ITEMS_READY_JS = '''(item) => [...document.querySelectorAll("section")].some(section => {
+    const heading = section.querySelector("h2");
+    const isEducation = section.querySelector("#education") || (section.id || "").includes("education")
+        || (heading && heading.textContent.toLowerCase().includes("education"));
+    return isEducation && section.querySelector(item);
+})'''
+
+# Profile URL of the first search result card (used to detect that the next page rendered)
+FIRST_RESULT_URL_JS = '''(selector) => {
+    const card = document.querySelector(selector);
+    const link = card && card.querySelector('a[href*="/in/"]');
+    return link ? link.href.split("?")[0] : null;
+}'''
+
+# Extracts education entries - ONLY from the Education section of a profile
+EXTRACT_EDUCATION_JS = '''() => {
+    const educations = [];
+
+    console.log("=== Extracting Education CLEAN ===");
+
+    // Locate the EDUCATION SECTION
+    let eduSection = document.querySelector('section[id*="education"]');
+
+    if (!eduSection) {
+        const allSections = document.querySelectorAll("section");
+        for (const sec of allSections) {
+            const h2 = sec.querySelector("h2");
+            if (h2 && h2.textContent.toLowerCase().includes("education")) {
+                eduSection = sec;
+                break;
+            }
+        }
+    }
+
+    if (!eduSection) {
+        console.log("❌ No education section found");
+        return [];
+    }
+
+    // Extract each education item cleanly
+    const items = eduSection.querySelectorAll(
+        "div.display-flex.flex-row.justify-space-between"
+    );
+
+    items.forEach((block) => {
+        try {
+            let school = null;
+            let degree = null;
+            let date_range = null;
+
+            // SCHOOL: First aria-hidden span
+            const schoolEl = block.querySelector('span[aria-hidden="true"]');
+            if (schoolEl) school = schoolEl.textContent.trim();
+
+            // DEGREE: nested visually-hidden span inside .t-14.t-normal
+            const degreeEl = block.querySelector(
+                "span.t-14.t-normal span.visually-hidden"
+            );
+            if (degreeEl) degree = degreeEl.textContent.trim();
+
+            // DATE RANGE
+            const dateEl = block.querySelector("span.pvs-entity__caption-wrapper");
+            if (dateEl) date_range = dateEl.textContent.trim();
+
+            // Add only if meaningful (ignore empty garbage entries)
+            if (school || degree || date_range) {
+                educations.push({
+                    school: school || null,
+                    degree: degree || null,
+                    date_range: date_range || null
+                });
+            }
+
+        } catch (err) {
+            console.log("Error parsing education block", err);
+        }
+    });
+
+    return educations;
+}'''
+
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-async def wait_for_page_load(page: Page, timeout: int = 10000):
-    """Wait for page to be fully loaded"""
-    try:
-        await page.wait_for_load_state("networkidle", timeout=timeout)
-    except Exception as e:
-        logger.warning(f"Network idle timeout: {e}")
-        await asyncio.sleep(2)
+class WaitTimings:
+    """
+    Readiness waits of one tool call: each waits for the selector, DOM state or rendered
+    section the extractor needs, and records how long it took so dead time can be tuned.
+    A timed-out wait is recorded (ok=False) and the caller carries on with what is there.
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.waits: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+
+    def _record(self, name: str, start: float, ok: bool, **extra):
+        self.waits.append({"wait": name, "ms": round((time.perf_counter() - start) * 1000, 1), "ok": ok, **extra})
+
+    async def selector(self, page: Page, name: str, selector: str, timeout: int = READY_TIMEOUT_MS,
+                       state: str = "attached") -> bool:
+        start = time.perf_counter()
+        try:
+            await page.wait_for_selector(selector, state=state, timeout=timeout)
+            ok = True
+        except PlaywrightTimeoutError:
+            ok = False
+        self._record(name, start, ok)
+        return ok
+
+    async def function(self, page: Page, name: str, expression: str, arg: Any = None,
+                       timeout: int = READY_TIMEOUT_MS) -> bool:
+        start = time.perf_counter()
+        try:
+            await page.wait_for_function(expression, arg=arg, timeout=timeout)
+            ok = True
+        except PlaywrightTimeoutError:
+            ok = False
+        self._record(name, start, ok)
+        return ok
+
+    async def scroll_to(self, page: Page, name: str, selector: str, heading_text: Optional[str] = None,
+                        max_steps: int = 20) -> bool:
+        start = time.perf_counter()
+        result = await page.evaluate(SCROLL_TO_SECTION_JS, {
+            "selector": selector, "headingText": heading_text, "settleMs": SCROLL_SETTLE_MS, "maxSteps": max_steps
+        })
+        self._record(name, start, result["found"], scroll_steps=result["steps"])
+        return result["found"]
+
+    def report(self) -> Dict[str, Any]:
+        total_ms = round((time.perf_counter() - self._start) * 1000, 1)
+        waited_ms = round(sum(w["ms"] for w in self.waits), 1)
+        logger.info(f"⏱️ {self.label}: {waited_ms}ms waiting of {total_ms}ms ("
+                    + ", ".join(f"{w['wait']}={w['ms']}ms{'' if w['ok'] else ' timeout'}" for w in self.waits) + ")")
+        return {"total_ms": total_ms, "waited_ms": waited_ms, "waits": self.waits}
+
+
+class PagePool:
+    """
+    Pool of tabs sharing one logged-in browser context.
+    Tabs are created lazily, reused between profiles, and replaced when a visit fails.
+    """
+
+    def __init__(self, context: BrowserContext, size: int):
+        self.context = context
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            try:
+                page = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                page = await self.context.new_page()
+            healthy = False
+            try:
+                yield page
+                healthy = True
+            finally:
+                if healthy and not page.is_closed():
+                    self._idle.put_nowait(page)
+                else:
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass
+
+    async def close(self):
+        while not self._idle.empty():
+            try:
+                await self._idle.get_nowait().close()
+            except Exception:
+                pass
 
-async def scroll_page_gradually(page: Page, num_scrolls: int = 5):
-    """Gradually scroll down the page to trigger lazy loading"""
+
+def get_page_pool(session_id: str) -> PagePool:
+    """Page pool of a session, created on first use"""
+    session = _browser_context[session_id]
+    if 'page_pool' not in session:
+        session['page_pool'] = PagePool(session['context'], PAGE_POOL_SIZE)
+    return session['page_pool']
+
+
+async def extract_education_from_page(page: Page, profile_url: str) -> Dict[str, Any]:
+    """
+    Visit a profile in the given tab and extract its education section.
+    Navigation and page errors propagate, so that PagePool closes the tab instead of reusing it.
+    """
+    logger.info(f"🎓 Navigating to profile: {profile_url}")
+    timings = WaitTimings(f"education {profile_url}")
+    await page.goto(profile_url, wait_until='domcontentloaded', timeout=30000)
+    await timings.selector(page, "profile_header", PROFILE_READY_SELECTOR)
+    
+    # Scroll only until the lazily rendered education section is in view, then wait for its entries
+    if await timings.scroll_to(page, "education_section", EDUCATION_ANCHOR_SELECTOR, heading_text="education"):
+        await timings.function(page, "education_items", EDUCATION_ITEMS_READY_JS,
+                               arg=EDUCATION_ITEM_SELECTOR, timeout=SCROLL_SETTLE_MS * 2)
+    
+    # Extract education data - ONLY from Education section
+    education_data = await page.evaluate(EXTRACT_EDUCATION_JS)
+    
+    logger.info(f"📚 Found {len(education_data)} education entries")
+    
+    return {
+        "success": True,
+        "education": education_data,
+        "message": f"Extracted {len(education_data)} education entries",
+        "timings": timings.report()
+    }
+
+
+async def extract_education_in_pool(pool: PagePool, profile_url: str) -> Dict[str, Any]:
+    """Extract a profile's education in a pooled tab; on failure the tab is discarded and an error result returned"""
     try:
-        for i in range(num_scrolls):
-            await page.evaluate(f'window.scrollTo(0, document.body.scrollHeight * {(i + 1) / num_scrolls})')
-            await asyncio.sleep(0.5)
-        # Scroll back to top
-        await page.evaluate('window.scrollTo(0, 0)')
-        await asyncio.sleep(0.5)
+        async with pool.page() as page:
+            return await extract_education_from_page(page, profile_url)
     except Exception as e:
-        logger.warning(f"Scroll error: {e}")
+        logger.error(f"Failed to extract education: {e}")
+        import traceback
+        traceback.print_exc()
+        return {
+            "success": False,
+            "education": [],
+            "message": f"Error: {str(e)}"
+        }
+
+class ResourceBlocker:
+    """
+    Route handler of one browser context: aborts the resource types and tracker URLs
+    configured above (allowlist first) and counts what was blocked and loaded.
+    """
+
+    def __init__(self):
+        self.blocked: Dict[str, int] = {}
+        self.blocked_bytes_estimate = 0
+        self.allowed = 0
+        self.loaded_bytes = 0
+
+    async def attach(self, context: BrowserContext):
+        if BLOCKED_RESOURCE_TYPES or BLOCK_TRACKERS:
+            await context.route("**/*", self.handle)
+        context.on("response", self.on_response)
+
+    def reason(self, url: str, resource_type: str) -> Optional[str]:
+        if any(pattern in url for pattern in ALLOWED_URL_PATTERNS):
+            return None
+        if resource_type in BLOCKED_RESOURCE_TYPES:
+            return resource_type
+        if BLOCK_TRACKERS and any(pattern in url for pattern in TRACKER_URL_PATTERNS):
+            return "tracker"
+        return None
+
+    async def handle(self, route: Route):
+        request = route.request
+        reason = self.reason(request.url, request.resource_type)
+        if reason is None:
+            self.allowed += 1
+            await route.continue_()
+            return
+        self.blocked[reason] = self.blocked.get(reason, 0) + 1
+        self.blocked_bytes_estimate += TYPICAL_BYTES.get(request.resource_type, 5_000)
+        await route.abort("blockedbyclient")
+
+    def on_response(self, response):
+        try:
+            self.loaded_bytes += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "blocked_requests": sum(self.blocked.values()),
+            "blocked_by_reason": dict(self.blocked),
+            "blocked_bytes_estimate": self.blocked_bytes_estimate,
+            "allowed_requests": self.allowed,
+            "loaded_bytes": self.loaded_bytes,
+        }
+
+
+class BrowserSessionManager:
+    """
+    Keeps one Chromium alive for the lifetime of the MCP server and opens a fresh
+    context per session from the account's stored `storage_state`. The login form
+    is only used when no stored session exists or LinkedIn no longer accepts it.
+    """
+
+    def __init__(self, session_dir: Path):
+        self.session_dir = Path(session_dir)
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+        self.blockers = weakref.WeakKeyDictionary()
+
+    def state_path(self, email: str) -> Path:
+        # Hashed so the account e-mail does not appear in file names
+        digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()[:16]
+        return self.session_dir / f"storage_state_{digest}.json"
+
+    async def browser(self):
+        """Shared browser, launched on first use and relaunched if it crashed"""
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                headless_mode = os.getenv("HEADLESS", "true").lower() == "true"
+                self._browser = await self._playwright.chromium.launch(
+                    headless=headless_mode,
+                    args=['--disable-blink-features=AutomationControlled']
+                )
+                logger.info("Browser launched")
+            return self._browser
+
+    async def new_context(self, storage_state: Optional[Path] = None) -> BrowserContext:
+        browser = await self.browser()
+        context = await browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            storage_state=str(storage_state) if storage_state else None
+        )
+        # Routes apply to every page of the context, including pooled tabs
+        blocker = ResourceBlocker()
+        await blocker.attach(context)
+        self.blockers[context] = blocker
+        return context
+
+    def network_stats(self, context: BrowserContext) -> Dict[str, Any]:
+        blocker = self.blockers.get(context)
+        return blocker.stats() if blocker else {}
+
+    async def save_state(self, context: BrowserContext, email: str):
+        """Persist cookies and localStorage (readable by the owner only: they grant account access)"""
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        path = self.state_path(email)
+        tmp_path = path.with_suffix(".tmp")
+        await context.storage_state(path=str(tmp_path))
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+
+    def forget(self, email: str):
+        self.state_path(email).unlink(missing_ok=True)
+
+    async def resume(self, email: str, timings: WaitTimings):
+        """Open a context from the stored session. Returns (context, page), or None if missing or expired"""
+        path = self.state_path(email)
+        if not path.exists():
+            return None
+        context = await self.new_context(storage_state=path)
+        try:
+            page = await context.new_page()
+            await page.goto('https://www.linkedin.com/feed/', wait_until='domcontentloaded', timeout=30000)
+            redirected = any(marker in page.url for marker in ('/login', '/authwall', '/checkpoint', '/uas/'))
+            if not redirected and await timings.selector(page, "feed_logged_in", LOGGED_IN_SELECTOR, timeout=10000):
+                return context, page
+        except Exception as e:
+            logger.warning(f"Stored session check failed: {e}")
+        logger.info("Stored session expired, logging in again")
+        await context.close()
+        self.forget(email)
+        return None
+
+    async def login(self, email: str, password: str, timings: WaitTimings):
+        """Log in through the form. Returns (context, page, logged_in)"""
+        context = await self.new_context()
+        try:
+            page = await context.new_page()
+            
+            await page.goto('https://www.linkedin.com/login', wait_until='domcontentloaded')
+            await timings.selector(page, "login_form", LOGIN_FORM_SELECTOR, state="visible")
+            
+            await page.fill('input[name="session_key"]', email)
+            await page.fill('input[name="session_password"]', password)
+            await page.click('button[type="submit"]')
+            
+            # Check for successful login indicators (waits for the navigation to complete)
+            is_logged_in = await timings.selector(page, "logged_in", LOGGED_IN_SELECTOR, timeout=15000)
+        except BaseException:
+            # The browser outlives this login: a failed attempt must not leave its context open
+            await self.close_context(context)
+            raise
+        return context, page, is_logged_in or 'feed' in page.url
+
+    async def close_context(self, context: BrowserContext):
+        """Close a context, logging instead of raising (it may already be gone)"""
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"Could not close browser context: {e}")
+
+    async def shutdown(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+session_manager = BrowserSessionManager(SESSION_DIR)
 
 # ============================================================================
 # MCP TOOLS
@@ -58,82 +526,68 @@ async def scroll_page_gradually(page: Page, num_scrolls: int = 5):
 @app.tool()
 async def login_linkedin(email: str, password: str) -> Dict[str, Any]:
     """
-    Log into LinkedIn with provided credentials
+    Log into LinkedIn with provided credentials.
+    Reuses the stored session of this account when it is still valid
+    (no login form); otherwise logs in and stores the new session.
     
     Args:
         email: LinkedIn account email
         password: LinkedIn account password
         
     Returns:
-        Status message and session ID
+        Status message, session ID and whether a stored session was reused
     """
+    start = time.perf_counter()
+    timings = WaitTimings("login")
+    context = None
     try:
         logger.info(f"Initiating LinkedIn login for {email}")
         
-        playwright = await async_playwright().start()
-        headless_mode = os.getenv("HEADLESS", "true").lower() == "true"
-        browser = await playwright.chromium.launch(
-            headless=headless_mode,
-            args=['--disable-blink-features=AutomationControlled']
-        )
-        
-        context = await browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        )
-        
-        page = await context.new_page()
-        
-        await page.goto('https://www.linkedin.com/login', wait_until='domcontentloaded')
-        await wait_for_page_load(page)
-        
-        await page.fill('input[name="session_key"]', email)
-        await page.fill('input[name="session_password"]', password)
-        await page.click('button[type="submit"]')
+        resumed = await session_manager.resume(email, timings)
+        if resumed:
+            context, page = resumed
+            reused = True
+        else:
+            context, page, is_logged_in = await session_manager.login(email, password, timings)
+            reused = False
+            if not is_logged_in:
+                # Take screenshot of failure
+                debug_dir = Path("debug_screenshots")
+                debug_dir.mkdir(exist_ok=True)
+                await page.screenshot(path=str(debug_dir / f"login_fail_{id(context)}.png"))
+                current_url = page.url
+                await session_manager.close_context(context)
+                return {
+                    "success": False,
+                    "message": f"Login failed. Current URL: {current_url}. Check debug_screenshots."
+                }
+
+        await session_manager.save_state(context, email)
+        login_seconds = round(time.perf_counter() - start, 2)
+        logger.info(f"LinkedIn login successful ({'stored session' if reused else 'login form'}, {login_seconds}s)")
         
-        # Wait for navigation to complete
-        await asyncio.sleep(3)
+        session_id = f"session_{id(context)}"
+        _browser_context[session_id] = {
+            'browser': await session_manager.browser(),
+            'context': context,
+            'page': page,
+            'email': email
+        }
         
-        # Check for successful login indicators
-        try:
-            # Wait for either feed or global nav
-            await page.wait_for_selector('.global-nav__me-photo, .feed-identity-module, #global-nav', timeout=10000)
-            is_logged_in = True
-        except:
-            is_logged_in = False
-
-        current_url = page.url
-        if is_logged_in or 'feed' in current_url:
-            logger.info("LinkedIn login successful")
-            
-            session_id = f"session_{id(browser)}"
-            _browser_context[session_id] = {
-                'playwright': playwright,
-                'browser': browser,
-                'context': context,
-                'page': page
-            }
-            
-            return {
-                "success": True,
-                "message": "Successfully logged into LinkedIn",
-                "session_id": session_id
-            }
-        else:
-            # Take screenshot of failure
-            debug_dir = Path("debug_screenshots")
-            debug_dir.mkdir(exist_ok=True)
-            await page.screenshot(path=str(debug_dir / f"login_fail_{id(browser)}.png"))
-            
-            await browser.close()
-            await playwright.stop()
-            return {
-                "success": False,
-                "message": f"Login failed. Current URL: {current_url}. Check debug_screenshots."
-            }
+        return {
+            "success": True,
+            "message": "Successfully logged into LinkedIn",
+            "session_id": session_id,
+            "reused_session": reused,
+            "login_seconds": login_seconds,
+            "timings": timings.report()
+        }
             
     except Exception as e:
         logger.error(f"LinkedIn login failed: {e}")
+        # A context opened here but not registered as a session would never be closed
+        if context is not None and not any(s['context'] is context for s in _browser_context.values()):
+            await session_manager.close_context(context)
         return {
             "success": False,
             "message": f"Login error: {str(e)}"
@@ -156,7 +610,6 @@ async def extract_all_search_profiles_with_images(
     Returns:
         success, list of ALL profiles (rank, name, url, location, imageUrl), count, message
     """
-    import random
     try:
         if session_id not in _browser_context:
             return {
@@ -166,15 +619,14 @@ async def extract_all_search_profiles_with_images(
             }
 
         page = _browser_context[session_id]['page']
+        timings = WaitTimings("search")
 
         logger.info(f"🔍 Navigating to search results: {search_url}")
         await page.goto(search_url, wait_until='domcontentloaded', timeout=30000)
-        await wait_for_page_load(page)
+        await timings.selector(page, "results_page1", SEARCH_RESULT_SELECTOR)
 
-        # Initial scroll to load all profiles on first page
-        await asyncio.sleep(2)
-        await scroll_page_gradually(page, num_scrolls=3)
-        await asyncio.sleep(1)
+        # Scroll until the pagination bar renders: every result card above it is then in the DOM
+        await timings.scroll_to(page, "pagination_page1", SEARCH_PAGINATION_SELECTOR)
 
         collected = []
         seen_urls = set()
@@ -372,9 +824,11 @@ async def extract_all_search_profiles_with_images(
                 # Click next button
                 logger.info(f"🔘 Loading page {pages_processed + 1}...")
                 
+                # First result of the current page, to detect when the next page replaced it
+                first_url = await page.evaluate(FIRST_RESULT_URL_JS, SEARCH_RESULT_SELECTOR)
+                
                 try:
                     await button.scroll_into_view_if_needed()
-                    await asyncio.sleep(0.5)
                     await button.click()
                 except Exception as e:
                     logger.warning(f"Click failed, trying JS: {e}")
@@ -383,13 +837,14 @@ async def extract_all_search_profiles_with_images(
                         if (btn && !btn.disabled) btn.click();
                     }}''')
                 
-                # Wait for page load and new content
-                await asyncio.sleep(2.5 + random.random() * 1.5)
-                await wait_for_page_load(page, timeout=10000)
-                
-                # Scroll to load all profiles on this page
-                await scroll_page_gradually(page, num_scrolls=3)
-                await asyncio.sleep(1)
+                # Wait until the results list shows the next page, then for all its cards
+                page_no = pages_processed + 1
+                await timings.function(
+                    page, f"results_page{page_no}",
+                    f"([sel, previous]) => ({FIRST_RESULT_URL_JS})(sel) !== previous",
+                    arg=[SEARCH_RESULT_SELECTOR, first_url]
+                )
+                await timings.scroll_to(page, f"pagination_page{page_no}", SEARCH_PAGINATION_SELECTOR)
                 
                 pages_processed += 1
                 
@@ -424,11 +879,8 @@ async def extract_all_search_profiles_with_images(
                     if not button:
                         break
                 
-                await asyncio.sleep(1 + random.random() * 1.0)
-                
             except Exception as e:
                 logger.error(f"Error during pagination: {e}")
-                await asyncio.sleep(2.0)
                 break
 
         # Final results
@@ -446,7 +898,8 @@ async def extract_all_search_profiles_with_images(
                 "profiles": collected,
                 "count": len(collected),
                 "pages_processed": pages_processed,
-                "message": f"Successfully extracted {len(collected)} profiles from {pages_processed} pages"
+                "message": f"Successfully extracted {len(collected)} profiles from {pages_processed} pages",
+                "timings": timings.report()
             }
         else:
             # Debug: save page state
@@ -498,157 +951,117 @@ async def extract_education_data(
     Returns:
         Dictionary with raw education data (school, degree, dates)
     """
-    import random
-    
-    try:
-        if session_id not in _browser_context:
-            return {
-                "success": False,
-                "message": "Invalid session_id. Please login first.",
-                "education": []
-            }
+    if session_id not in _browser_context:
+        return {
+            "success": False,
+            "message": "Invalid session_id. Please login first.",
+            "education": []
+        }
 
-        page = _browser_context[session_id]['page']
-        
-        logger.info(f"🎓 Navigating to profile: {profile_url}")
-        await page.goto(profile_url, wait_until='domcontentloaded', timeout=30000)
-        await wait_for_page_load(page)
-        
-        # Wait for initial content to load
-        await asyncio.sleep(2 + random.random())
-        
-        # Scroll down gradually to trigger lazy loading of education section
-        logger.info("Scrolling to load education section...")
-        for i in range(5):
-            scroll_amount = 600 * (i + 1)
-            await page.evaluate(f'window.scrollTo(0, {scroll_amount})')
-            await asyncio.sleep(0.8 + random.random() * 0.5)
-        
-        # Scroll to bottom to ensure everything is loaded
-        await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-        await asyncio.sleep(1.5)
-        
-        # Scroll back up slightly to education section
-        await page.evaluate('window.scrollTo(0, document.body.scrollHeight * 0.5)')
-        await asyncio.sleep(1)
-        
-        # Extract education data - ONLY from Education section
-        education_data = await page.evaluate('''() => {
-            const educations = [];
-
-            console.log("=== Extracting Education CLEAN ===");
-
-            // Locate the EDUCATION SECTION
-            let eduSection = document.querySelector('section[id*="education"]');
-
-            if (!eduSection) {
-                const allSections = document.querySelectorAll("section");
-                for (const sec of allSections) {
-                    const h2 = sec.querySelector("h2");
-                    if (h2 && h2.textContent.toLowerCase().includes("education")) {
-                        eduSection = sec;
-                        break;
-                    }
-                }
-            }
+    return await extract_education_in_pool(get_page_pool(session_id), profile_url)
 
-            if (!eduSection) {
-                console.log("❌ No education section found");
-                return [];
-            }
 
-            // Extract each education item cleanly
-            const items = eduSection.querySelectorAll(
-                "div.display-flex.flex-row.justify-space-between"
-            );
+@app.tool()
+async def extract_education_batch(
+    session_id: str,
+    profile_urls: List[str],
+    ctx: Context,
+    concurrency: int = 0
+) -> Dict[str, Any]:
+    """
+    Extract education data from many profiles in parallel tabs.
+    Each finished profile is streamed back as a progress notification whose
+    message is the JSON result ({"url", "success", "education", "message"}).
+    
+    Args:
+        session_id: Session ID from login_linkedin
+        profile_urls: Full LinkedIn profile URLs
+        concurrency: Number of tabs used at once (0 = LINKEDIN_PAGE_POOL_SIZE)
+        
+    Returns:
+        success, results keyed by profile URL, count and failed count
+    """
+    if session_id not in _browser_context:
+        return {
+            "success": False,
+            "message": "Invalid session_id. Please login first.",
+            "results": {}
+        }
 
-            items.forEach((block) => {
-                try {
-                    let school = null;
-                    let degree = null;
-                    let date_range = null;
-
-                    // SCHOOL: First aria-hidden span
-                    const schoolEl = block.querySelector('span[aria-hidden="true"]');
-                    if (schoolEl) school = schoolEl.textContent.trim();
-
-                    // DEGREE: nested visually-hidden span inside .t-14.t-normal
-                    const degreeEl = block.querySelector(
-                        "span.t-14.t-normal span.visually-hidden"
-                    );
-                    if (degreeEl) degree = degreeEl.textContent.trim();
-
-                    // DATE RANGE
-                    const dateEl = block.querySelector("span.pvs-entity__caption-wrapper");
-                    if (dateEl) date_range = dateEl.textContent.trim();
-
-                    // Add only if meaningful (ignore empty garbage entries)
-                    if (school || degree || date_range) {
-                        educations.push({
-                            school: school || null,
-                            degree: degree || null,
-                            date_range: date_range || null
-                        });
-                    }
+    pool = get_page_pool(session_id)
+    workers = max(1, min(concurrency or pool.size, pool.size, len(profile_urls) or 1))
+    semaphore = asyncio.Semaphore(workers)
+    results = {}
+    total = len(profile_urls)
+    logger.info(f"🎓 Extracting education for {total} profiles across {workers} tabs")
 
-                } catch (err) {
-                    console.log("Error parsing education block", err);
-                }
-            });
+    async def process(index: int, url: str):
+        async with semaphore:
+            # Stagger the first visits so the tabs do not hit LinkedIn at the same instant
+            if index < workers:
+                await asyncio.sleep(index * (0.5 + random.random()))
+            result = await extract_education_in_pool(pool, url)
+        results[url] = result
+        await ctx.report_progress(len(results), total, json.dumps({"url": url, **result}, ensure_ascii=False))
 
-            return educations;
-        }''')
+    await asyncio.gather(*(process(i, url) for i, url in enumerate(profile_urls)))
 
+    failed = sum(1 for r in results.values() if not r["success"])
+    return {
+        "success": True,
+        "results": {url: results[url] for url in profile_urls},
+        "count": total,
+        "failed": failed,
+        "message": f"Extracted education for {total - failed}/{total} profiles"
+    }
 
-        
-        logger.info(f"📚 Found {len(education_data)} education entries")
-        
-        return {
-            "success": True,
-            "education": education_data,
-            "message": f"Extracted {len(education_data)} education entries"
-        }
-        
-    except Exception as e:
-        logger.error(f"Failed to extract education: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            "success": False,
-            "education": [],
-            "message": f"Error: {str(e)}"
-        }
+
+@app.tool()
+async def get_network_stats(session_id: str) -> Dict[str, Any]:
+    """
+    Requests blocked (by reason) and loaded so far by a session's browser context.
+    
+    Args:
+        session_id: Session ID from login_linkedin
+    """
+    if session_id not in _browser_context:
+        return {"success": False, "message": "Invalid session_id"}
+    return {"success": True, **session_manager.network_stats(_browser_context[session_id]['context'])}
 
 
 @app.tool()
-async def close_browser(session_id: str) -> Dict[str, Any]:
-    """Close browser and cleanup resources"""
+async def close_browser(session_id: str, shutdown: bool = False) -> Dict[str, Any]:
+    """
+    Close a session's browser context, saving its refreshed cookies first.
+    The shared browser stays up for the next session unless shutdown is true.
+    """
     try:
         if session_id not in _browser_context:
             return {"success": False, "message": "Invalid session_id"}
         
-        context_data = _browser_context[session_id]
+        context_data = _browser_context.pop(session_id)
         
-        try:
-            await context_data['context'].close()
-        except:
-            pass
+        if 'page_pool' in context_data:
+            await context_data['page_pool'].close()
         
         try:
-            await context_data['browser'].close()
-        except:
-            pass
+            await session_manager.save_state(context_data['context'], context_data['email'])
+        except Exception as e:
+            logger.warning(f"Could not save session state: {e}")
+        
+        network = session_manager.network_stats(context_data['context'])
         
         try:
-            await context_data['playwright'].stop()
+            await context_data['context'].close()
         except:
             pass
         
-        del _browser_context[session_id]
+        if shutdown:
+            await session_manager.shutdown()
         
-        logger.info(f"Browser session closed: {session_id}")
+        logger.info(f"Browser session closed: {session_id} (network: {network})")
         
-        return {"success": True, "message": "Browser closed"}
+        return {"success": True, "message": "Browser closed" if shutdown else "Session closed", "network": network}
         
     except Exception as e:
         logger.error(f"Error closing browser: {e}")
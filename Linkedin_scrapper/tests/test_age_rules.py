@@ -0,0 +1,95 @@
+import pytest
+
+from app.utils.age_rules import classify_level, estimate_age_from_rules, parse_end_year
+
+CURRENT_YEAR = 2025
+
+
+@pytest.mark.parametrize("date_range, expected", [
+    # English
+    ("Sep 2019 - Jul 2021", 2021),
+    ("Oct 2024 - Present", 2025),
+    ("2018 - Current", 2025),
+    ("2020 - now", 2025),
+    ("2023", 2023),
+    ("2015 – 2019", 2019),
+    # French
+    ("sept. 2016 – juin 2019", 2019),
+    ("2022 - aujourd'hui", 2025),
+    ("2022 - aujourd’hui", 2025),
+    ("2021 - auj.", 2025),
+    ("janv. 2023 - en cours", 2025),
+    ("2020 - actuellement", 2025),
+    ("2017 - ce jour", 2025),
+    # Expected graduation a few years ahead is kept, far future years are not
+    ("2024 - 2027", 2027),
+    ("2024 - 2099", 2024),
+    # Present marker without a start year
+    ("Present", 2025),
+    # No date at all
+    (None, None),
+    ("", None),
+    ("Knowledge Management", None),
+    ("Représentation des connaissances", None),
+])
+def test_parse_end_year(date_range, expected):
+    assert parse_end_year(date_range, CURRENT_YEAR) == expected
+
+
+@pytest.mark.parametrize("degree, school, expected", [
+    ("Baccalauréat Sciences Mathématiques", None, "bac"),
+    ("High School Diploma", None, "bac"),
+    (None, "Lycée Lyautey", "bac"),
+    ("Classes préparatoires MPSI/MP", None, "prep"),
+    ("DUT Génie Informatique", None, "prep"),
+    ("BTS Comptabilité", None, "prep"),
+    (None, "CPGE Moulay Youssef", "prep"),
+    ("Licence en Économie", None, "bachelor"),
+    ("Bachelor of Science - BS, Computer Science", None, "bachelor"),
+    ("BSc Mathematics", None, "bachelor"),
+    ("Master, Knowledge Management", None, "master"),
+    ("Master en Représentation des connaissances", None, "master"),
+    ("Diplôme d'ingénieur, Génie logiciel", None, "master"),
+    ("MBA", None, "master"),
+    (None, "École Nationale Supérieure des Ingénieurs", "master"),
+    ("Doctorat en médecine", None, "medicine"),
+    ("Doctor of Pharmacy - PharmD", None, "medicine"),
+    ("PhD, Machine Learning", None, "phd"),
+    ("Doctorat en informatique", None, "phd"),
+    ("Certificate in Project Management", None, None),
+    (None, None, None),
+])
+def test_classify_level(degree, school, expected):
+    assert classify_level(degree, school) == expected
+
+
+@pytest.mark.parametrize("education, expected", [
+    # One dated entry per level: age = current year - (graduation year - typical age)
+    ([{"degree": "Master, Data Science", "date_range": "Sep 2019 - Jul 2021"}], (28, "rules")),
+    ([{"degree": "Licence en Économie", "date_range": "sept. 2016 – juin 2019"}], (28, "rules")),
+    ([{"degree": "Baccalauréat", "date_range": "2023"}], (20, "rules")),
+    ([{"degree": "PhD, Physics", "date_range": "2018 - 2022"}], (31, "rules")),
+    # Still studying: graduates this year at the earliest
+    ([{"degree": "Master", "date_range": "2024 - aujourd'hui"}], (24, "rules")),
+    ([{"degree": "Bachelor of Science", "date_range": "Oct 2024 - Present"}], (22, "rules")),
+    # Consistent entries: the latest graduation decides
+    ([{"degree": "Baccalauréat", "date_range": "2014"},
+      {"degree": "Licence", "date_range": "2014 - 2017"},
+      {"degree": "Master", "date_range": "2017 - 2019"}], (30, "rules")),
+    # Undated entries never count, even when their title contains a marker-like word
+    ([{"degree": "Master, Knowledge Management", "date_range": None}],
+     (None, "no dated entry with a known degree")),
+    ([{"degree": "Master en Représentation des connaissances", "date_range": None}],
+     (None, "no dated entry with a known degree")),
+    # Unknown level
+    ([{"degree": "Certificate in Project Management", "date_range": "2020"}],
+     (None, "no dated entry with a known degree")),
+    ([], (None, "no dated entry with a known degree")),
+    # Entries that disagree go to the LLM
+    ([{"degree": "Baccalauréat", "date_range": "2005"},
+      {"degree": "Master", "date_range": "2021 - 2023"}], (None, "entries disagree by 12 years")),
+    # Implausible results go to the LLM
+    ([{"degree": "Baccalauréat", "date_range": "2027"}], (None, "implausible age 16")),
+])
+def test_estimate_age_from_rules(education, expected):
+    assert estimate_age_from_rules(education, CURRENT_YEAR) == expected
@@ -1,5 +1,7 @@
 from fastapi import FastAPI, Request, File, UploadFile, Form
+from typing import List, Optional
 from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import shutil
@@ -8,11 +10,21 @@ from app.utils.metadata import read_metadata
 from app.utils.upscaling_realesrgan import upscale_image_realesrgan
 from app.utils.cleaning import clean_image
 from app.utils.dpi_check import check_upscale
-from app.utils.upscaling_with_Lanczos import upscale_lanczos
-from app.utils.export_pdf_x1a import convert_tiff_to_pdfx1a
+from app.utils.backend import upscale_lanczos, print_pipeline, BACKEND
+from app.utils.export_pdf_x1a import convert_tiff_to_pdfx1a, convert_tiffs_to_pdfx1a
+from app.utils.export_fanout import export_deliverables, EXPORT_FORMATS
+from app.utils.scheduler import scheduler, predict_job, choose_tile_size
+from app.utils.job_stats import job_stats
+from app.utils.thread_budget import configure_from_env, worker_threads
+from app.utils.upscale_planner import plan_upscale, execute_plan
+from app.utils.analysis import analyze_image, analyze_folder
+from app.utils.vectorize import vectorize_image
 
 app = FastAPI()
 
+# Share the CPU cores between concurrent jobs and the native libraries' thread pools
+configure_from_env()
+
 # Mount static files to serve uploaded and upscaled images
 app.mount("/temp_uploads", StaticFiles(directory="temp_uploads"), name="temp_uploads")
 
@@ -27,6 +39,25 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/jobs/status")
+async def jobs_status():
+    """Budget mémoire, traitements en cours et profondeur de la file d'attente."""
+    return scheduler.status()
+
+@app.get("/jobs/throughput")
+async def jobs_throughput():
+    """Measured megapixels per second for each stage on this host."""
+    return await run_in_threadpool(job_stats.summary)
+
+@app.post("/predict")
+async def predict_route(filename: str = Form(...), stages: List[str] = Form(...)):
+    """Predicted duration and peak memory of a job before submitting it (stages like "upscale:6", "cmyk")."""
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    try:
+        return await run_in_threadpool(predict_job, file_path, stages)
+    except Exception as e:
+        return {"error": str(e)}
+
 @app.post("/upload", response_class=HTMLResponse)
 async def upload_image(request: Request, file: UploadFile = File(...)):
     file_location = os.path.join(UPLOAD_DIR, file.filename)
@@ -49,12 +80,30 @@ async def upload_image(request: Request, file: UploadFile = File(...)):
         })
 
 @app.post("/upscale", response_class=HTMLResponse)
-async def upscale_image(request: Request, filename: str = Form(...)):
+async def upscale_image(
+    request: Request,
+    filename: str = Form(...),
+    support_type: Optional[str] = Form(None),
+    width_m: Optional[float] = Form(None),
+    height_m: Optional[float] = Form(None)
+):
     file_path = os.path.join(UPLOAD_DIR, filename)
     
     try:
-        # Upscale the image
-        upscaled_path = upscale_image_realesrgan(file_path, UPLOAD_DIR, outscale=6)
+        if support_type and width_m and height_m:
+            # Plan the cheapest chain reaching the recommended DPI for this print size
+            results = check_upscale(file_path, width_m, height_m, support_type, display=False)
+            plan = plan_upscale(results)
+            max_scale = max([step["scale"] for step in plan["steps"] if step["method"] == "ai"] or [results["Upscale factor suggested"]])
+            async with scheduler.reserve(file_path, "upscale", scale=max_scale):
+                upscaled_path = await run_in_threadpool(execute_plan, plan, file_path, UPLOAD_DIR)
+            subtitle = (f"Upscaled x{plan['factor_needed']} via {plan['chain']} for {plan['recommended_dpi']} DPI "
+                        f"({plan['pixels_saved_pct']}% fewer pixels than x6, ~{plan['time_saved_seconds']}s saved)")
+        else:
+            # Upscale the image
+            async with scheduler.reserve(file_path, "upscale", scale=6):
+                upscaled_path = await run_in_threadpool(upscale_image_realesrgan, file_path, UPLOAD_DIR, outscale=6)
+            subtitle = "Your image has been successfully upscaled by 600%"
         upscaled_filename = os.path.basename(upscaled_path)
         
         # Get metadata for the upscaled image (Result)
@@ -66,7 +115,7 @@ async def upscale_image(request: Request, filename: str = Form(...)):
             "upscaled_filename": upscaled_filename,
             "metadata": metadata,
             "title": "Upscaling Complete",
-            "subtitle": "Your image has been successfully upscaled by 600%",
+            "subtitle": subtitle,
             "icc_profiles": get_icc_profiles()
         })
     except Exception as e:
@@ -75,6 +124,99 @@ async def upscale_image(request: Request, filename: str = Form(...)):
             "error": f"Upscaling failed: {str(e)}"
         })
 
+@app.post("/analyze")
+async def analyze_route(filename: str = Form(...), color_method: str = Form("histogram")):
+    """Vectorisability score of one uploaded image (cached by content hash)."""
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    try:
+        result = await run_in_threadpool(analyze_image, file_path, color_method=color_method)
+        if result is None:
+            return {"error": f"Unable to load {filename}"}
+        return {"file": filename, **result}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/analyze_batch")
+async def analyze_batch_route(folder: str = Form(""), recursive: bool = Form(False)):
+    """Screen every image of a folder inside temp_uploads across a process pool."""
+    upload_root = os.path.realpath(UPLOAD_DIR)
+    folder_path = os.path.realpath(os.path.join(upload_root, folder))
+    if os.path.commonpath([upload_root, folder_path]) != upload_root or not os.path.isdir(folder_path):
+        return {"error": f"Invalid folder: {folder}"}
+    try:
+        results = await run_in_threadpool(analyze_folder, folder_path, recursive=recursive)
+        return {
+            "folder": folder,
+            "count": len(results),
+            "vectorisable": sum(1 for r in results if r.get("decision") == "Vectorisable"),
+            "results": results
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/vectorize", response_class=HTMLResponse)
+async def vectorize_route(
+    request: Request,
+    filename: str = Form(...),
+    n_colors: int = Form(8),
+    icc_profile: str = Form("CoatedFOGRA39.icc"),
+    width_m: Optional[float] = Form(None),
+    height_m: Optional[float] = Form(None),
+    force: bool = Form(False)
+):
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    profile_path = os.path.join("app", "utils", "profiles", icc_profile)
+
+    try:
+        # Only flat, logo-style images are traced; photos keep the raster pipeline
+        analysis = await run_in_threadpool(analyze_image, file_path)
+        if analysis is None:
+            raise ValueError("Unable to analyze the image")
+        if analysis["decision"] != "Vectorisable" and not force:
+            raise ValueError(f"Image is not vectorisable (score {analysis['final_score']:.2f}), "
+                             f"use the upscaling pipeline instead")
+
+        base_name = filename.rsplit('.', 1)[0]
+        svg_filename = f"vector_{base_name}.svg"
+        pdf_filename = f"vector_{base_name}.pdf"
+
+        async with scheduler.reserve(file_path, "vectorize"):
+            result = await run_in_threadpool(
+                vectorize_image, file_path,
+                os.path.join(UPLOAD_DIR, svg_filename),
+                output_pdf=os.path.join(UPLOAD_DIR, pdf_filename),
+                icc_profile_path=profile_path,
+                n_colors=n_colors, width_m=width_m, height_m=height_m
+            )
+
+        metadata = {
+            "Format": "SVG / PDF/X-1a (vector)",
+            "Colors": result["colors"],
+            "Paths": result["paths"],
+            "Nodes": result["nodes"],
+            "SVG size": f"{result['svg_bytes'] / 1024:.1f} KB",
+            "PDF size": f"{result['pdf_bytes'] / 1024:.1f} KB",
+            "Vectorisation score": round(analysis["final_score"], 2)
+        }
+
+        return templates.TemplateResponse("upscale_result.html", {
+            "request": request,
+            "original_filename": filename,
+            "upscaled_filename": svg_filename,
+            "metadata": metadata,
+            "title": "Vectorization Complete",
+            "subtitle": f"Traced into {result['colors']} colors, no upscaling needed",
+            "show_print_options": False,
+            "vector_result": True,
+            "pdf_download": pdf_filename,
+            "icc_profiles": get_icc_profiles()
+        })
+    except Exception as e:
+        return templates.TemplateResponse("index.html", {
+            "request": request,
+            "error": f"Vectorization failed: {str(e)}"
+        })
+
 @app.post("/enhance", response_class=HTMLResponse)
 async def enhance_image(request: Request, filename: str = Form(...), original_filename: str = Form(...)):
     file_path = os.path.join(UPLOAD_DIR, filename)
@@ -83,7 +225,8 @@ async def enhance_image(request: Request, filename: str = Form(...), original_fi
         # Clean the image (Enhancement)
         cleaned_filename = f"enhanced_{filename}"
         cleaned_path = os.path.join(UPLOAD_DIR, cleaned_filename)
-        clean_image(file_path, cleaned_path)
+        async with scheduler.reserve(file_path, "enhance"):
+            await run_in_threadpool(clean_image, file_path, cleaned_path)
         
         # Get metadata for the enhanced image (Result)
         metadata = read_metadata(cleaned_path)
@@ -150,7 +293,8 @@ async def upscale_lanczos_route(
         lanczos_filename = f"lanczos_{filename}"
         lanczos_path = os.path.join(UPLOAD_DIR, lanczos_filename)
         
-        upscale_lanczos(file_path, lanczos_path, scale_factor=scale_factor)
+        async with scheduler.reserve(file_path, "lanczos", scale=scale_factor):
+            await run_in_threadpool(upscale_lanczos, file_path, lanczos_path, scale_factor=scale_factor)
         
         # Get metadata for the new image
         metadata = read_metadata(lanczos_path)
@@ -178,7 +322,7 @@ async def upscale_lanczos_route(
 
 # --- Soft Proofing ---
 from app.utils.soft_proof import soft_proof_rgb
-from app.utils.color_conversion import convert_to_cmyk
+from app.utils.backend import convert_to_cmyk
 import glob
 
 def get_icc_profiles():
@@ -206,7 +350,8 @@ async def soft_proof_route(
         proof_filename = f"proof_{filename}"
         proof_path = os.path.join(UPLOAD_DIR, proof_filename)
         
-        soft_proof_rgb(file_path, cmyk_profile_path=profile_path, output_path=proof_path)
+        async with scheduler.reserve(file_path, "soft_proof"):
+            await run_in_threadpool(soft_proof_rgb, file_path, cmyk_profile_path=profile_path, output_path=proof_path)
         
         # Get metadata
         metadata = read_metadata(proof_path)
@@ -251,7 +396,10 @@ async def convert_cmyk_route(
         cmyk_filename = f"cmyk_{filename.rsplit('.', 1)[0]}.tiff"
         output_path = os.path.join(UPLOAD_DIR, cmyk_filename)
         
-        convert_to_cmyk(file_path, output_path, cmyk_profile_path=profile_path)
+        # One pass when the whole image fits in the free memory budget, tiles otherwise
+        tile_size, extra_bytes = choose_tile_size(file_path)
+        async with scheduler.reserve(file_path, "cmyk", extra_bytes=extra_bytes):
+            await run_in_threadpool(convert_to_cmyk, file_path, output_path, cmyk_profile_path=profile_path, tile_size=tile_size)
         
         # Get metadata of the new CMYK file
         metadata = read_metadata(output_path)
@@ -294,7 +442,8 @@ async def export_pdfx1a_route(
         pdf_filename = f"{base_name}.pdf"
         output_path = os.path.join(UPLOAD_DIR, pdf_filename)
         
-        convert_tiff_to_pdfx1a(file_path, output_path, icc_profile_path=profile_path)
+        async with scheduler.reserve(file_path, "pdfx"):
+            await run_in_threadpool(convert_tiff_to_pdfx1a, file_path, output_path, icc_profile_path=profile_path)
         
         # Get metadata
         metadata = read_metadata(file_path) # Metadata of the CMYK file
@@ -325,3 +474,75 @@ async def export_pdfx1a_route(
             "cmyk_download": filename,
             "icc_profiles": get_icc_profiles()
         })
+
+@app.post("/print_ready")
+async def print_ready_route(
+    filename: str = Form(...),
+    icc_profile: str = Form(...),
+    scale_factor: Optional[float] = Form(None),
+    sharpen: bool = Form(True)
+):
+    """Lanczos resize, sharpening, CMYK TIFF and PDF/X-1a in one call, with the configured backend."""
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    profile_path = os.path.join("app", "utils", "profiles", icc_profile)
+    base_name = filename.rsplit('.', 1)[0]
+    tiff_path = os.path.join(UPLOAD_DIR, f"print_{base_name}.tiff")
+    pdf_path = os.path.join(UPLOAD_DIR, f"print_{base_name}.pdf")
+    stage = "print_vips" if BACKEND == "vips" else "print"
+
+    try:
+        async with scheduler.reserve(file_path, stage, scale=scale_factor or 1.0):
+            result = await run_in_threadpool(print_pipeline, file_path, tiff_path, profile_path,
+                                             scale_factor=scale_factor, sharpen=sharpen, output_pdf=pdf_path)
+        return {
+            "backend": BACKEND,
+            "cmyk_download": os.path.basename(tiff_path),
+            "pdf_download": os.path.basename(pdf_path),
+            "size": result["size"],
+            "icc_profile": icc_profile
+        }
+    except Exception as e:
+        return {"error": f"Print pipeline failed: {str(e)}"}
+
+@app.post("/export_pdfx1a_multi")
+async def export_pdfx1a_multi_route(
+    filenames: List[str] = Form(...), # CMYK TIFFs, in page order
+    icc_profile: str = Form(...),
+    output_filename: str = Form("campaign_PDFX1a.pdf")
+):
+    """Assemble several CMYK TIFFs into one multi-page PDF/X-1a sharing a single OutputIntent."""
+    file_paths = [os.path.join(UPLOAD_DIR, name) for name in filenames]
+    profile_path = os.path.join("app", "utils", "profiles", icc_profile)
+    output_path = os.path.join(UPLOAD_DIR, os.path.basename(output_filename))
+
+    try:
+        # Pages encodées en parallèle : la réservation couvre `workers` pages à la fois
+        workers = min(len(file_paths), worker_threads())
+        async with scheduler.reserve_pages(file_paths, "pdfx", workers):
+            pages = await run_in_threadpool(convert_tiffs_to_pdfx1a, file_paths, output_path, profile_path,
+                                            workers=workers)
+
+        return {
+            "pdf_download": os.path.basename(output_path),
+            "pages": pages,
+            "icc_profile": icc_profile
+        }
+    except Exception as e:
+        return {"error": f"PDF Export failed: {str(e)}"}
+
+@app.post("/export_all")
+async def export_all_route(
+    filename: str = Form(...), # CMYK master TIFF
+    icc_profile: str = Form(...),
+    formats: List[str] = Form(list(EXPORT_FORMATS))
+):
+    """Decode the CMYK master once and write PDF/X-1a, TIFF, PSD, preview and thumbnail in parallel."""
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    profile_path = os.path.join("app", "utils", "profiles", icc_profile)
+
+    try:
+        async with scheduler.reserve(file_path, "export"):
+            report = await run_in_threadpool(export_deliverables, file_path, UPLOAD_DIR, profile_path, formats)
+        return report
+    except Exception as e:
+        return {"error": f"Export failed: {str(e)}"}
@@ -1,10 +1,98 @@
 from PIL import Image
 import numpy as np
 from skimage import filters
-from collections import Counter
+from collections import Counter, OrderedDict
 import cv2
 from skimage import measure
 import requests
+import hashlib
+import json
+import os
+import inspect
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.utils.thread_budget import detect_cpu_count, process_pool_options
+
+# Extensions analysées par analyze_folder
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+
+# Cache disque des résultats, indexé par le hash du contenu de l'image
+CACHE_DIR = os.getenv("PRINTPREP_ANALYSIS_CACHE", os.path.join(".cache", "analysis"))
+
+# Histogramme couleur : bits conservés par canal (5 -> 32768 cases)
+HISTOGRAM_BITS = 5
+
+# Part des pixels couverte par les couleurs dominantes
+HISTOGRAM_COVERAGE = 0.95
+
+# Délai maximal de téléchargement d'une image distante (secondes)
+DOWNLOAD_TIMEOUT = 30
+
+# Résultats gardés en mémoire (LRU) ; le cache disque assure la persistance
+MEMORY_CACHE_ENTRIES = 1024
+
+_session = None
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()  # analyze_image tourne dans le pool de threads de FastAPI
+
+
+def get_session():
+    """Session HTTP partagée : connexions réutilisées entre les téléchargements."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
+def load_image_bytes(path):
+    """Lit le contenu brut d'une image depuis un chemin local ou une URL."""
+    if path.startswith('http://') or path.startswith('https://'):
+        resp = get_session().get(path, timeout=DOWNLOAD_TIMEOUT)
+        resp.raise_for_status()
+        return resp.content
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_key(digest, params):
+    params_digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{digest}_{params_digest}"
+
+
+def _remember(key, result):
+    with _memory_lock:
+        _memory_cache[key] = result
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def _cache_get(key):
+    with _memory_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        _remember(key, result)
+        return result
+    return None
+
+
+def _cache_put(key, result):
+    _remember(key, result)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = os.path.join(CACHE_DIR, f"{key}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, os.path.join(CACHE_DIR, f"{key}.json"))
+
 
 def analyze_image(image_path,
                   w_color=0.4,
@@ -14,39 +102,42 @@ def analyze_image(image_path,
                   max_edge_density=0.4,
                   max_entropy=8.0,
                   score_threshold=0.7,
-                  analysis_max_dim=500.0):
+                  analysis_max_dim=500.0,
+                  color_method="histogram",
+                  use_cache=True):
     """
     Analyse une image pour déterminer si elle est probablement vectorisable.
-    
+
     Args:
         image_path (str): chemin local ou URL de l'image.
         w_color, w_edge, w_texture (float): poids des métriques.
-        k_clusters (int): nombre de clusters pour K-Means.
+        k_clusters (int): nombre de couleurs maximal pris en compte (et clusters K-Means).
         max_edge_density, max_entropy (float): bornes pour normalisation.
         score_threshold (float): seuil pour la décision finale.
         analysis_max_dim (float): taille max pour redimensionner l'image.
-        
+        color_method (str): "histogram" (rapide) ou "kmeans" (ancienne méthode).
+        use_cache (bool): réutilise le résultat d'une image au contenu identique.
+
     Returns:
         dict: métriques calculées et verdict vectorisation.
     """
-    
-    def load_image(path):
-        """Charge une image depuis un chemin local ou URL."""
+    params = {k: v for k, v in locals().items() if k not in ("image_path", "use_cache")}
+
+    def read_bytes(path):
+        """Lit le contenu brut d'une image depuis un chemin local ou URL."""
         try:
-            if path.startswith('http://') or path.startswith('https://'):
-                resp = requests.get(path)
-                resp.raise_for_status()
-                arr = np.frombuffer(resp.content, np.uint8)
-                img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-            else:
-                img = cv2.imread(path, cv2.IMREAD_COLOR)
-            if img is None:
-                raise ValueError("Impossible de charger l'image.")
-            return img
+            return load_image_bytes(path)
         except Exception as e:
             print(f"Erreur lors du chargement : {e}")
             return None
 
+    def decode_image(data):
+        """Décode l'image (seulement si le résultat n'est pas en cache)."""
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            print("Erreur lors du chargement : Impossible de charger l'image.")
+        return img
+
     def resize_image(img):
         """Redimensionne l'image si nécessaire pour l'analyse."""
         h, w = img.shape[:2]
@@ -60,12 +151,22 @@ def analyze_image(image_path,
         value = max(min_val, min(value, max_val))
         return (value - min_val) / (max_val - min_val)
 
-    def color_complexity(img, k=k_clusters):
+    def color_complexity_kmeans(img, k=k_clusters):
         pixels = img.reshape((-1, 3)).astype(np.float32)
         criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
         _, labels, _ = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
         return len(np.unique(labels))
 
+    def color_complexity_histogram(img, k=k_clusters):
+        """Nombre de couleurs dominantes : cases d'un histogramme 3D couvrant 95 % des pixels."""
+        shift = 8 - HISTOGRAM_BITS
+        q = (img >> shift).reshape(-1, 3).astype(np.int32)
+        bins = (q[:, 0] << (2 * HISTOGRAM_BITS)) | (q[:, 1] << HISTOGRAM_BITS) | q[:, 2]
+        counts = np.sort(np.bincount(bins, minlength=1 << (3 * HISTOGRAM_BITS)))[::-1]
+        covered = np.cumsum(counts)
+        dominant = int(np.searchsorted(covered, HISTOGRAM_COVERAGE * covered[-1])) + 1
+        return min(dominant, k)
+
     def edge_density(img):
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         blur = cv2.GaussianBlur(gray, (5,5), 0)
@@ -76,15 +177,34 @@ def analyze_image(image_path,
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         return measure.shannon_entropy(gray)
 
+    if color_method not in ("histogram", "kmeans"):
+        raise ValueError(f"Méthode de couleur inconnue '{color_method}'.")
+
     # --- Analyse ---
-    img = load_image(image_path)
+    # Le cache est consulté sur le hash des octets bruts, avant tout décodage
+    data = read_bytes(image_path)
+    if data is None:
+        return None
+
+    digest = content_hash(data)
+    key = _cache_key(digest, params)
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            return dict(cached)
+
+    img = decode_image(data)
+    del data
     if img is None:
         return None
 
     img_resized = resize_image(img)
 
     # Calcul métriques brutes
-    metric_colors = color_complexity(img_resized)
+    if color_method == "kmeans":
+        metric_colors = color_complexity_kmeans(img_resized)
+    else:
+        metric_colors = color_complexity_histogram(img_resized)
     metric_edges = edge_density(img_resized)
     metric_texture = texture_entropy(img_resized)
 
@@ -105,14 +225,81 @@ def analyze_image(image_path,
 
     decision = "Vectorisable" if final_score > score_threshold else "Non-Vectorisable"
 
-    # Retour sous forme de dictionnaire
-    return {
-        "num_colors": metric_colors,
-        "edge_density": metric_edges,
-        "entropy": metric_texture,
-        "simplicity_color": simplicity_color,
-        "simplicity_edge": simplicity_edge,
-        "simplicity_texture": simplicity_texture,
-        "final_score": final_score,
-        "decision": decision
-    }
\ No newline at end of file
+    # Retour sous forme de dictionnaire (types natifs, sérialisables en JSON)
+    result = {
+        "num_colors": int(metric_colors),
+        "edge_density": float(metric_edges),
+        "entropy": float(metric_texture),
+        "simplicity_color": float(simplicity_color),
+        "simplicity_edge": float(simplicity_edge),
+        "simplicity_texture": float(simplicity_texture),
+        "final_score": float(final_score),
+        "decision": decision,
+        "content_hash": digest
+    }
+    if use_cache:
+        _cache_put(key, result)
+    return result
+
+
+def cached_analysis(image_path, **kwargs):
+    """Résultat en cache pour ce contenu et ces paramètres, sans décoder l'image (None sinon)."""
+    bound = inspect.signature(analyze_image).bind(image_path, **kwargs)
+    bound.apply_defaults()
+    params = {k: v for k, v in bound.arguments.items() if k not in ("image_path", "use_cache")}
+    return _cache_get(_cache_key(content_hash(load_image_bytes(image_path)), params))
+
+
+def _analyze_for_pool(args):
+    path, kwargs = args
+    try:
+        return analyze_image(path, **kwargs)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def analyze_folder(folder, max_workers=None, recursive=False, **kwargs):
+    """
+    Analyse toutes les images d'un dossier en parallèle (un processus par cœur).
+    Les images déjà analysées (même contenu) sont lues depuis le cache.
+
+    Args:
+        folder (str): dossier à analyser.
+        max_workers (int): nombre de processus (défaut : cœurs disponibles) ; les threads
+                           natifs de chaque processus sont limités en conséquence.
+        recursive (bool): inclut les sous-dossiers.
+        **kwargs: paramètres transmis à analyze_image.
+
+    Returns:
+        list: un dict par image (clé "file" + résultat, ou "error"), trié par nom.
+    """
+    if recursive:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(folder) for name in names]
+    else:
+        paths = [os.path.join(folder, name) for name in os.listdir(folder)]
+    paths = sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS))
+
+    use_cache = kwargs.get("use_cache", True)
+    results = {}
+    jobs = []
+    for path in paths:
+        cached = cached_analysis(path, **kwargs) if use_cache else None
+        if cached is not None:
+            results[path] = dict(cached)
+        else:
+            jobs.append(path)
+
+    if len(jobs) > 1:
+        workers = min(max_workers or detect_cpu_count(), len(jobs))
+        with ProcessPoolExecutor(**process_pool_options(workers)) as pool:
+            results.update(zip(jobs, pool.map(_analyze_for_pool, [(p, kwargs) for p in jobs])))
+    else:
+        for path in jobs:
+            results[path] = _analyze_for_pool((path, kwargs))
+
+    report = []
+    for path in paths:
+        result = results[path] or {"error": "Impossible de charger l'image."}
+        report.append({"file": os.path.relpath(path, folder), **result})
+    print(f"[INFO] {len(paths)} images analysées ({len(paths) - len(jobs)} depuis le cache)")
+    return report
@@ -0,0 +1,73 @@
+# Choix du backend d'exécution des étapes pixel : Pillow (défaut) ou graphe libvips
+from PIL import Image, ImageFilter
+import tempfile
+import os
+from app.utils.upscaling_with_Lanczos import upscale_lanczos as upscale_lanczos_pillow
+from app.utils.color_conversion import convert_to_cmyk as convert_to_cmyk_pillow
+from app.utils.export_pdf_x1a import convert_tiff_to_pdfx1a
+from app.utils.vips_pipeline import (vips_available, upscale_lanczos_vips, convert_to_cmyk_vips,
+                                     print_pipeline_vips)
+
+Image.MAX_IMAGE_PIXELS = None
+
+BACKENDS = ("pillow", "vips")
+
+
+def _backend_from_env():
+    backend = os.getenv("PRINTPREP_BACKEND", "pillow").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"PRINTPREP_BACKEND inconnu '{backend}'. Choisir parmi {list(BACKENDS)}.")
+    if backend == "vips" and not vips_available():
+        print("[WARN] PRINTPREP_BACKEND=vips mais pyvips/libvips est absent : backend Pillow utilisé.")
+        return "pillow"
+    return backend
+
+
+# Backend du déploiement, fixé au démarrage
+BACKEND = _backend_from_env()
+
+
+def upscale_lanczos(image_path, output_path, scale_factor=None, target_size=None):
+    """Redimensionnement Lanczos avec le backend configuré."""
+    fn = upscale_lanczos_vips if BACKEND == "vips" else upscale_lanczos_pillow
+    return fn(image_path, output_path, scale_factor=scale_factor, target_size=target_size)
+
+
+def convert_to_cmyk(image_path, output_path, cmyk_profile_path="app/utils/profiles/USWebCoatedSWOP.icc",
+                    tile_size=2048, tiff_use="delivery"):
+    """Conversion CMJN avec le backend configuré."""
+    fn = convert_to_cmyk_vips if BACKEND == "vips" else convert_to_cmyk_pillow
+    return fn(image_path, output_path, cmyk_profile_path=cmyk_profile_path, tile_size=tile_size, tiff_use=tiff_use)
+
+
+def _print_pipeline_pillow(image_path, output_tiff, cmyk_profile_path, scale_factor=None, target_size=None,
+                           sharpen=True, output_pdf=None):
+    """Même pipeline étape par étape avec Pillow (image complète en mémoire à chaque étape)."""
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_tiff))) as work_dir:
+        rgb_path = os.path.join(work_dir, "print_rgb.tiff")
+        with Image.open(image_path) as img:
+            dpi = img.info.get("dpi")
+            img = img.convert("RGB")
+            if scale_factor or target_size:
+                size = target_size or (int(img.width * scale_factor), int(img.height * scale_factor))
+                img = img.resize(size, Image.LANCZOS)
+            if sharpen:
+                img = img.filter(ImageFilter.UnsharpMask(radius=1, percent=100, threshold=0))
+            save_kwargs = {"dpi": dpi} if dpi else {}
+            img.save(rgb_path, "TIFF", **save_kwargs)
+            size = img.size
+        convert_to_cmyk_pillow(rgb_path, output_tiff, cmyk_profile_path=cmyk_profile_path)
+    if output_pdf:
+        convert_tiff_to_pdfx1a(output_tiff, output_pdf, cmyk_profile_path)
+    return {"tiff": output_tiff, "pdf": output_pdf, "size": size}
+
+
+def print_pipeline(image_path, output_tiff, cmyk_profile_path, scale_factor=None, target_size=None,
+                   sharpen=True, output_pdf=None):
+    """
+    Resize Lanczos + accentuation + CMJN (TIFF) + PDF/X-1a optionnel avec le backend configuré.
+    En vips, les trois premières étapes forment un seul graphe évalué par bandes.
+    """
+    fn = print_pipeline_vips if BACKEND == "vips" else _print_pipeline_pillow
+    return fn(image_path, output_tiff, cmyk_profile_path, scale_factor=scale_factor, target_size=target_size,
+              sharpen=sharpen, output_pdf=output_pdf)
@@ -1,6 +1,7 @@
 # prépare l’image pour qu’elle soit “print ready”
-from PIL import Image, ImageCms, TiffImagePlugin
+from PIL import Image, ImageCms
 import os, sys, time
+from app.utils.tiff_io import save_tiff
 
 Image.MAX_IMAGE_PIXELS = None
 # def convert_to_cmyk(image_path, output_path, cmyk_profile_path="utils/profiles/USWebCoatedSWOP.icc"):
@@ -26,15 +27,18 @@ def convert_to_cmyk(
     image_path,
     output_path,
     cmyk_profile_path="app/utils/profiles/USWebCoatedSWOP.icc",
-    tile_size=2048
+    tile_size=2048,
+    tiff_use="delivery"
 ):
     """
     Conversion mémoire-optimisée d'une image RGB en CMJN.
     Traite l'image par blocs (tiles) pour éviter la saturation RAM.
     Affiche une barre de progression dynamique dans le terminal.
+    Le TIFF final est compressé par bandes en parallèle (voir tiff_io.TIFF_PROFILES).
     """
     print(f"[INFO] Chargement de l'image source : {image_path}")
     img = Image.open(image_path)
+    dpi = img.info.get("dpi")
 
     if img.mode != "RGB":
         img = img.convert("RGB")
@@ -50,9 +54,6 @@ def convert_to_cmyk(
     cmyk_profile = ImageCms.getOpenProfile(cmyk_profile_path)
     transform = ImageCms.buildTransform(rgb_profile, cmyk_profile, "RGB", "CMYK")
 
-    # Active BigTIFF pour supporter les grands fichiers
-    TiffImagePlugin.WRITE_LIBTIFF = True
-
     # Création d’une image CMJN vide
     output_img = Image.new("CMYK", (width, height))
 
@@ -84,8 +85,8 @@ def convert_to_cmyk(
     with open(cmyk_profile_path, "rb") as f:
         icc_bytes = f.read()
 
-    # Sauvegarde finale
-    output_img.save(output_path, format="TIFF", compression="tiff_deflate", icc_profile=icc_bytes)
+    # Sauvegarde finale (compression parallèle, BigTIFF automatique pour les grands fichiers)
+    save_tiff(output_img, output_path, use=tiff_use, icc_profile=icc_bytes, dpi=dpi)
     print(f"[✅] Fichier enregistré : {output_path}")
 
     return output_path
\ No newline at end of file
@@ -0,0 +1,610 @@
+# Traitement distribué par tuiles : un coordinateur découpe l'image dans un dossier
+# partagé, des workers (sur n'importe quelle machine) réservent les tuiles via SQLite,
+# puis le coordinateur assemble les résultats.
+#
+# Dossier de job :
+#   manifest.json     étape, paramètres, géométrie de chaque tuile
+#   leases.sqlite3    état des tuiles (pending / leased / done / failed) et baux
+#   profile.icc       profil CMJN copié (les workers n'ont pas besoin des mêmes chemins)
+#   inputs/           tuiles source, halo compris
+#   outputs/          tuiles traitées (TIFF) ou statistiques (JSON pour "tac")
+#
+# Le stockage partagé doit gérer les verrous POSIX (NFSv4, CephFS, disque local) :
+# SQLite s'en sert pour sérialiser les réservations.
+from PIL import Image, ImageCms
+from contextlib import closing
+import numpy as np
+import subprocess
+import threading
+import argparse
+import tempfile
+import sqlite3
+import socket
+import shutil
+import json
+import math
+import time
+import sys
+import os
+from app.utils.tiff_io import open_strips, save_tiff, TiffWriter, TIFF_PROFILES, SAMPLES
+from app.utils.export_fanout import rechunk
+
+Image.MAX_IMAGE_PIXELS = None
+
+STAGES = ("cmyk", "denoise", "lanczos", "tac")
+
+# Taille par défaut d'une tuile source (px)
+DEFAULT_TILE_SIZE = 2048
+
+# Durée d'un bail : une tuile dont le worker ne donne plus signe de vie est réattribuée
+LEASE_SECONDS = 120
+
+# Au-delà, une tuile en erreur est marquée "failed" au lieu d'être retentée
+MAX_ATTEMPTS = 3
+
+# Limite d'encrage (TAC, en %) utilisée par défaut pour l'analyse
+DEFAULT_TAC_LIMIT = 300
+
+# Tuiles écrites en Deflate (et non en "scratch"/ZSTD) : lisibles par tous les hôtes
+TILE_TIFF_USE = "intermediate"
+
+
+def _halo(stage, scale=1.0):
+    """
+    Marge de contexte (px source) pour qu'une tuile reproduise le traitement global.
+    Lanczos : à ±2 niveaux près sur quelques pixels pour les facteurs comme 1.7 ou 3.3,
+    Pillow calculant les coefficients en flottant à partir de la position de la tuile.
+    """
+    if stage == "denoise":
+        # fastNlMeans : fenêtre de recherche 21 + patch 7, puis filtre d'accentuation 3x3
+        return 16
+    if stage == "lanczos":
+        # Support Lanczos3 : 3 px, élargi d'autant en réduction
+        return math.ceil(3 / min(scale, 1.0)) + 2
+    return 0
+
+
+def _output_edge(value, size, output_size):
+    return round(value * output_size / size)
+
+
+# ============================================================================
+# Baux SQLite
+# ============================================================================
+
+class TileLeases:
+    """
+    Registre des tuiles d'un job. Chaque réservation se fait dans une transaction
+    BEGIN IMMEDIATE : deux workers ne peuvent pas prendre la même tuile.
+    """
+
+    def __init__(self, job_dir):
+        self.db_path = os.path.join(job_dir, "leases.sqlite3")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 60000")
+        return conn
+
+    def create(self, tile_ids):
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tiles (
+                    id INTEGER PRIMARY KEY,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    seconds REAL,
+                    error TEXT
+                )
+            """)
+            conn.executemany("INSERT INTO tiles (id) VALUES (?)", [(i,) for i in tile_ids])
+
+    def claim(self, worker, lease_seconds):
+        """
+        Réserve une tuile libre ou dont le bail a expiré. Retourne son id ou None.
+        Un bail expiré après MAX_ATTEMPTS essais (worker tué à chaque fois) passe en "failed".
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE tiles SET status = 'failed', worker = NULL, lease_expires = NULL, "
+                         "error = COALESCE(error, ?) "
+                         "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                         (f"bail expiré {MAX_ATTEMPTS} fois (worker arrêté pendant le traitement)",
+                          now, MAX_ATTEMPTS))
+            row = conn.execute("SELECT id FROM tiles WHERE status = 'pending' "
+                               "OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                               (now,)).fetchone()
+            if row:
+                conn.execute("UPDATE tiles SET status = 'leased', worker = ?, lease_expires = ?, "
+                             "attempts = attempts + 1 WHERE id = ?", (worker, now + lease_seconds, row[0]))
+            conn.execute("COMMIT")
+            return row[0] if row else None
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew(self, tile_id, worker, lease_seconds):
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE tiles SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                         (time.time() + lease_seconds, tile_id, worker))
+
+    def complete(self, tile_id, worker, seconds):
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE tiles SET status = 'done', seconds = ?, error = NULL "
+                         "WHERE id = ? AND worker = ? AND status = 'leased'", (seconds, tile_id, worker))
+
+    def fail(self, tile_id, worker, error):
+        """Remet la tuile en attente, ou la marque "failed" après MAX_ATTEMPTS essais."""
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE tiles SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                         "worker = NULL, lease_expires = NULL, error = ? "
+                         "WHERE id = ? AND worker = ? AND status = 'leased'",
+                         (MAX_ATTEMPTS, error, tile_id, worker))
+
+    def progress(self):
+        """Nombre de tuiles par état, plus les erreurs des tuiles abandonnées."""
+        with closing(self._connect()) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM tiles GROUP BY status").fetchall())
+            errors = conn.execute("SELECT id, error FROM tiles WHERE status = 'failed'").fetchall()
+            reclaimed = conn.execute("SELECT COUNT(*) FROM tiles WHERE attempts > 1").fetchone()[0]
+        total = sum(counts.values())
+        return {
+            "total": total,
+            "done": counts.get("done", 0),
+            "leased": counts.get("leased", 0),
+            "pending": counts.get("pending", 0),
+            "failed": counts.get("failed", 0),
+            "retried": reclaimed,
+            "errors": {tile_id: error for tile_id, error in errors},
+            "finished": counts.get("done", 0) + counts.get("failed", 0) == total,
+        }
+
+
+# ============================================================================
+# Coordinateur : découpage
+# ============================================================================
+
+def load_manifest(job_dir):
+    with open(os.path.join(job_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def create_job(image_path, job_dir, stage, tile_size=DEFAULT_TILE_SIZE, cmyk_profile_path=None,
+               scale_factor=None, tac_limit=DEFAULT_TAC_LIMIT, lease_seconds=LEASE_SECONDS):
+    """
+    Découpe l'image en tuiles (avec halo) dans job_dir et initialise les baux.
+    La source est lue bande par bande : seule une rangée de tuiles est en mémoire.
+
+    Args:
+        image_path (str): image source (TIFF lu en flux, autres formats via Pillow).
+        job_dir (str): dossier partagé du job (créé s'il n'existe pas).
+        stage (str): "cmyk", "denoise", "lanczos" ou "tac".
+        tile_size (int): côté des tuiles source (px).
+        cmyk_profile_path (str): profil CMJN (étape "cmyk").
+        scale_factor (float): facteur d'agrandissement (étape "lanczos").
+        tac_limit (int): limite d'encrage en % (étape "tac").
+        lease_seconds (int): durée des baux, partagée par tous les workers.
+
+    Returns:
+        dict: manifeste du job.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Étape inconnue '{stage}'. Choisir parmi {list(STAGES)}.")
+    if stage == "cmyk" and not cmyk_profile_path:
+        raise ValueError("L'étape cmyk exige un profil ICC (cmyk_profile_path).")
+    if stage == "lanczos" and not scale_factor:
+        raise ValueError("L'étape lanczos exige un facteur d'agrandissement (scale_factor).")
+
+    info, strips = open_strips(image_path)
+    width, height, mode = info["width"], info["height"], info["mode"]
+    if mode not in SAMPLES:
+        raise ValueError(f"Mode {mode} non supporté : convertir l'image en RGB ou CMYK d'abord.")
+    if stage == "tac" and mode != "CMYK":
+        raise ValueError(f"L'analyse TAC exige une image CMYK. Image actuelle : {mode}")
+
+    scale = float(scale_factor) if stage == "lanczos" else 1.0
+    out_width, out_height = int(width * scale), int(height * scale)
+    halo = _halo(stage, scale)
+
+    os.makedirs(os.path.join(job_dir, "inputs"), exist_ok=True)
+    os.makedirs(os.path.join(job_dir, "outputs"), exist_ok=True)
+    if cmyk_profile_path:
+        shutil.copyfile(cmyk_profile_path, os.path.join(job_dir, "profile.icc"))
+
+    tiles = []
+    for top in range(0, height, tile_size):
+        for left in range(0, width, tile_size):
+            right, bottom = min(left + tile_size, width), min(top + tile_size, height)
+            tiles.append({
+                "id": len(tiles),
+                "box": [left, top, right, bottom],
+                "input_box": [max(0, left - halo), max(0, top - halo),
+                              min(width, right + halo), min(height, bottom + halo)],
+                "output_box": [_output_edge(left, width, out_width), _output_edge(top, height, out_height),
+                               _output_edge(right, width, out_width), _output_edge(bottom, height, out_height)],
+            })
+
+    print(f"▶ Découpage de {os.path.basename(image_path)} ({width}x{height}px) en {len(tiles)} tuiles")
+    row_bytes = width * SAMPLES[mode]
+    buffer = bytearray()
+    buffer_top = 0
+    rows = {}
+    for tile in tiles:
+        rows.setdefault(tile["input_box"][1], []).append(tile)
+    for input_top, row_tiles in sorted(rows.items()):
+        input_bottom = row_tiles[0]["input_box"][3]
+        # Lignes déjà passées (la rangée précédente et son halo) : libérées
+        drop = (input_top - buffer_top) * row_bytes
+        if drop > 0:
+            del buffer[:drop]
+            buffer_top = input_top
+        while buffer_top + len(buffer) // row_bytes < input_bottom:
+            buffer += next(strips)
+        band_rows = input_bottom - input_top
+        band = Image.frombytes(mode, (width, band_rows), bytes(buffer[:band_rows * row_bytes]))
+        for tile in row_tiles:
+            left, _, right, _ = tile["input_box"]
+            save_tiff(band.crop((left, 0, right, band_rows)), _tile_path(job_dir, "inputs", tile["id"]),
+                      use=TILE_TIFF_USE)
+    strips.close()
+
+    manifest = {
+        "source": os.path.basename(image_path),
+        "stage": stage,
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "dpi": info["dpi"],
+        "has_icc_profile": bool(info["icc_profile"]),
+        "output_size": [out_width, out_height],
+        "scale_factor": scale,
+        "tac_limit": tac_limit,
+        "tile_size": tile_size,
+        "halo": halo,
+        "lease_seconds": lease_seconds,
+        "created_at": time.time(),
+        "tiles": tiles,
+    }
+    if info["icc_profile"]:
+        with open(os.path.join(job_dir, "source.icc"), "wb") as f:
+            f.write(info["icc_profile"])
+    TileLeases(job_dir).create([tile["id"] for tile in tiles])
+    # Le manifeste est écrit en dernier : sa présence signale aux workers que le job est prêt
+    with open(os.path.join(job_dir, "manifest.json.tmp"), "w") as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(job_dir, "manifest.json.tmp"), os.path.join(job_dir, "manifest.json"))
+    return manifest
+
+
+def _tile_path(job_dir, folder, tile_id, ext=".tiff"):
+    return os.path.join(job_dir, folder, f"tile_{tile_id:05d}{ext}")
+
+
+# ============================================================================
+# Worker : traitement des tuiles
+# ============================================================================
+
+_transforms = {}
+
+
+def _cmyk_transform(job_dir):
+    if job_dir not in _transforms:
+        cmyk_profile = ImageCms.getOpenProfile(os.path.join(job_dir, "profile.icc"))
+        _transforms[job_dir] = ImageCms.buildTransform(ImageCms.createProfile("sRGB"), cmyk_profile, "RGB", "CMYK")
+    return _transforms[job_dir]
+
+
+def _tac_stats(img, limit):
+    """Encrage total par pixel (%), résumé en maximum, histogramme par 10 % et pixels hors limite."""
+    tac = np.asarray(img, dtype=np.uint16).sum(axis=2) * (100 / 255)
+    histogram, _ = np.histogram(tac, bins=41, range=(0, 410))
+    return {"max": float(tac.max()), "sum": float(tac.sum()), "pixels": int(tac.size),
+            "over_limit": int((tac > limit).sum()), "histogram": histogram.tolist()}
+
+
+def process_tile(job_dir, manifest, tile):
+    """Traite une tuile et écrit son résultat (écriture atomique via os.replace)."""
+    stage = manifest["stage"]
+    img = Image.open(_tile_path(job_dir, "inputs", tile["id"]))
+    img.load()
+    box, input_box, output_box = tile["box"], tile["input_box"], tile["output_box"]
+    # Zone utile de la tuile dans l'entrée (hors halo)
+    crop = (box[0] - input_box[0], box[1] - input_box[1], box[2] - input_box[0], box[3] - input_box[1])
+
+    if stage == "tac":
+        stats = _tac_stats(img, manifest["tac_limit"])
+        output_path = _tile_path(job_dir, "outputs", tile["id"], ".json")
+        with open(output_path + ".tmp", "w") as f:
+            json.dump(stats, f)
+        os.replace(output_path + ".tmp", output_path)
+        return output_path
+
+    if stage == "cmyk":
+        result = ImageCms.applyTransform(img.convert("RGB"), _cmyk_transform(job_dir))
+    elif stage == "denoise":
+        # Même traitement que cleaning.clean_image, sur la tuile et son halo
+        import cv2
+        bgr = cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+        denoised = cv2.fastNlMeansDenoisingColored(bgr, None, 10, 10, 7, 21)
+        sharpened = cv2.filter2D(denoised, -1, np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]))
+        result = Image.fromarray(cv2.cvtColor(sharpened, cv2.COLOR_BGR2RGB))
+    else:
+        # Lanczos : la zone source de la tuile est rééchantillonnée sur sa zone de sortie,
+        # aux mêmes positions que le redimensionnement de l'image entière
+        ratio_x = manifest["width"] / manifest["output_size"][0]
+        ratio_y = manifest["height"] / manifest["output_size"][1]
+        size = (output_box[2] - output_box[0], output_box[3] - output_box[1])
+        source_box = (output_box[0] * ratio_x - input_box[0], output_box[1] * ratio_y - input_box[1],
+                      output_box[2] * ratio_x - input_box[0], output_box[3] * ratio_y - input_box[1])
+        result = img.resize(size, Image.LANCZOS, box=source_box)
+        crop = None
+
+    if crop:
+        result = result.crop(crop)
+    output_path = _tile_path(job_dir, "outputs", tile["id"])
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    save_tiff(result, temp_path, use=TILE_TIFF_USE)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def _heartbeat(leases, tile_id, worker, lease_seconds, stop):
+    while not stop.wait(lease_seconds / 3):
+        leases.renew(tile_id, worker, lease_seconds)
+
+
+def run_worker(job_dir, worker=None, poll_seconds=1.0, max_tiles=None):
+    """
+    Boucle d'un worker : réserve une tuile, la traite en renouvelant son bail, recommence.
+    S'arrête quand toutes les tuiles sont terminées (ou après max_tiles tuiles).
+
+    Returns:
+        int: nombre de tuiles traitées par ce worker.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    manifest = load_manifest(job_dir)
+    tiles = {tile["id"]: tile for tile in manifest["tiles"]}
+    lease_seconds = manifest["lease_seconds"]
+    leases = TileLeases(job_dir)
+    processed = 0
+
+    while max_tiles is None or processed < max_tiles:
+        tile_id = leases.claim(worker, lease_seconds)
+        if tile_id is None:
+            if leases.progress()["finished"]:
+                break
+            # Tuiles en cours chez d'autres workers : l'une d'elles peut expirer
+            time.sleep(poll_seconds)
+            continue
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(leases, tile_id, worker, lease_seconds, stop),
+                                     daemon=True)
+        heartbeat.start()
+        start = time.perf_counter()
+        try:
+            process_tile(job_dir, manifest, tiles[tile_id])
+            leases.complete(tile_id, worker, time.perf_counter() - start)
+            processed += 1
+            print(f"[INFO] {worker} : tuile {tile_id} traitée en {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            leases.fail(tile_id, worker, str(e))
+            print(f"[WARN] {worker} : tuile {tile_id} en erreur : {e}")
+        finally:
+            stop.set()
+            heartbeat.join()
+    return processed
+
+
+# ============================================================================
+# Coordinateur : attente et assemblage
+# ============================================================================
+
+def wait_for_job(job_dir, poll_seconds=1.0, timeout=None):
+    """Attend la fin de toutes les tuiles. Lève une erreur si certaines ont échoué."""
+    leases = TileLeases(job_dir)
+    start = time.monotonic()
+    while True:
+        progress = leases.progress()
+        if progress["finished"]:
+            break
+        if timeout and time.monotonic() - start > timeout:
+            raise TimeoutError(f"Job inachevé après {timeout}s : {progress['done']}/{progress['total']} tuiles.")
+        time.sleep(poll_seconds)
+    if progress["failed"]:
+        raise RuntimeError(f"{progress['failed']} tuile(s) en échec : {progress['errors']}")
+    return progress
+
+
+def _row_strips(job_dir, row_tiles, samples, rows=64):
+    """Bandes pleine largeur d'une rangée de tuiles, lues en flux tuile par tuile."""
+    widths = [tile["output_box"][2] - tile["output_box"][0] for tile in row_tiles]
+    readers = [rechunk(open_strips(_tile_path(job_dir, "outputs", tile["id"]), rows_per_chunk=rows)[1],
+                       width * samples, rows)
+               for tile, width in zip(row_tiles, widths)]
+    for parts in zip(*readers):
+        yield np.hstack([np.frombuffer(part, dtype=np.uint8).reshape(-1, width * samples)
+                         for part, width in zip(parts, widths)]).tobytes()
+
+
+def stitch(job_dir, output_path):
+    """
+    Assemble les tuiles traitées en un TIFF de livraison (écrit en flux), ou agrège
+    les statistiques TAC dans un rapport JSON.
+
+    Returns:
+        str | dict: chemin du TIFF, ou rapport TAC.
+    """
+    manifest = load_manifest(job_dir)
+    stage = manifest["stage"]
+    tiles = manifest["tiles"]
+
+    if stage == "tac":
+        stats = []
+        for tile in tiles:
+            with open(_tile_path(job_dir, "outputs", tile["id"], ".json")) as f:
+                stats.append(json.load(f))
+        pixels = sum(s["pixels"] for s in stats)
+        over_limit = sum(s["over_limit"] for s in stats)
+        report = {
+            "source": manifest["source"],
+            "tac_limit": manifest["tac_limit"],
+            "max_tac": round(max(s["max"] for s in stats), 1),
+            "mean_tac": round(sum(s["sum"] for s in stats) / pixels, 1),
+            "pixels_over_limit": over_limit,
+            "pct_over_limit": round(100 * over_limit / pixels, 3),
+            "histogram": np.sum([s["histogram"] for s in stats], axis=0).tolist(),
+        }
+        if output_path:
+            with open(output_path, "w") as f:
+                json.dump(report, f, indent=2)
+        return report
+
+    mode = "CMYK" if stage == "cmyk" else "RGB" if stage == "denoise" else manifest["mode"]
+    samples = SAMPLES[mode]
+    out_width, out_height = manifest["output_size"]
+    icc_path = os.path.join(job_dir, "profile.icc" if stage == "cmyk" else "source.icc")
+    icc_profile = None
+    if os.path.exists(icc_path):
+        with open(icc_path, "rb") as f:
+            icc_profile = f.read()
+    dpi = manifest["dpi"]
+    if dpi and stage == "lanczos":
+        # Même format physique, résolution multipliée
+        dpi = (dpi[0] * manifest["scale_factor"], dpi[1] * manifest["scale_factor"])
+
+    rows = {}
+    for tile in tiles:
+        rows.setdefault(tile["output_box"][1], []).append(tile)
+    strips = (strip for _, row_tiles in sorted(rows.items())
+              for strip in _row_strips(job_dir, sorted(row_tiles, key=lambda t: t["output_box"][0]), samples))
+
+    writer = TiffWriter(output_path, out_width, out_height, mode, icc_profile=icc_profile, dpi=dpi,
+                        **TIFF_PROFILES["delivery"])
+    writer.write_strips(rechunk(strips, out_width * samples, writer.rows_per_strip))
+    print(f"[✅] {len(tiles)} tuiles assemblées : {output_path} ({out_width}x{out_height}px)")
+    return output_path
+
+
+# ============================================================================
+# Exécution locale (plusieurs workers sur une machine)
+# ============================================================================
+
+def _spawn_worker(job_dir, env):
+    return subprocess.Popen([sys.executable, "-m", "app.utils.distributed_tiles", "worker", job_dir], env=env)
+
+
+def run_local(image_path, output_path, stage, workers=2, job_dir=None, keep_job=False, poll_seconds=0.5,
+              **job_options):
+    """
+    Découpe, traite avec `workers` processus locaux, puis assemble.
+    Un worker qui meurt est remplacé ; ses tuiles sont reprises à l'expiration du bail.
+
+    Args:
+        job_options: tile_size, cmyk_profile_path, scale_factor, tac_limit, lease_seconds (voir create_job).
+
+    Returns:
+        dict: sortie (chemin ou rapport TAC), progression finale et durée.
+    """
+    start = time.perf_counter()
+    owns_job_dir = job_dir is None
+    job_dir = job_dir or tempfile.mkdtemp(prefix="tiles_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        create_job(image_path, job_dir, stage, **job_options)
+        env = dict(os.environ, PRINTPREP_CONCURRENT_JOBS=str(workers))
+        processes = [_spawn_worker(job_dir, env) for _ in range(workers)]
+        restarts = 0
+        leases = TileLeases(job_dir)
+        while not leases.progress()["finished"]:
+            for i, process in enumerate(processes):
+                if process.poll() not in (None, 0) and restarts < workers * MAX_ATTEMPTS:
+                    print(f"[WARN] Worker {process.pid} arrêté (code {process.returncode}), remplacé")
+                    processes[i] = _spawn_worker(job_dir, env)
+                    restarts += 1
+            if all(p.poll() is not None for p in processes) and not leases.progress()["finished"]:
+                raise RuntimeError("Tous les workers se sont arrêtés avant la fin du job.")
+            time.sleep(poll_seconds)
+        for process in processes:
+            process.wait()
+        progress = wait_for_job(job_dir)
+        output = stitch(job_dir, output_path)
+        return {"output": output, "progress": progress, "restarts": restarts, "job_dir": job_dir,
+                "seconds": round(time.perf_counter() - start, 2)}
+    finally:
+        if owns_job_dir and not keep_job:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Traitement distribué par tuiles (coordinateur et workers).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def job_arguments(p):
+        p.add_argument("--stage", choices=STAGES, required=True)
+        p.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+        p.add_argument("--profile", help="profil CMJN (étape cmyk)")
+        p.add_argument("--scale", type=float, help="facteur d'agrandissement (étape lanczos)")
+        p.add_argument("--tac-limit", type=int, default=DEFAULT_TAC_LIMIT)
+        p.add_argument("--lease-seconds", type=int, default=LEASE_SECONDS)
+
+    create = commands.add_parser("create", help="découper une image dans un dossier de job partagé")
+    create.add_argument("image")
+    create.add_argument("job_dir")
+    job_arguments(create)
+
+    worker = commands.add_parser("worker", help="traiter des tuiles jusqu'à la fin du job")
+    worker.add_argument("job_dir")
+    worker.add_argument("--id", help="identifiant du worker (défaut : hôte:pid)")
+    worker.add_argument("--max-tiles", type=int)
+
+    status = commands.add_parser("status", help="progression du job")
+    status.add_argument("job_dir")
+
+    stitch_parser = commands.add_parser("stitch", help="assembler les tuiles traitées")
+    stitch_parser.add_argument("job_dir")
+    stitch_parser.add_argument("output")
+
+    run = commands.add_parser("run", help="découper, traiter avec des workers locaux et assembler")
+    run.add_argument("image")
+    run.add_argument("output")
+    run.add_argument("--workers", type=int, default=2)
+    run.add_argument("--job-dir")
+    run.add_argument("--keep-job", action="store_true")
+    job_arguments(run)
+
+    args = parser.parse_args()
+    job_options = {}
+    if args.command in ("create", "run"):
+        job_options = {"tile_size": args.tile_size, "cmyk_profile_path": args.profile,
+                       "scale_factor": args.scale, "tac_limit": args.tac_limit,
+                       "lease_seconds": args.lease_seconds}
+
+    if args.command == "create":
+        manifest = create_job(args.image, args.job_dir, args.stage, **job_options)
+        print(f"[✅] Job prêt : {len(manifest['tiles'])} tuiles dans {args.job_dir}")
+    elif args.command == "worker":
+        # Les cœurs de l'hôte sont partagés entre les workers lancés (PRINTPREP_CONCURRENT_JOBS)
+        from app.utils.thread_budget import configure_from_env
+        configure_from_env()
+        run_worker(args.job_dir, worker=args.id, max_tiles=args.max_tiles)
+    elif args.command == "status":
+        print(json.dumps(TileLeases(args.job_dir).progress(), indent=2))
+    elif args.command == "stitch":
+        wait_for_job(args.job_dir)
+        result = stitch(args.job_dir, args.output)
+        if isinstance(result, dict):
+            print(json.dumps(result, indent=2))
+    else:
+        result = run_local(args.image, args.output, args.stage, workers=args.workers, job_dir=args.job_dir,
+                           keep_job=args.keep_job, **job_options)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
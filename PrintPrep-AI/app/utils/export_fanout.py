@@ -0,0 +1,259 @@
+# Export multi-format : le master CMJN est décodé une seule fois et ses bandes
+# sont distribuées en parallèle à tous les encodeurs (PDF/X-1a, TIFF, PSD, aperçus)
+from PIL import Image, ImageCms
+from pathlib import Path
+from queue import Queue
+import numpy as np
+import threading
+import tempfile
+import struct
+import shutil
+import time
+import os
+from app.utils.tiff_io import open_strips, TiffWriter, TIFF_PROFILES
+from app.utils.pdf_writer import PdfXWriter
+
+Image.MAX_IMAGE_PIXELS = None
+
+# Formats produits par défaut
+EXPORT_FORMATS = ("pdf", "tiff", "psd", "preview", "thumbnail")
+
+# Taille maximale (px) de l'aperçu web et de la vignette
+PREVIEW_MAX_SIZE = 2048
+THUMBNAIL_MAX_SIZE = 256
+
+# Bandes en attente par encodeur : borne la mémoire si un encodeur est plus lent
+QUEUE_DEPTH = 4
+
+# Au-delà de 30 000 px de côté, Photoshop exige le format PSB
+PSD_MAX_SIZE = 30000
+
+_END = object()
+_ABORT = object()
+
+
+def rechunk(chunks, row_bytes, rows):
+    """Redécoupe des bandes de hauteur quelconque en bandes d'exactement `rows` lignes."""
+    size = row_bytes * rows
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+class _Encoder(threading.Thread):
+    """
+    Encodeur alimenté par une file bornée. En cas d'erreur, il continue de vider
+    sa file pour ne jamais bloquer la lecture du master ni les autres encodeurs.
+    """
+
+    def __init__(self, name, output_path, encode):
+        super().__init__(name=f"export-{name}", daemon=True)
+        self.format = name
+        self.output_path = output_path
+        self.encode = encode
+        self.queue = Queue(maxsize=QUEUE_DEPTH)
+        self.error = None
+        self.seconds = None
+        self._finished = False
+
+    def strips(self):
+        while not self._finished:
+            chunk = self.queue.get()
+            if chunk is _END:
+                self._finished = True
+                return
+            if chunk is _ABORT:
+                self._finished = True
+                raise RuntimeError("Lecture du master interrompue.")
+            yield chunk
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            self.encode(self.strips(), self.output_path)
+        except Exception as e:
+            self.error = str(e)
+            Path(self.output_path).unlink(missing_ok=True)
+        for _ in self.strips():
+            pass
+        self.seconds = round(time.perf_counter() - start, 2)
+
+
+def _encode_pdf(strips, info, output_path, icc_profile_path, title):
+    with PdfXWriter(output_path, icc_profile_path, title=title) as pdf:
+        pdf.add_image_page(info["width"], info["height"], strips, dpi=info["dpi"])
+    return output_path
+
+
+def _encode_tiff(strips, info, output_path, icc_profile):
+    writer = TiffWriter(output_path, info["width"], info["height"], "CMYK",
+                        icc_profile=icc_profile, dpi=info["dpi"], **TIFF_PROFILES["delivery"])
+    return writer.write_strips(rechunk(strips, info["width"] * 4, writer.rows_per_strip))
+
+
+def _psd_resource(resource_id, data):
+    """Bloc de ressource image Photoshop (8BIM), nom vide, données alignées sur 2 octets."""
+    block = b"8BIM" + struct.pack(">H", resource_id) + b"\0\0" + struct.pack(">I", len(data)) + data
+    return block + (b"\0" if len(data) % 2 else b"")
+
+
+def _encode_psd(strips, info, output_path, icc_profile):
+    """
+    Écrit un PSD (PSB au-delà de 30 000 px) CMJN 8 bits non compressé.
+    Les canaux sont planaires dans le fichier : chaque canal est d'abord écrit dans
+    un fichier temporaire, puis les quatre sont concaténés.
+    """
+    width, height = info["width"], info["height"]
+    psb = max(width, height) > PSD_MAX_SIZE
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as work_dir:
+        planes = [open(os.path.join(work_dir, f"channel{i}.raw"), "w+b") for i in range(4)]
+        try:
+            for chunk in strips:
+                # Photoshop stocke le CMJN inversé (0 = 100 % d'encre)
+                pixels = 255 - np.frombuffer(chunk, dtype=np.uint8).reshape(-1, 4)
+                for channel, plane in enumerate(planes):
+                    plane.write(np.ascontiguousarray(pixels[:, channel]).tobytes())
+
+            resources = b""
+            if icc_profile:
+                resources += _psd_resource(1039, icc_profile)
+            if info["dpi"]:
+                # ResolutionInfo : résolutions en virgule fixe 16.16, unité pixels/pouce
+                dpi_x, dpi_y = info["dpi"]
+                resources += _psd_resource(1005, struct.pack(">IHHIHH", int(dpi_x * 65536), 1, 1,
+                                                             int(dpi_y * 65536), 1, 1))
+
+            with open(output_path, "wb") as f:
+                f.write(b"8BPS" + struct.pack(">H6xHIIHH", 2 if psb else 1, 4, height, width, 8, 4))
+                f.write(struct.pack(">I", 0))                     # Color mode data
+                f.write(struct.pack(">I", len(resources)) + resources)
+                f.write(struct.pack(">Q" if psb else ">I", 0))     # Pas de calques : image aplatie
+                f.write(struct.pack(">H", 0))                     # Données brutes
+                for plane in planes:
+                    plane.seek(0)
+                    shutil.copyfileobj(plane, f, 4 * 1024**2)
+        finally:
+            for plane in planes:
+                plane.close()
+    return output_path
+
+
+def _encode_reduced(strips, info, output_path, max_size, icc_profile_path, quality):
+    """
+    Aperçu sRGB : chaque bande est réduite d'un facteur entier dès sa réception,
+    puis l'image réduite (petite) est ajustée à max_size et convertie en sRGB.
+    """
+    width, height = info["width"], info["height"]
+    factor = max(1, max(width, height) // max_size)
+    reduced = Image.new("CMYK", (-(-width // factor), -(-height // factor)))
+    top = 0
+    for chunk in rechunk(strips, width * 4, factor * 64):
+        rows = len(chunk) // (width * 4)
+        band = Image.frombytes("CMYK", (width, rows), chunk).reduce(factor)
+        reduced.paste(band, (0, top // factor))
+        top += rows
+
+    reduced.thumbnail((max_size, max_size), Image.LANCZOS)
+    cmyk_profile = ImageCms.getOpenProfile(str(icc_profile_path))
+    transform = ImageCms.buildTransform(cmyk_profile, ImageCms.createProfile("sRGB"), "CMYK", "RGB")
+    ImageCms.applyTransform(reduced, transform).save(output_path, "JPEG", quality=quality, optimize=True)
+    return output_path
+
+
+def export_deliverables(master_tiff, output_dir, icc_profile_path, formats=EXPORT_FORMATS,
+                        base_name=None, title="Export Print Haute Qualité"):
+    """
+    Produit tous les livrables d'un master CMJN en une seule lecture.
+
+    Le master est décodé bande par bande ; chaque bande est transmise (sans copie)
+    à un encodeur par format, chacun dans son thread avec une file bornée.
+
+    Args:
+        master_tiff (str): TIFF CMJN (ou toute image CMJN lisible par Pillow).
+        output_dir (str): dossier des livrables.
+        icc_profile_path (str): profil CMJN (OutputIntent du PDF, ICC intégré si le master n'en a pas,
+                                conversion sRGB des aperçus).
+        formats (tuple): parmi "pdf", "tiff", "psd", "preview", "thumbnail".
+        base_name (str): préfixe des fichiers (défaut : nom du master).
+
+    Returns:
+        dict: rapport combiné (source, durée de lecture, et par format : fichier, taille, durée, erreur).
+    """
+    unknown = set(formats) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Formats inconnus {sorted(unknown)}. Choisir parmi {list(EXPORT_FORMATS)}.")
+
+    start = time.perf_counter()
+    master_tiff = Path(master_tiff)
+    base_name = base_name or master_tiff.stem
+    info, strips = open_strips(master_tiff)
+    if info["mode"] != "CMYK":
+        raise ValueError(f"L'export exige un master CMYK. Image actuelle : {info['mode']}")
+    icc_profile = info["icc_profile"] or Path(icc_profile_path).read_bytes()
+
+    encoders_by_format = {
+        "pdf": ("_PDFX1a.pdf", lambda s, out: _encode_pdf(s, info, out, icc_profile_path, title)),
+        "tiff": ("_print.tiff", lambda s, out: _encode_tiff(s, info, out, icc_profile)),
+        "psd": (".psd", lambda s, out: _encode_psd(s, info, out, icc_profile)),
+        "preview": ("_preview.jpg", lambda s, out: _encode_reduced(s, info, out, PREVIEW_MAX_SIZE, icc_profile_path, 90)),
+        "thumbnail": ("_thumb.jpg", lambda s, out: _encode_reduced(s, info, out, THUMBNAIL_MAX_SIZE, icc_profile_path, 80)),
+    }
+    encoders = []
+    for name in formats:
+        suffix, encode = encoders_by_format[name]
+        encoders.append(_Encoder(name, os.path.join(output_dir, f"{base_name}{suffix}"), encode))
+    for encoder in encoders:
+        encoder.start()
+
+    print(f"▶ Export de {master_tiff.name} vers {len(encoders)} formats ({info['width']}x{info['height']}px)")
+    read_error = None
+    strip_count = 0
+    try:
+        for chunk in strips:
+            strip_count += 1
+            for encoder in encoders:
+                encoder.queue.put(chunk)
+    except Exception as e:
+        read_error = str(e)
+    for encoder in encoders:
+        encoder.queue.put(_ABORT if read_error else _END)
+    for encoder in encoders:
+        encoder.join()
+
+    outputs = {}
+    for encoder in encoders:
+        done = encoder.error is None
+        outputs[encoder.format] = {
+            "file": os.path.basename(encoder.output_path) if done else None,
+            "bytes": os.path.getsize(encoder.output_path) if done else None,
+            "seconds": encoder.seconds,
+            "error": encoder.error
+        }
+        status = "✅" if encoder.error is None else f"❌ {encoder.error}"
+        print(f"   {encoder.format:<10} {status}")
+
+    return {
+        "source": master_tiff.name,
+        "width": info["width"],
+        "height": info["height"],
+        "dpi": info["dpi"],
+        "streamed": info["streamed"],
+        "strips": strip_count,
+        "read_error": read_error,
+        "seconds": round(time.perf_counter() - start, 2),
+        "outputs": outputs
+    }
+
+
+if __name__ == "__main__":
+    report = export_deliverables(
+        "../temp_uploads/cmyk_enhanced_test_upscaled_x6.tiff",
+        "../temp_uploads",
+        "profiles/CoatedFOGRA39.icc"
+    )
+    print(report)
@@ -1,12 +1,110 @@
-import img2pdf
-from pikepdf import Pdf, Dictionary, Name, String, Stream
 from PIL import Image
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import tempfile
 import io
+import os
+from app.utils.tiff_io import open_strips
+from app.utils.pdf_writer import PdfXWriter, compress_image_stream
+from app.utils.thread_budget import worker_threads
 
 Image.MAX_IMAGE_PIXELS = None
 
 def convert_tiff_to_pdfx1a(input_tiff, output_pdf, icc_profile_path):
+    """
+    Convertit un TIFF CMJN en PDF/X-1a en flux : les bandes du TIFF sont décodées
+    puis recompressées directement dans le fichier PDF, sans construire le PDF en mémoire.
+    """
+    input_tiff = Path(input_tiff)
+    output_pdf = Path(output_pdf)
+    icc_profile_path = Path(icc_profile_path)
+
+    print("▶ Conversion TIFF → PDF/X-1a")
+
+    # 1. Lecture de l'en-tête et vérification du mode CMYK
+    info, strips = open_strips(input_tiff)
+    if info["mode"] != "CMYK":
+        raise ValueError(f"Le format PDF/X-1a exige du CMYK. Image actuelle : {info['mode']}")
+
+    # 2. Écriture du PDF : profil ICC, OutputIntent, image en flux, métadonnées Info
+    with PdfXWriter(output_pdf, icc_profile_path) as pdf:
+        pdf.add_image_page(info["width"], info["height"], strips, dpi=info["dpi"])
+
+    print(f"✅ PDF/X-1a généré avec succès : {output_pdf.name}")
+
+def _encode_page(input_tiff, encoded_path, level):
+    """Compresse l'image d'une page dans un fichier temporaire (flux zlib)."""
+    info, strips = open_strips(input_tiff)
+    if info["mode"] != "CMYK":
+        raise ValueError(f"Le format PDF/X-1a exige du CMYK. {Path(input_tiff).name} : {info['mode']}")
+    with open(encoded_path, "wb") as f:
+        compress_image_stream(strips, f, level)
+    return info
+
+def convert_tiffs_to_pdfx1a(input_tiffs, output_pdf, icc_profile_path, workers=None, level=6):
+    """
+    Assemble plusieurs TIFF CMJN en un seul PDF/X-1a multipage.
+
+    Le profil ICC et l'OutputIntent ne sont écrits qu'une fois pour tout le document.
+    Les pages sont compressées en parallèle dans des fichiers temporaires, puis
+    recopiées dans l'ordre dans le PDF ; au plus `workers` pages sont en avance.
+
+    Args:
+        input_tiffs (list): chemins des TIFF CMJN, dans l'ordre des pages.
+        output_pdf (str): chemin du PDF de sortie.
+        icc_profile_path (str): profil ICC de l'OutputIntent.
+        workers (int): nombre de pages encodées simultanément.
+
+    Returns:
+        int: nombre de pages écrites.
+    """
+    output_pdf = Path(output_pdf)
+    workers = workers or min(len(input_tiffs), worker_threads())
+
+    print(f"▶ Conversion de {len(input_tiffs)} TIFF → PDF/X-1a multipage")
+
+    # Vérification des en-têtes avant tout encodage
+    for path in input_tiffs:
+        with Image.open(path) as img:
+            if img.mode != "CMYK":
+                raise ValueError(f"Le format PDF/X-1a exige du CMYK. {Path(path).name} : {img.mode}")
+
+    with tempfile.TemporaryDirectory(dir=output_pdf.parent) as tmp_dir, \
+            ThreadPoolExecutor(max_workers=workers) as pool, \
+            PdfXWriter(output_pdf, icc_profile_path) as pdf:
+        pending = deque()
+        pages = iter(enumerate(input_tiffs))
+
+        def submit_next():
+            for index, path in pages:
+                encoded = os.path.join(tmp_dir, f"page_{index:04d}.zlib")
+                pending.append((encoded, pool.submit(_encode_page, path, encoded, level)))
+                return
+
+        for _ in range(workers):
+            submit_next()
+        page_number = 0
+        while pending:
+            encoded, future = pending.popleft()
+            info = future.result()
+            submit_next()
+            pdf.add_encoded_page(info["width"], info["height"], encoded, dpi=info["dpi"])
+            os.remove(encoded)
+            page_number += 1
+            print(f"    → Page {page_number}/{len(input_tiffs)} ajoutée")
+
+    print(f"✅ PDF/X-1a multipage généré avec succès : {output_pdf.name}")
+    return page_number
+
+def convert_tiff_to_pdfx1a_img2pdf(input_tiff, output_pdf, icc_profile_path):
+    """
+    Ancienne conversion en mémoire (img2pdf + pikepdf), conservée pour comparaison
+    dans benchmarks/bench_pdfx_export.py. Garde deux copies complètes du PDF en RAM.
+    """
+    import img2pdf
+    from pikepdf import Pdf, Dictionary, Name, String, Stream
+
     input_tiff = Path(input_tiff)
     output_pdf = Path(output_pdf)
     icc_profile_path = Path(icc_profile_path)
@@ -1,62 +1,177 @@
 import os
+import shutil
+import signal
 import subprocess
-from tqdm import tqdm
-from PIL import Image, TiffImagePlugin
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from app.utils.tiff_io import save_tiff, to_writable_mode, TiffReader
+from app.utils.thread_budget import detect_cpu_count
 
 Image.MAX_IMAGE_PIXELS = None  # Désactive la limite anti "bomb" pour les très grandes images
 
+# Exécutables recherchés dans le PATH, dans l'ordre.
+# Seul gpdl (GhostPDL) lit les TIFF ; gs / gswin64c / gswin32c n'acceptent que PostScript et PDF.
+GS_CANDIDATES = ["gpdl"]
+GS_PS_ONLY = ["gs", "gswin64c", "gswin32c"]
+
+# Compressions TIFF lues par Ghostscript (none, LZW, Deflate, Adobe Deflate, PackBits)
+GS_COMPRESSIONS = {1, 5, 8, 32946, 32773}
+
+# Durée maximale d'une conversion avant arrêt forcé (secondes)
+GS_TIMEOUT = 1800
+
+def _ps_only_error(path):
+    return FileNotFoundError(
+        f"{path} ne lit que PostScript/PDF, pas les TIFF : installer GhostPDL (gpdl) et le déclarer "
+        f"via GHOSTSCRIPT_PATH, ou utiliser l'export en flux export_pdf_x1a.convert_tiff_to_pdfx1a."
+    )
+
+def find_ghostscript():
+    """
+    Localise l'exécutable GhostPDL (gpdl), seul capable de lire un TIFF :
+    variable GHOSTSCRIPT_PATH, sinon recherche dans le PATH.
+    Un gs classique trouvé à la place lève une erreur explicite.
+    """
+    configured = os.getenv("GHOSTSCRIPT_PATH")
+    if configured:
+        path = configured if os.path.isfile(configured) else shutil.which(configured)
+        if not path:
+            raise FileNotFoundError(f"GHOSTSCRIPT_PATH invalide : {configured}")
+        name = os.path.splitext(os.path.basename(path))[0].lower()
+        if name in GS_PS_ONLY:
+            raise _ps_only_error(path)
+        return path
+    for name in GS_CANDIDATES:
+        path = shutil.which(name)
+        if path:
+            return path
+    for name in GS_PS_ONLY:
+        path = shutil.which(name)
+        if path:
+            raise _ps_only_error(path)
+    raise FileNotFoundError(f"GhostPDL introuvable dans le PATH (recherché : {', '.join(GS_CANDIDATES)}).")
+
+def is_gs_compatible(input_tiff):
+    """
+    Vérifie sur l'en-tête seul si le TIFF peut être passé tel quel à Ghostscript :
+    TIFF classique (pas BigTIFF), CMJN 8 bits entrelacé, compression standard.
+    """
+    try:
+        reader = TiffReader(input_tiff)
+    except (ValueError, OSError):
+        return False
+    return (not reader.bigtiff and reader.mode == "CMYK" and reader.bits == 8
+            and reader.planar == 1 and reader.compression in GS_COMPRESSIONS)
+
 def prepare_tiff_for_gs(input_tiff, temp_tiff="temp_for_gs.tiff"):
     """
-    Réencode un TIFF volumineux en TIFF compressé standard (Deflate) pour Ghostscript.
+    Réencode un TIFF volumineux en TIFF compressé standard (Deflate rapide) pour Ghostscript.
+    Les modes non écrits par tiff_io (palette, 16 bits, Lab...) sont d'abord convertis en 8 bits.
     """
     print(f"[INFO] Réencodage du TIFF pour compatibilité Ghostscript...")
     with Image.open(input_tiff) as img:
-        TiffImagePlugin.WRITE_LIBTIFF = True
-        img.save(temp_tiff, compression="tiff_deflate")
+        # Le profil ICC d'une source Lab ne décrit plus l'image une fois convertie en sRGB
+        icc_profile = img.info.get("icc_profile") if img.mode != "LAB" else None
+        save_tiff(to_writable_mode(img), temp_tiff, use="intermediate", icc_profile=icc_profile)
     size_mo = os.path.getsize(temp_tiff) / (1024**2)
     print(f"[INFO] Nouveau TIFF créé : {temp_tiff} ({size_mo:.2f} Mo)")
     return temp_tiff
 
-def tiff_to_pdfx(input_tiff, output_pdf, dpi=300):
-    """
-    Convertit un TIFF CMJN volumineux en PDF/X-1a via Ghostscript.
-    """
-    # 1️⃣ Réencodage TIFF pour compatibilité
-    temp_tiff = prepare_tiff_for_gs(input_tiff)
-
-    # 2️⃣ Commande Ghostscript
-    gs_executable = r"C:\Program Files\gs\gs10.06.0\bin\gswin64c.exe"
-    gs_command = [
-        gs_executable,  # Ghostscript doit être dans PATH
-        "-dBATCH",
-        "-dNOPAUSE",
-        "-dSAFER",
-        "-sDEVICE=pdfwrite",
-        "-dPDFX",
-        "-sColorConversionStrategy=CMYK",
-        "-dProcessColorModel=/DeviceCMYK",
-        f"-r{dpi}",
-        f"-sOutputFile={output_pdf}",
-        temp_tiff
-    ]
-
-    print(f"[INFO] Exécution Ghostscript pour générer PDF/X-1a...")
-    
-    # Exécution et barre de progression simulée
-    process = subprocess.Popen(gs_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    for line in tqdm(process.stdout, desc="Conversion PDF/X", unit="line"):
-        pass  # Affiche la sortie Ghostscript si besoin : print(line.strip())
-
+def _kill(process):
+    """Arrête Ghostscript et ses éventuels sous-processus."""
+    try:
+        if os.name == "nt":
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
     process.wait()
-    if process.returncode == 0:
-        size_mo = os.path.getsize(output_pdf) / (1024**2)
-        print(f"[✅] PDF/X-1a généré : {output_pdf} ({size_mo:.2f} Mo)")
-    else:
-        print(f"[❌] Erreur Ghostscript (code {process.returncode})")
 
-    # 3️⃣ Nettoyage
-    if os.path.exists(temp_tiff):
-        os.remove(temp_tiff)
+def tiff_to_pdfx(input_tiff, output_pdf, dpi=300, timeout=GS_TIMEOUT, gs_executable=None):
+    """
+    Convertit un TIFF CMJN volumineux en PDF/X-1a via GhostPDL (gpdl).
+
+    Le TIFF source est passé directement s'il est compatible ; sinon il est réencodé
+    dans un répertoire temporaire propre à cette conversion. Ghostscript est tué
+    s'il dépasse `timeout` secondes.
+    """
+    gs_executable = gs_executable or find_ghostscript()
+    input_tiff = os.path.abspath(input_tiff)
+    output_pdf = os.path.abspath(output_pdf)
+
+    with tempfile.TemporaryDirectory(prefix="printprep_gs_") as work_dir:
+        # 1️⃣ Réencodage TIFF uniquement si nécessaire
+        if is_gs_compatible(input_tiff):
+            source = input_tiff
+        else:
+            source = prepare_tiff_for_gs(input_tiff, os.path.join(work_dir, "source.tiff"))
+
+        # 2️⃣ Commande Ghostscript
+        gs_command = [
+            gs_executable,
+            "-dBATCH",
+            "-dNOPAUSE",
+            "-dSAFER",
+            "-sDEVICE=pdfwrite",
+            "-dPDFX",
+            "-sColorConversionStrategy=CMYK",
+            "-dProcessColorModel=/DeviceCMYK",
+            f"-r{dpi}",
+            f"-sOutputFile={output_pdf}",
+            source
+        ]
+
+        print(f"[INFO] Exécution Ghostscript pour générer PDF/X-1a...")
+        process = subprocess.Popen(
+            gs_command, cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, start_new_session=(os.name != "nt")
+        )
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill(process)
+            raise TimeoutError(f"Ghostscript a dépassé {timeout}s pour {os.path.basename(input_tiff)}")
+
+    if process.returncode != 0:
+        details = "\n".join(output.strip().splitlines()[-10:])
+        raise RuntimeError(f"Erreur Ghostscript (code {process.returncode}) :\n{details}")
 
+    size_mo = os.path.getsize(output_pdf) / (1024**2)
+    print(f"[✅] PDF/X-1a généré : {output_pdf} ({size_mo:.2f} Mo)")
     return output_pdf
 
+def tiffs_to_pdfx(jobs, max_workers=None, dpi=300, timeout=GS_TIMEOUT):
+    """
+    Lance plusieurs conversions Ghostscript en parallèle.
+
+    Args:
+        jobs (list): couples (input_tiff, output_pdf).
+        max_workers (int): conversions simultanées (défaut : moitié des cœurs).
+
+    Returns:
+        list: un dict par job (input, output, success, seconds, error), dans l'ordre.
+    """
+    gs_executable = find_ghostscript()
+    max_workers = max_workers or max(1, detect_cpu_count() // 2)
+
+    def run(job):
+        input_tiff, output_pdf = job
+        start = time.perf_counter()
+        try:
+            tiff_to_pdfx(input_tiff, output_pdf, dpi=dpi, timeout=timeout, gs_executable=gs_executable)
+            error = None
+        except Exception as e:
+            error = str(e)
+        return {
+            "input": input_tiff,
+            "output": output_pdf,
+            "success": error is None,
+            "seconds": round(time.perf_counter() - start, 2),
+            "error": error
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(run, jobs))
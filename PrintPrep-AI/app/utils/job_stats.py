@@ -0,0 +1,113 @@
+# Débit mesuré par étape (mégapixels / seconde) sur cette machine, pour prédire les durées
+import sqlite3
+from contextlib import closing
+import threading
+import statistics
+import time
+import os
+
+# Base SQLite des mesures, surchargeable via PRINTPREP_STATS_DB
+DEFAULT_DB_PATH = os.path.join(".cache", "job_stats.sqlite3")
+
+# Débits par défaut (Mpx/s) tant qu'aucune mesure n'existe pour l'étape
+DEFAULT_MP_PER_SECOND = {
+    "upscale": 0.5,     # API distante RealESRGAN, mégapixels produits
+    "lanczos": 20.0,    # mégapixels produits
+    "enhance": 2.0,     # fastNlMeans domine
+    "soft_proof": 10.0,
+    "cmyk": 8.0,
+    "pdfx": 15.0,
+    "export": 10.0,
+    "vectorize": 5.0,
+    "print": 3.0,       # pipeline complet (Pillow), mégapixels produits
+    "print_vips": 10.0, # pipeline complet (graphe libvips), mégapixels produits
+}
+
+# Nombre de mesures récentes utilisées pour le débit (médiane)
+RECENT_RUNS = 50
+
+# Taille de travail maximale de la vectorisation (voir vectorize.TRACE_MAX_DIM)
+VECTORIZE_MAX_PIXELS = 2000 * 2000
+
+
+def stage_megapixels(width, height, stage, scale=1.0):
+    """Mégapixels traités par une étape : pixels produits pour l'upscaling, pixels source sinon."""
+    pixels = width * height
+    if stage in ("upscale", "lanczos", "print", "print_vips"):
+        pixels *= scale * scale
+    elif stage == "vectorize":
+        pixels = min(pixels, VECTORIZE_MAX_PIXELS)
+    return pixels / 1e6
+
+
+class JobStats:
+    """Historique local des exécutions, alimenté par les vrais traitements."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        # Le gestionnaire de contexte de sqlite3 ne fait que valider la transaction :
+        # les appelants ferment la connexion avec closing()
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with closing(sqlite3.connect(self.db_path)) as conn, conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS runs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        stage TEXT NOT NULL,
+                        megapixels REAL NOT NULL,
+                        seconds REAL NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_stage ON runs (stage, id)")
+            self._ready = True
+        return sqlite3.connect(self.db_path)
+
+    def record(self, stage, megapixels, seconds):
+        """Enregistre une exécution réussie (ignorée si trop courte pour être significative)."""
+        if megapixels <= 0 or seconds < 0.05:
+            return
+        try:
+            with self._lock, closing(self._connect()) as conn, conn:
+                conn.execute("INSERT INTO runs (stage, megapixels, seconds, created_at) VALUES (?, ?, ?, ?)",
+                             (stage, megapixels, seconds, time.time()))
+        except sqlite3.Error as e:
+            print(f"[WARN] Statistiques non enregistrées : {e}")
+
+    def throughput(self, stage):
+        """
+        Débit de l'étape en Mpx/s : médiane des dernières mesures, sinon valeur par défaut.
+
+        Returns:
+            tuple: (mégapixels par seconde, nombre de mesures utilisées)
+        """
+        try:
+            with self._lock, closing(self._connect()) as conn:
+                rows = conn.execute("SELECT megapixels / seconds FROM runs WHERE stage = ? "
+                                    "ORDER BY id DESC LIMIT ?", (stage, RECENT_RUNS)).fetchall()
+        except sqlite3.Error:
+            rows = []
+        if rows:
+            return statistics.median(r[0] for r in rows), len(rows)
+        return DEFAULT_MP_PER_SECOND.get(stage, 5.0), 0
+
+    def estimate_seconds(self, stage, megapixels):
+        mp_per_second, _ = self.throughput(stage)
+        return megapixels / mp_per_second
+
+    def summary(self):
+        """Débit et nombre de mesures pour chaque étape connue."""
+        stages = sorted(set(DEFAULT_MP_PER_SECOND))
+        result = {}
+        for stage in stages:
+            mp_per_second, samples = self.throughput(stage)
+            result[stage] = {"mp_per_second": round(mp_per_second, 3), "samples": samples}
+        return result
+
+
+# Instance partagée (alimentée par scheduler.reserve)
+job_stats = JobStats(os.getenv("PRINTPREP_STATS_DB", DEFAULT_DB_PATH))
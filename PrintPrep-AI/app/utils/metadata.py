@@ -13,59 +13,213 @@
 #     return info
 # utils/metadata.py
 from PIL import Image, ImageCms
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import hashlib
+import struct
 import os
 import io
+from app.utils.tiff_io import TiffReader
 
-def read_metadata(image_path):
+# Nombre de fichiers gardés en cache (clé : chemin, taille, date de modification)
+METADATA_CACHE_SIZE = 512
+
+# Dossier des profils ICC livrés avec l'application
+PROFILES_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+
+# Espaces couleur PDF -> mode Pillow
+PDF_COLORSPACES = {"/DeviceCMYK": "CMYK", "/DeviceRGB": "RGB", "/DeviceGray": "L"}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_icc_names = None
+
+
+def _icc_description(data):
     """
-    Lit et retourne un dictionnaire de métadonnées pertinentes pour le pipeline.
-    Conserve uniquement les données utiles aux images générées par IA.
-    
-    Returns:
-        dict with keys:
-          format, mode, size, dpi, icc_profile_present, icc_profile_name,
-          bits_per_channel, filesize_bytes
+    Lit la description ('desc') d'un profil ICC directement dans sa table des tags :
+    type 'desc' (ICC v2, ASCII) ou 'mluc' (ICC v4, UTF-16BE).
     """
-    result = {}
-    filesize = os.path.getsize(image_path)
-    result["filesize_bytes"] = filesize
+    count = struct.unpack(">I", data[128:132])[0]
+    for i in range(count):
+        signature, offset, size = struct.unpack(">4sII", data[132 + 12 * i:144 + 12 * i])
+        if signature != b"desc":
+            continue
+        tag = data[offset:offset + size]
+        if tag[:4] == b"desc":
+            length = struct.unpack(">I", tag[8:12])[0]
+            return tag[12:12 + length].split(b"\0", 1)[0].decode("latin-1").strip()
+        if tag[:4] == b"mluc":
+            record_size = struct.unpack(">I", tag[12:16])[0]
+            text_size, text_offset = struct.unpack(">II", tag[20:28])
+            if record_size >= 12:
+                return tag[text_offset:text_offset + text_size].decode("utf-16-be").strip("\0 ")
+    raise ValueError("Tag 'desc' absent du profil ICC.")
+
+
+def _known_profiles():
+    """Table hash du profil -> nom, construite une fois à partir des profils livrés."""
+    global _icc_names
+    if _icc_names is None:
+        names = {}
+        for path in sorted(Path(PROFILES_DIR).glob("*.icc")):
+            data = path.read_bytes()
+            try:
+                names[hashlib.md5(data).hexdigest()] = _icc_description(data)
+            except Exception:
+                names[hashlib.md5(data).hexdigest()] = path.stem
+        _icc_names = names
+    return _icc_names
+
+
+def icc_profile_name(icc_profile_bytes):
+    """
+    Nom d'un profil ICC : recherché par hash dans la table des profils connus,
+    sinon lu dans le tag 'desc' (puis mémorisé).
+    """
+    names = _known_profiles()
+    digest = hashlib.md5(icc_profile_bytes).hexdigest()
+    if digest not in names:
+        try:
+            names[digest] = _icc_description(icc_profile_bytes)
+        except Exception:
+            try:
+                icc = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile_bytes))
+                try:
+                    names[digest] = ImageCms.getProfileName(icc).strip()
+                except Exception:
+                    names[digest] = "ICC profile (nom inconnu)"
+            except Exception:
+                names[digest] = "profil ICC invalide"
+    return names[digest]
+
+
+def _probe_tiff(image_path):
+    """Métadonnées d'un TIFF lues dans le premier IFD uniquement (None si non géré)."""
+    try:
+        reader = TiffReader(image_path)
+    except (ValueError, struct.error):
+        return None
+    if reader.mode is None:
+        return None
+    return {
+        "format": "TIFF",
+        "mode": reader.mode,
+        "size": (reader.width, reader.height),
+        "dpi": reader.dpi,
+        "bits_per_channel": reader.bits,
+        "icc_profile": reader.icc_profile,
+    }
 
-    with Image.open(image_path) as img:
-        result["format"] = img.format
-        result["mode"] = img.mode
-        result["size"] = img.size  # (width_px, height_px)
 
-        # DPI (certaines images le stockent différemment)
-        dpi = img.info.get("dpi") or img.info.get("resolution") or None
-        result["dpi"] = dpi
+def _probe_pdf(image_path):
+    """
+    Métadonnées d'un PDF : première image de la première page et profil de
+    l'OutputIntent. Seuls les dictionnaires sont lus, jamais les flux d'image.
+    """
+    import pikepdf
+
+    with pikepdf.open(image_path) as pdf:
+        page = pdf.pages[0]
+        media_box = [float(v) for v in page.MediaBox]
+        page_w, page_h = media_box[2] - media_box[0], media_box[3] - media_box[1]
+
+        result = {"format": "PDF", "mode": None, "size": None, "dpi": None,
+                  "bits_per_channel": None, "icc_profile": None, "pages": len(pdf.pages)}
+        xobjects = page.get("/Resources", {}).get("/XObject", {})
+        for key in xobjects.keys():
+            image = xobjects[key]
+            if image.get("/Subtype") != "/Image":
+                continue
+            width, height = int(image.Width), int(image.Height)
+            result["mode"] = PDF_COLORSPACES.get(str(image.get("/ColorSpace")), str(image.get("/ColorSpace")))
+            result["size"] = (width, height)
+            result["bits_per_channel"] = int(image.get("/BitsPerComponent", 8))
+            if page_w and page_h:
+                result["dpi"] = (round(width * 72 / page_w, 2), round(height * 72 / page_h, 2))
+            break
 
+        intents = pdf.Root.get("/OutputIntents")
+        if intents and "/DestOutputProfile" in intents[0]:
+            result["icc_profile"] = intents[0].DestOutputProfile.read_bytes()
+    return result
+
+
+def _probe_pillow(image_path):
+    """Autres formats : Pillow ne lit que l'en-tête tant que les pixels ne sont pas demandés."""
+    with Image.open(image_path) as img:
         # Profondeur de bits par canal
         try:
             if hasattr(img, "tag_v2") and "BitsPerSample" in img.tag_v2:
                 bits = img.tag_v2.get("BitsPerSample")
                 if isinstance(bits, (list, tuple)):
                     bits = bits[0]
-                result["bits_per_channel"] = int(bits)
+                bits = int(bits)
             else:
                 mode_to_bits = {"1": 1, "L": 8, "P": 8, "RGB": 8, "RGBA": 8, "CMYK": 8, "I;16": 16}
-                result["bits_per_channel"] = mode_to_bits.get(img.mode, 8)
+                bits = mode_to_bits.get(img.mode, 8)
         except Exception:
-            result["bits_per_channel"] = None
+            bits = None
 
-        # Profil ICC (utile pour la conversion colorimétrique)
-        icc_profile_bytes = img.info.get("icc_profile")
-        result["icc_profile_present"] = bool(icc_profile_bytes)
-        result["icc_profile_name"] = None
-        if icc_profile_bytes:
-            try:
-                icc = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile_bytes))
-                try:
-                    result["icc_profile_name"] = ImageCms.getProfileName(icc)
-                except Exception:
-                    result["icc_profile_name"] = "ICC profile (nom inconnu)"
-            except Exception:
-                result["icc_profile_name"] = "profil ICC invalide"
+        return {
+            "format": img.format,
+            "mode": img.mode,
+            "size": img.size,  # (width_px, height_px)
+            # DPI (certaines images le stockent différemment)
+            "dpi": img.info.get("dpi") or img.info.get("resolution") or None,
+            "bits_per_channel": bits,
+            "icc_profile": img.info.get("icc_profile"),
+        }
 
-    return result
 
+def _probe(image_path):
+    with open(image_path, "rb") as f:
+        signature = f.read(5)
+    probed = None
+    if signature[:4] in (b"II*\0", b"MM\0*", b"II+\0", b"MM\0+"):
+        probed = _probe_tiff(image_path)
+    elif signature == b"%PDF-":
+        try:
+            probed = _probe_pdf(image_path)
+        except ImportError:
+            # pikepdf absent : format seul (Pillow ne lit pas les PDF)
+            probed = {"format": "PDF", "mode": None, "size": None, "dpi": None,
+                      "bits_per_channel": None, "icc_profile": None}
+    return probed or _probe_pillow(image_path)
+
+
+def read_metadata(image_path):
+    """
+    Lit et retourne un dictionnaire de métadonnées pertinentes pour le pipeline.
+    Conserve uniquement les données utiles aux images générées par IA.
+
+    Seuls les en-têtes sont lus (IFD TIFF, dictionnaires PDF, en-tête Pillow) ;
+    le résultat est mis en cache tant que le fichier (taille, date) ne change pas.
+
+    Returns:
+        dict with keys:
+          format, mode, size, dpi, icc_profile_present, icc_profile_name,
+          bits_per_channel, filesize_bytes (et pages pour un PDF)
+    """
+    stat = os.stat(image_path)
+    key = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return dict(_cache[key])
+
+    probed = _probe(image_path)
+    icc_profile_bytes = probed.pop("icc_profile")
+
+    result = {"filesize_bytes": stat.st_size}
+    result.update(probed)
+    # Profil ICC (utile pour la conversion colorimétrique)
+    result["icc_profile_present"] = bool(icc_profile_bytes)
+    result["icc_profile_name"] = icc_profile_name(icc_profile_bytes) if icc_profile_bytes else None
 
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > METADATA_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(result)
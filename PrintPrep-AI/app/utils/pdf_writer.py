@@ -0,0 +1,215 @@
+# Écriture PDF/X-1a en flux : les pixels passent directement du TIFF au fichier PDF
+from pathlib import Path
+from datetime import datetime
+import hashlib
+import shutil
+import zlib
+import os
+
+# Résolution utilisée par img2pdf quand l'image n'en déclare pas
+DEFAULT_DPI = 96
+
+
+def pdf_text(value):
+    """Chaîne PDF : littérale si ASCII, sinon UTF-16BE avec BOM (hexadécimal)."""
+    try:
+        value.encode("ascii")
+    except UnicodeEncodeError:
+        return "<FEFF" + value.encode("utf-16-be").hex().upper() + ">"
+    escaped = value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"({escaped})"
+
+
+def pdf_date(moment=None):
+    """Date au format PDF (D:AAAAMMJJHHmmSS)."""
+    return (moment or datetime.now()).strftime("D:%Y%m%d%H%M%S")
+
+
+def pdf_number(value):
+    """Nombre PDF sans zéros superflus (1024.0 -> 1024)."""
+    return f"{value:.4f}".rstrip("0").rstrip(".")
+
+
+def page_size_points(width, height, dpi=None):
+    """Taille de page en points (1/72 pouce) à partir des pixels et de la résolution."""
+    # Résolution absente ou nulle (TIFF sans résolution : dpi=(0, 0)) -> DEFAULT_DPI
+    if not dpi or dpi[0] <= 0 or dpi[1] <= 0:
+        dpi = (DEFAULT_DPI, DEFAULT_DPI)
+    dpi_x, dpi_y = dpi
+    return pdf_number(width * 72.0 / dpi_x), pdf_number(height * 72.0 / dpi_y)
+
+
+def compress_image_stream(chunks, output_file, level=6):
+    """
+    Compresse des bandes brutes en un unique flux zlib écrit dans output_file.
+    Retourne la taille compressée.
+    """
+    compressor = zlib.compressobj(level)
+    length = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        output_file.write(data)
+        length += len(data)
+    data = compressor.flush()
+    output_file.write(data)
+    return length + len(data)
+
+
+class PdfXWriter:
+    """
+    Écrit un PDF/X-1a:2001 objet par objet directement sur disque.
+
+    Le profil ICC et l'OutputIntent sont écrits une seule fois et partagés par
+    toutes les pages ; les images sont compressées au fil de l'eau, si bien que
+    la mémoire utilisée ne dépend pas de la taille de l'image.
+
+    Usage :
+        with PdfXWriter("out.pdf", "profiles/CoatedFOGRA39.icc") as pdf:
+            pdf.add_image_page(width, height, strips, dpi=(300, 300))
+    """
+
+    def __init__(self, output_path, icc_profile_path, title="Export Print Haute Qualité",
+                 output_condition="FOGRA39", output_info="FOGRA39 ISO 12647-2"):
+        self.output_path = Path(output_path)
+        self.title = title
+        self.f = open(self.output_path, "wb")
+        self.offsets = {}
+        self.next_num = 1
+        self.page_refs = []
+        self.catalog_num = self._alloc()
+        self.pages_num = self._alloc()
+
+        self.f.write(b"%PDF-1.3\n%\xe2\xe3\xcf\xd3\n")
+
+        # Profil ICC partagé (N=4 pour CMYK)
+        icc_data = Path(icc_profile_path).read_bytes()
+        self.icc_num = self._alloc()
+        self._write_stream(self.icc_num, f"/N 4 /Alternate /DeviceCMYK /Length {len(icc_data)}", icc_data)
+
+        # OutputIntent PDF/X
+        self.output_intent_num = self._alloc()
+        self._write_object(self.output_intent_num,
+                           f"<< /Type /OutputIntent /S /GTS_PDFX "
+                           f"/OutputConditionIdentifier {pdf_text(output_condition)} "
+                           f"/RegistryName (http://www.color.org) /Info {pdf_text(output_info)} "
+                           f"/DestOutputProfile {self.icc_num} 0 R >>")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
+            self.output_path.unlink(missing_ok=True)
+        return False
+
+    # --- Objets bas niveau ---
+
+    def _alloc(self):
+        num = self.next_num
+        self.next_num += 1
+        return num
+
+    def _begin(self, num):
+        self.offsets[num] = self.f.tell()
+        self.f.write(f"{num} 0 obj\n".encode("ascii"))
+
+    def _write_object(self, num, body):
+        self._begin(num)
+        self.f.write(body.encode("ascii"))
+        self.f.write(b"\nendobj\n")
+
+    def _write_stream(self, num, dictionary, data):
+        self._begin(num)
+        self.f.write(f"<< {dictionary} >>\nstream\n".encode("ascii"))
+        self.f.write(data)
+        self.f.write(b"\nendstream\nendobj\n")
+
+    # --- Pages ---
+
+    def _write_image_object(self, width, height, write_data):
+        """Écrit un XObject image CMYK dont la longueur est un objet indirect écrit après coup."""
+        image_num = self._alloc()
+        length_num = self._alloc()
+        self._begin(image_num)
+        self.f.write((f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                      f"/ColorSpace /DeviceCMYK /BitsPerComponent 8 /Filter /FlateDecode "
+                      f"/Length {length_num} 0 R >>\nstream\n").encode("ascii"))
+        length = write_data(self.f)
+        self.f.write(b"\nendstream\nendobj\n")
+        self._write_object(length_num, str(length))
+        return image_num
+
+    def _write_page(self, page_w, page_h, content, resources="", filter_name=None):
+        content_num = self._alloc()
+        dictionary = f"/Length {len(content)}" + (f" /Filter /{filter_name}" if filter_name else "")
+        self._write_stream(content_num, dictionary, content)
+
+        page_num = self._alloc()
+        box = f"[0 0 {page_w} {page_h}]"
+        self._write_object(page_num,
+                           f"<< /Type /Page /Parent {self.pages_num} 0 R /MediaBox {box} /TrimBox {box} "
+                           f"/Resources << {resources} >> /Contents {content_num} 0 R >>")
+        self.page_refs.append(page_num)
+        return page_num
+
+    def _write_image_page(self, image_num, width, height, dpi):
+        page_w, page_h = page_size_points(width, height, dpi)
+        content = f"q {page_w} 0 0 {page_h} 0 0 cm /Im0 Do Q".encode("ascii")
+        return self._write_page(page_w, page_h, content, f"/XObject << /Im0 {image_num} 0 R >>")
+
+    def add_image_page(self, width, height, strips, dpi=None, level=6):
+        """Ajoute une page à partir de bandes CMYK brutes, compressées à la volée."""
+        image_num = self._write_image_object(
+            width, height, lambda f: compress_image_stream(strips, f, level))
+        return self._write_image_page(image_num, width, height, dpi)
+
+    def add_encoded_page(self, width, height, encoded_path, dpi=None):
+        """Ajoute une page dont l'image est déjà compressée (flux zlib dans encoded_path)."""
+        def copy(f):
+            with open(encoded_path, "rb") as src:
+                shutil.copyfileobj(src, f, 4 * 1024**2)
+            return os.path.getsize(encoded_path)
+        image_num = self._write_image_object(width, height, copy)
+        return self._write_image_page(image_num, width, height, dpi)
+
+    def add_vector_page(self, page_w, page_h, content, level=6):
+        """
+        Ajoute une page vectorielle : `content` est un flux d'opérateurs PDF
+        (tracés et couleurs DeviceCMYK) exprimé en points, compressé ici.
+        """
+        return self._write_page(pdf_number(page_w), pdf_number(page_h),
+                                zlib.compress(content, level), filter_name="FlateDecode")
+
+    # --- Finalisation ---
+
+    def close(self):
+        """Écrit l'arbre des pages, le catalogue, les métadonnées Info et la table xref."""
+        if self.f.closed:
+            return
+        kids = " ".join(f"{num} 0 R" for num in self.page_refs)
+        self._write_object(self.pages_num,
+                           f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_refs)} >>")
+        self._write_object(self.catalog_num,
+                           f"<< /Type /Catalog /Pages {self.pages_num} 0 R "
+                           f"/OutputIntents [{self.output_intent_num} 0 R] >>")
+
+        # Métadonnées Info (clés obligatoires PDF/X)
+        now = pdf_date()
+        info_num = self._alloc()
+        self._write_object(info_num,
+                           f"<< /Title {pdf_text(self.title)} /Producer (PrintPrep-AI) "
+                           f"/CreationDate ({now}) /ModDate ({now}) /Trapped /False "
+                           f"/GTS_PDFXVersion (PDF/X-1:2001) /GTS_PDFXConformance (PDF/X-1a:2001) >>")
+
+        xref_offset = self.f.tell()
+        self.f.write(f"xref\n0 {self.next_num}\n0000000000 65535 f \n".encode("ascii"))
+        for num in range(1, self.next_num):
+            self.f.write(f"{self.offsets[num]:010d} 00000 n \n".encode("ascii"))
+        file_id = hashlib.md5(f"{self.output_path.resolve()}{now}".encode("utf-8")).hexdigest()
+        self.f.write((f"trailer\n<< /Size {self.next_num} /Root {self.catalog_num} 0 R "
+                      f"/Info {info_num} 0 R /ID [<{file_id}> <{file_id}>] >>\n"
+                      f"startxref\n{xref_offset}\n%%EOF\n").encode("ascii"))
+        self.f.close()
@@ -0,0 +1,313 @@
+# Contrôle d'admission mémoire pour les traitements d'image lourds
+from PIL import Image
+import asyncio
+import os
+import threading
+import itertools
+import time
+from contextlib import asynccontextmanager
+from app.utils.job_stats import job_stats, stage_megapixels
+from app.utils.tiff_io import is_streamable
+
+Image.MAX_IMAGE_PIXELS = None
+
+# Octets par pixel selon le mode Pillow
+MODE_BYTES = {"1": 1, "L": 1, "P": 1, "LA": 2, "RGB": 3, "YCbCr": 3, "LAB": 3, "HSV": 3,
+              "RGBA": 4, "RGBX": 4, "CMYK": 4, "I": 4, "F": 4, "I;16": 2}
+
+# Budget par défaut : 4 Go, surchargeable via PRINTPREP_MEMORY_BUDGET_MB
+DEFAULT_BUDGET_MB = 4096
+
+# Taille des blocs de la conversion CMJN en mode tuilé
+DEFAULT_TILE_SIZE = 2048
+
+# Étapes qui agrandissent l'image (la suivante travaille sur l'image agrandie)
+SCALING_STAGES = ("upscale", "lanczos", "print", "print_vips")
+
+# Étapes qui lisent la source par bandes (tiff_io.open_strips)
+STREAMING_STAGES = ("pdfx", "export")
+
+
+def read_image_header(image_path):
+    """
+    Lit uniquement l'en-tête de l'image (dimensions, mode) sans décoder les pixels.
+    Pillow ne charge les données qu'au premier accès aux pixels.
+    """
+    with Image.open(image_path) as img:
+        return img.size[0], img.size[1], img.mode
+
+
+def estimate_peak_bytes(width, height, mode, stage, scale=1.0, streamed=True):
+    """
+    Estime le pic mémoire (en octets) d'une étape du pipeline.
+
+    Args:
+        width, height (int): dimensions de l'image source.
+        mode (str): mode Pillow de la source ("RGB", "CMYK", ...).
+        stage (str): "upscale", "lanczos", "enhance", "soft_proof", "cmyk", "pdfx", "export", "vectorize",
+                     "print" ou "print_vips" (pipeline d'impression complet, backend Pillow ou vips).
+        scale (float): facteur d'agrandissement (upscale / lanczos).
+        streamed (bool): source lue en flux par les étapes "pdfx" / "export" ; sinon
+                         Pillow la charge entièrement (LZW, tuiles, autres formats...).
+
+    Returns:
+        int: estimation du pic mémoire en octets.
+    """
+    pixels = width * height
+    src = pixels * MODE_BYTES.get(mode, 4)
+    rgb = pixels * 3
+    scaled = int(pixels * scale * scale)
+
+    if stage == "upscale":
+        # Source encodée pour l'API + lecture du résultat (RGB) pour les métadonnées
+        return src + scaled * 3
+    if stage == "lanczos":
+        # Source + image redimensionnée + tampon d'encodage
+        return src + scaled * MODE_BYTES.get(mode, 4) * 2
+    if stage == "enhance":
+        # cv2 : image, débruitée, accentuée + tampons internes de fastNlMeans
+        return rgb * 5
+    if stage == "soft_proof":
+        # Source RGB complète + aperçu réduit (4000 px max) en RGB/CMYK/RGB
+        preview = min(pixels, 4000 * 4000)
+        return src + rgb + preview * 10
+    if stage == "cmyk":
+        # Source RGB (convertie si besoin) + image CMJN de sortie + tampons de compression
+        convert = rgb if mode != "RGB" else 0
+        return src + convert + pixels * 4 + pixels
+    # Repli Pillow des étapes en flux : image source entière en mémoire en plus des bandes
+    unstreamed = 0 if streamed else src
+    if stage == "pdfx":
+        # Export en flux : quelques bandes décodées et compressées à la fois
+        return unstreamed + min(pixels * 4, 64 * 1024**2)
+    if stage == "export":
+        # Export multi-format : bandes en file pour chaque encodeur + aperçus réduits
+        return unstreamed + min(pixels * 4, 64 * 1024**2) * 2 + 2048 * 2048 * 4 * 2
+    if stage == "vectorize":
+        # Source décodée + image de travail (2000 px max) : RGB, étiquettes, masques, distances
+        work = min(pixels, 2000 * 2000)
+        return src + work * 12
+    if stage == "print":
+        # Pillow : source + image agrandie, accentuée et sa copie TIFF + CMJN complet + tampons
+        return src + scaled * 3 * 3 + scaled * 4 * 2
+    if stage == "print_vips":
+        # Graphe libvips évalué par bandes : quelques lignes par thread + export PDF en flux
+        return min(src + scaled * 4, 256 * 1024**2)
+    raise ValueError(f"Étape inconnue '{stage}'.")
+
+
+def estimate_job_memory(image_path, stage, scale=1.0):
+    """Estime le pic mémoire d'un traitement à partir de l'en-tête du fichier."""
+    width, height, mode = read_image_header(image_path)
+    streamed = stage not in STREAMING_STAGES or is_streamable(image_path)
+    return estimate_peak_bytes(width, height, mode, stage, scale, streamed)
+
+
+class MemoryScheduler:
+    """
+    Admet les traitements tant que la somme des pics estimés tient dans le budget.
+    Les autres attendent dans une file FIFO. Un traitement plus gros que le budget
+    entier n'est admis que lorsqu'aucun autre n'est en cours.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.reserved_bytes = 0
+        self._running = {}
+        self._waiting = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._cond = None
+
+    def _condition(self):
+        # Créée paresseusement pour être liée à la boucle d'événements d'uvicorn
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _fits(self, job_id, estimate):
+        if not self._waiting or self._waiting[0] != job_id:
+            return False
+        if not self._running:
+            return True
+        return self.reserved_bytes + estimate <= self.budget_bytes
+
+    @asynccontextmanager
+    async def reserve(self, image_path, stage, scale=1.0, extra_bytes=0):
+        """
+        Réserve la mémoire estimée d'un traitement, en attendant si nécessaire.
+
+        Usage :
+            async with scheduler.reserve(path, "cmyk"):
+                await run_in_threadpool(convert_to_cmyk, ...)
+        """
+        width, height, mode = read_image_header(image_path)
+        streamed = stage not in STREAMING_STAGES or is_streamable(image_path)
+        estimate = estimate_peak_bytes(width, height, mode, stage, scale, streamed) + extra_bytes
+        megapixels = stage_megapixels(width, height, stage, scale)
+        async with self._admit(os.path.basename(image_path), stage, estimate, megapixels) as reserved:
+            yield reserved
+
+    @asynccontextmanager
+    async def reserve_pages(self, image_paths, stage, workers):
+        """
+        Réserve un traitement multipage dont `workers` pages sont traitées à la fois
+        (export PDF/X multipage) : `workers` fois le plus gros pic estimé par page,
+        d'après les dimensions en pixels et la lecture en flux de chaque page.
+        """
+        peaks = []
+        megapixels = 0.0
+        for path in image_paths:
+            width, height, mode = read_image_header(path)
+            streamed = stage not in STREAMING_STAGES or is_streamable(path)
+            peaks.append(estimate_peak_bytes(width, height, mode, stage, streamed=streamed))
+            megapixels += stage_megapixels(width, height, stage)
+        estimate = max(peaks) * max(1, min(workers, len(peaks)))
+        label = f"{os.path.basename(image_paths[0])} (+{len(image_paths) - 1} pages)"
+        async with self._admit(label, stage, estimate, megapixels) as reserved:
+            yield reserved
+
+    @asynccontextmanager
+    async def _admit(self, label, stage, estimate, megapixels):
+        """Attend que `estimate` octets tiennent dans le budget, puis les réserve pendant le traitement."""
+        # Accès SQLite hors de la boucle d'événements
+        predicted = await asyncio.to_thread(job_stats.estimate_seconds, stage, megapixels)
+        job_id = next(self._ids)
+        cond = self._condition()
+
+        async with cond:
+            self._waiting.append(job_id)
+            try:
+                await cond.wait_for(lambda: self._fits(job_id, estimate))
+            except BaseException:
+                self._waiting.remove(job_id)
+                cond.notify_all()
+                raise
+            self._waiting.pop(0)
+            with self._lock:
+                self.reserved_bytes += estimate
+                self._running[job_id] = {"stage": stage, "file": label,
+                                         "estimated_bytes": estimate, "megapixels": round(megapixels, 2),
+                                         "predicted_seconds": round(predicted, 1),
+                                         "started": time.monotonic()}
+            cond.notify_all()
+
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            yield estimate
+            succeeded = True
+        finally:
+            async with cond:
+                with self._lock:
+                    self.reserved_bytes -= estimate
+                    del self._running[job_id]
+                cond.notify_all()
+            # Mesure réelle : alimente les prédictions suivantes
+            if succeeded:
+                await asyncio.to_thread(job_stats.record, stage, megapixels, time.perf_counter() - started)
+
+    @property
+    def queue_depth(self):
+        """Nombre de traitements en attente d'admission."""
+        return len(self._waiting)
+
+    @property
+    def available_bytes(self):
+        """Mémoire du budget non réservée."""
+        return max(self.budget_bytes - self.reserved_bytes, 0)
+
+    def status(self):
+        """État courant du planificateur (pour la route /jobs/status), avec l'ETA de chaque traitement."""
+        now = time.monotonic()
+        with self._lock:
+            running = []
+            for job in self._running.values():
+                job = dict(job)
+                elapsed = now - job.pop("started")
+                job["elapsed_seconds"] = round(elapsed, 1)
+                job["eta_seconds"] = round(max(job["predicted_seconds"] - elapsed, 0), 1)
+                job["progress"] = round(min(elapsed / job["predicted_seconds"], 0.99), 2) if job["predicted_seconds"] else None
+                running.append(job)
+            return {
+                "budget_mb": round(self.budget_bytes / 1024**2, 1),
+                "reserved_mb": round(self.reserved_bytes / 1024**2, 1),
+                "running": running,
+                "queue_depth": self.queue_depth,
+            }
+
+
+def parse_stages(stages):
+    """Convertit ["upscale:6", "cmyk"] en [("upscale", 6.0), ("cmyk", 1.0)]."""
+    parsed = []
+    for item in stages:
+        name, _, scale = item.partition(":")
+        parsed.append((name.strip(), float(scale) if scale else 1.0))
+    return parsed
+
+
+def predict_job(image_path, stages):
+    """
+    Prédit durée et mémoire d'une suite d'étapes à partir de l'en-tête de l'image
+    et des débits mesurés sur cette machine.
+
+    Args:
+        image_path (str): image source.
+        stages (list): étapes, éventuellement avec facteur ("upscale:6", "lanczos:1.5", "cmyk", "pdfx").
+
+    Returns:
+        dict: détail par étape (taille d'entrée, durée, pic mémoire), totaux et respect du budget.
+    """
+    width, height, mode = read_image_header(image_path)
+    details = []
+    for stage, scale in parse_stages(stages):
+        peak = estimate_peak_bytes(width, height, mode, stage, scale)
+        megapixels = stage_megapixels(width, height, stage, scale)
+        mp_per_second, samples = job_stats.throughput(stage)
+        details.append({
+            "stage": stage,
+            "scale": scale,
+            "input_size": (width, height),
+            "megapixels": round(megapixels, 2),
+            "mp_per_second": round(mp_per_second, 3),
+            "samples": samples,
+            "seconds": round(megapixels / mp_per_second, 1),
+            "peak_mb": round(peak / 1024**2, 1),
+        })
+        if stage in SCALING_STAGES:
+            width, height = round(width * scale), round(height * scale)
+        if stage in ("cmyk", "print", "print_vips"):
+            mode = "CMYK"
+
+    peak_mb = max((d["peak_mb"] for d in details), default=0)
+    return {
+        "stages": details,
+        "total_seconds": round(sum(d["seconds"] for d in details), 1),
+        "peak_mb": peak_mb,
+        "fits_budget": peak_mb * 1024**2 <= scheduler.budget_bytes,
+        "queue_depth": scheduler.queue_depth,
+    }
+
+
+def choose_tile_size(image_path):
+    """
+    Mode de conversion CMJN : en une passe (plus rapide) si l'image RGB et sa copie
+    CMJN complète tiennent dans la mémoire libre du budget, sinon par blocs.
+
+    Returns:
+        tuple: (taille de bloc, mémoire supplémentaire à réserver en octets)
+    """
+    width, height, mode = read_image_header(image_path)
+    in_memory = estimate_peak_bytes(width, height, mode, "cmyk") + width * height * 4
+    if in_memory <= scheduler.available_bytes:
+        return max(width, height), width * height * 4
+    return DEFAULT_TILE_SIZE, 0
+
+
+def _budget_from_env():
+    budget_mb = float(os.getenv("PRINTPREP_MEMORY_BUDGET_MB", DEFAULT_BUDGET_MB))
+    return int(budget_mb * 1024**2)
+
+
+# Instance partagée par les routes de l'application
+scheduler = MemoryScheduler(_budget_from_env())
@@ -0,0 +1,124 @@
+# Budget de threads CPU partagé entre pools de workers et bibliothèques natives
+# (OpenCV, BLAS/OpenMP, libvips) pour éviter la sur-souscription des cœurs
+import os
+import sys
+
+# Variables lues par les bibliothèques natives au chargement
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS", "VIPS_CONCURRENCY")
+
+# Threads par worker appliqués au processus courant (None : pas encore configuré)
+_current_threads = None
+
+
+def _cgroup_cpu_limit():
+    """Limite CPU imposée par le conteneur (cgroup v2 puis v1), ou None."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def detect_cpu_count():
+    """
+    Cœurs réellement utilisables : PRINTPREP_CPUS si défini, sinon le minimum entre
+    l'affinité du processus et le quota cgroup (conteneurs Docker / Kubernetes).
+    """
+    configured = os.getenv("PRINTPREP_CPUS")
+    if configured:
+        return max(1, int(configured))
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows, macOS
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit:
+        cpus = min(cpus, max(1, int(limit)))
+    return max(1, cpus)
+
+
+def threads_per_worker(pool_size, cpus=None):
+    """Threads natifs accordés à chacun des pool_size workers."""
+    cpus = cpus or detect_cpu_count()
+    return max(1, cpus // max(1, pool_size))
+
+
+def apply_thread_budget(threads):
+    """
+    Limite les pools de threads natifs du processus courant à `threads`.
+
+    Les variables d'environnement ne sont prises en compte que par les bibliothèques
+    chargées ensuite (d'où l'appel en initializer des pools de processus) ; OpenCV,
+    libvips et, si threadpoolctl est installé, BLAS/OpenMP sont aussi réglés à chaud.
+    """
+    global _current_threads
+    threads = max(1, int(threads))
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+    import cv2
+    cv2.setNumThreads(threads)
+
+    if "pyvips" in sys.modules:
+        try:
+            sys.modules["pyvips"].vips_lib.vips_concurrency_set(threads)
+        except AttributeError:
+            pass
+
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+    _current_threads = threads
+    return threads
+
+
+def worker_threads():
+    """Threads que le code du processus courant peut utiliser (pools internes, compression)."""
+    return _current_threads or detect_cpu_count()
+
+
+def pool_initializer(threads):
+    """Initializer de ProcessPoolExecutor : applique le budget dans chaque worker."""
+    apply_thread_budget(threads)
+
+
+def process_pool_options(pool_size):
+    """
+    Arguments de ProcessPoolExecutor pour pool_size workers se partageant les cœurs.
+
+    Usage :
+        with ProcessPoolExecutor(**process_pool_options(4)) as pool: ...
+    """
+    import multiprocessing
+    return {
+        "max_workers": pool_size,
+        # spawn : pas d'héritage des threads d'OpenCV / du serveur dans les processus enfants
+        "mp_context": multiprocessing.get_context("spawn"),
+        "initializer": pool_initializer,
+        "initargs": (threads_per_worker(pool_size),),
+    }
+
+
+def configure_from_env():
+    """
+    Budget du serveur : PRINTPREP_CONCURRENT_JOBS traitements lourds simultanés
+    se partagent les cœurs détectés (défaut : 1, toutes les ressources par traitement).
+    """
+    concurrent_jobs = int(os.getenv("PRINTPREP_CONCURRENT_JOBS", 1))
+    return apply_thread_budget(threads_per_worker(concurrent_jobs))
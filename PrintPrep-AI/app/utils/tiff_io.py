@@ -0,0 +1,458 @@
+# Lecture et écriture TIFF par bandes (strips), compressées en parallèle
+from PIL import Image, ImageCms
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import numpy as np
+import struct
+import zlib
+import os
+from app.utils.thread_budget import worker_threads
+
+try:
+    import zstandard
+except ImportError:  # ZSTD est optionnel
+    zstandard = None
+
+Image.MAX_IMAGE_PIXELS = None
+
+# Valeurs du tag Compression (259). Pas de LZW en écriture : aucun encodeur natif
+# accessible par bande, et un encodeur Python tiendrait le GIL (~25x plus lent que Deflate).
+COMPRESSION_CODES = {"none": 1, "deflate": 8, "zstd": 50000}
+
+# Photometric (262) et nombre de canaux par mode Pillow (8 bits par canal)
+PHOTOMETRIC = {"L": 1, "RGB": 2, "RGBA": 2, "CMYK": 5}
+SAMPLES = {"L": 1, "RGB": 3, "RGBA": 4, "CMYK": 4}
+
+# Profils de compression selon l'usage du fichier :
+#   scratch      : relu uniquement par ce module (tuiles, fichiers temporaires)
+#   intermediate : rapide, lisible par libtiff/Ghostscript
+#   delivery     : compact, pour les fichiers livrés à l'imprimeur
+TIFF_PROFILES = {
+    "scratch": {"compression": "zstd" if zstandard else "none", "level": 1, "predictor": False},
+    "intermediate": {"compression": "deflate", "level": 1, "predictor": True},
+    "delivery": {"compression": "deflate", "level": 6, "predictor": True},
+}
+
+# Taille visée d'une bande non compressée (compromis parallélisme / ratio)
+STRIP_TARGET_BYTES = 4 * 1024**2
+
+# Types TIFF
+_BYTE, _ASCII, _SHORT, _LONG, _RATIONAL, _UNDEFINED, _LONG8 = 1, 2, 3, 4, 5, 7, 16
+_TYPE_FORMATS = {_BYTE: "B", _ASCII: "B", _SHORT: "H", _LONG: "I", _RATIONAL: "I",
+                 _UNDEFINED: "B", _LONG8: "Q"}
+
+
+def apply_horizontal_predictor(raw, width, samples):
+    """Prédicteur horizontal TIFF (Predictor=2) : différence avec le pixel précédent."""
+    arr = np.frombuffer(raw, dtype=np.uint8).reshape(-1, width, samples)
+    diff = arr.copy()
+    diff[:, 1:, :] -= arr[:, :-1, :]
+    return diff.tobytes()
+
+
+def compress_strip(raw, width, samples, compression="deflate", level=None, predictor=False):
+    """Compresse une bande brute selon le codec choisi."""
+    if predictor and compression != "none":
+        raw = apply_horizontal_predictor(raw, width, samples)
+    if compression == "none":
+        return raw
+    if compression == "deflate":
+        return zlib.compress(raw, 6 if level is None else level)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Le codec ZSTD nécessite le paquet 'zstandard'.")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(raw)
+    raise ValueError(f"Compression inconnue '{compression}'. Choisir parmi {list(COMPRESSION_CODES)}.")
+
+
+def _pack(typ, values):
+    """Encode les valeurs d'une entrée IFD."""
+    if typ in (_ASCII, _UNDEFINED, _BYTE) and isinstance(values, (bytes, bytearray)):
+        data = bytes(values)
+    else:
+        if typ == _RATIONAL:
+            values = [v for pair in values for v in pair]
+        data = struct.pack(f"<{len(values)}{_TYPE_FORMATS[typ]}", *values)
+    count = len(data) // struct.calcsize(_TYPE_FORMATS[typ])
+    if typ == _RATIONAL:
+        count //= 2
+    return count, data
+
+
+class TiffWriter:
+    """
+    Écrit un TIFF 8 bits par bandes. Les bandes sont compressées en parallèle
+    (zlib et zstd libèrent le GIL) puis écrites dans l'ordre, sans conserver
+    l'image compressée complète en mémoire.
+    """
+
+    def __init__(self, output_path, width, height, mode, compression="deflate", level=None,
+                 predictor=True, icc_profile=None, dpi=None, rows_per_strip=None,
+                 workers=None, bigtiff=None):
+        if mode not in PHOTOMETRIC:
+            raise ValueError(f"Mode non supporté pour l'écriture TIFF : {mode}")
+        if compression not in COMPRESSION_CODES:
+            raise ValueError(f"Compression inconnue '{compression}'. Choisir parmi {list(COMPRESSION_CODES)}.")
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.samples = SAMPLES[mode]
+        self.compression = compression
+        self.level = level
+        self.predictor = predictor and compression != "none"
+        self.icc_profile = icc_profile
+        self.dpi = dpi
+        row_bytes = width * self.samples
+        self.rows_per_strip = rows_per_strip or max(1, min(height, STRIP_TARGET_BYTES // row_bytes))
+        self.workers = workers or worker_threads()
+        # BigTIFF si le fichier risque de dépasser 4 Go (taille non compressée)
+        if bigtiff is None:
+            bigtiff = row_bytes * height > 0xF0000000
+        self.bigtiff = bigtiff
+        self.strip_offsets = []
+        self.strip_counts = []
+
+    def strip_boxes(self):
+        """Boîtes (left, top, right, bottom) des bandes, de haut en bas."""
+        for top in range(0, self.height, self.rows_per_strip):
+            yield (0, top, self.width, min(top + self.rows_per_strip, self.height))
+
+    def _compress(self, raw):
+        return compress_strip(raw, self.width, self.samples, self.compression, self.level, self.predictor)
+
+    def write_strips(self, strips):
+        """
+        Écrit le fichier à partir d'un itérable de bandes brutes (bytes),
+        dans l'ordre et de hauteur rows_per_strip (la dernière peut être plus courte).
+        """
+        with open(self.output_path, "wb") as f:
+            header_size = 16 if self.bigtiff else 8
+            f.write(b"\0" * header_size)
+            window = deque()
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for raw in strips:
+                    window.append(pool.submit(self._compress, raw))
+                    if len(window) >= self.workers * 2:
+                        self._write_strip(f, window.popleft().result())
+                while window:
+                    self._write_strip(f, window.popleft().result())
+            expected = -(-self.height // self.rows_per_strip)
+            if len(self.strip_offsets) != expected:
+                raise ValueError(f"{len(self.strip_offsets)} bandes reçues, {expected} attendues.")
+            self._write_ifd(f)
+        return self.output_path
+
+    def _write_strip(self, f, data):
+        self.strip_offsets.append(f.tell())
+        self.strip_counts.append(len(data))
+        f.write(data)
+
+    def _entries(self):
+        offset_type = _LONG8 if self.bigtiff else _LONG
+        entries = [
+            (256, _LONG, [self.width]),
+            (257, _LONG, [self.height]),
+            (258, _SHORT, [8] * self.samples),
+            (259, _SHORT, [COMPRESSION_CODES[self.compression]]),
+            (262, _SHORT, [PHOTOMETRIC[self.mode]]),
+            (273, offset_type, self.strip_offsets),
+            (277, _SHORT, [self.samples]),
+            (278, _LONG, [self.rows_per_strip]),
+            (279, offset_type, self.strip_counts),
+            (284, _SHORT, [1]),
+        ]
+        if self.dpi:
+            entries += [
+                (282, _RATIONAL, [(int(round(self.dpi[0] * 1000)), 1000)]),
+                (283, _RATIONAL, [(int(round(self.dpi[1] * 1000)), 1000)]),
+                (296, _SHORT, [2]),
+            ]
+        if self.predictor:
+            entries.append((317, _SHORT, [2]))
+        if self.mode == "CMYK":
+            entries.append((332, _SHORT, [1]))
+        if self.mode == "RGBA":
+            entries.append((338, _SHORT, [2]))
+        if self.icc_profile:
+            entries.append((34675, _UNDEFINED, self.icc_profile))
+        return sorted(entries, key=lambda e: e[0])
+
+    def _write_ifd(self, f):
+        inline = 8 if self.bigtiff else 4
+        packed = []
+        # Valeurs hors entrée écrites avant l'IFD, alignées sur un mot
+        for tag, typ, values in self._entries():
+            count, data = _pack(typ, values)
+            if len(data) > inline:
+                if f.tell() % 2:
+                    f.write(b"\0")
+                value = f.tell()
+                f.write(data)
+                packed.append((tag, typ, count, None, value))
+            else:
+                packed.append((tag, typ, count, data.ljust(inline, b"\0"), None))
+        if f.tell() % 2:
+            f.write(b"\0")
+        ifd_offset = f.tell()
+
+        if self.bigtiff:
+            f.write(struct.pack("<Q", len(packed)))
+            for tag, typ, count, data, value in packed:
+                f.write(struct.pack("<HHQ", tag, typ, count))
+                f.write(data if data is not None else struct.pack("<Q", value))
+            f.write(struct.pack("<Q", 0))
+            f.seek(0)
+            f.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, ifd_offset))
+        else:
+            if ifd_offset > 0xFFFFFFFF:
+                raise ValueError("Fichier trop volumineux pour un TIFF classique, utiliser bigtiff=True.")
+            f.write(struct.pack("<H", len(packed)))
+            for tag, typ, count, data, value in packed:
+                f.write(struct.pack("<HHI", tag, typ, count))
+                f.write(data if data is not None else struct.pack("<I", value))
+            f.write(struct.pack("<I", 0))
+            f.seek(0)
+            f.write(b"II" + struct.pack("<HI", 42, ifd_offset))
+
+
+def write_tiff(image, output_path, compression="deflate", level=None, predictor=True,
+               icc_profile=None, dpi=None, rows_per_strip=None, workers=None, bigtiff=None):
+    """
+    Enregistre une image Pillow en TIFF avec compression parallèle des bandes.
+
+    Args:
+        image (PIL.Image): image L, RGB, RGBA ou CMYK.
+        output_path (str): chemin du TIFF de sortie.
+        compression (str): "none", "deflate" ou "zstd".
+        level (int): niveau de compression (deflate / zstd).
+        predictor (bool): prédicteur horizontal (meilleur ratio sur les photos).
+        icc_profile (bytes): profil ICC à intégrer.
+        dpi (tuple): résolution (x, y) en pixels par pouce.
+        workers (int): nombre de threads de compression (défaut : budget de threads du processus).
+
+    Returns:
+        str: chemin du fichier écrit.
+    """
+    writer = TiffWriter(output_path, image.width, image.height, image.mode, compression, level,
+                        predictor, icc_profile, dpi, rows_per_strip, workers, bigtiff)
+    strips = (image.crop(box).tobytes() for box in writer.strip_boxes())
+    return writer.write_strips(strips)
+
+
+def to_writable_mode(image):
+    """
+    Convertit une image Pillow vers un mode 8 bits écrit par TiffWriter (L, RGB, RGBA, CMYK).
+    Les images 16 bits sont ramenées à 8 bits, les palettes développées, le Lab converti en sRGB.
+    """
+    mode = image.mode
+    if mode in PHOTOMETRIC:
+        return image
+    if mode.startswith("I;16") or mode in ("I", "F"):
+        arr = np.asarray(image)
+        if mode.startswith("I;16") or arr.max(initial=0) > 255:
+            arr = np.clip(arr, 0, 65535) / 257
+        return Image.fromarray(np.clip(np.rint(arr), 0, 255).astype(np.uint8), "L")
+    if mode == "LAB":
+        transform = ImageCms.buildTransform(ImageCms.createProfile("LAB"), ImageCms.createProfile("sRGB"),
+                                            "LAB", "RGB")
+        return ImageCms.applyTransform(image, transform)
+    if mode == "1":
+        return image.convert("L")
+    if mode in ("LA", "PA", "RGBa", "La") or (mode == "P" and "transparency" in image.info):
+        return image.convert("RGBA")
+    return image.convert("RGB")
+
+
+def save_tiff(image, output_path, use="delivery", **kwargs):
+    """
+    Enregistre un TIFF avec le codec adapté à l'usage ("scratch", "intermediate", "delivery").
+    Les arguments explicites (compression, level, ...) priment sur le profil.
+    """
+    if use not in TIFF_PROFILES:
+        raise ValueError(f"Usage inconnu '{use}'. Choisir parmi {list(TIFF_PROFILES)}.")
+    options = dict(TIFF_PROFILES[use])
+    options.update(kwargs)
+    return write_tiff(image, output_path, **options)
+
+
+# ============================================================================
+# Lecture en flux (bande par bande, sans charger l'image entière)
+# ============================================================================
+
+def _packbits_decode(data, row_bytes, rows):
+    """Décodeur PackBits (compression 32773) de Pillow, en C."""
+    return Image.frombytes("L", (row_bytes, rows), data, "packbits", "L").tobytes()
+
+
+def _zstd_decode(data, row_bytes, rows):
+    if zstandard is None:
+        raise RuntimeError("Le codec ZSTD nécessite le paquet 'zstandard'.")
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+# Décodeurs de bande natifs (zlib, zstd, Pillow), appelés avec (data, row_bytes, rows).
+# Le LZW n'a pas de décodeur C utilisable par bande : ces TIFF passent par Pillow/libtiff.
+_DECODERS = {
+    1: lambda data, row_bytes, rows: data,
+    8: lambda data, row_bytes, rows: zlib.decompress(data),
+    32946: lambda data, row_bytes, rows: zlib.decompress(data),
+    32773: _packbits_decode,
+    50000: _zstd_decode,
+}
+
+# (Photometric, SamplesPerPixel) -> mode Pillow
+_MODES = {(1, 1): "L", (2, 3): "RGB", (2, 4): "RGBA", (5, 4): "CMYK"}
+
+_READ_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8,
+               16: 8, 17: 8, 18: 8}
+_READ_FORMATS = {1: "B", 2: "B", 3: "H", 4: "I", 5: "I", 6: "b", 7: "B", 8: "h", 9: "i",
+                 10: "i", 11: "f", 12: "d", 16: "Q", 17: "q", 18: "Q"}
+
+
+class TiffReader:
+    """
+    Lit l'en-tête (premier IFD) d'un TIFF sans toucher aux pixels, puis décode
+    les bandes une à une à la demande.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            order = f.read(2)
+            if order not in (b"II", b"MM"):
+                raise ValueError(f"Fichier TIFF invalide : {path}")
+            self.endian = "<" if order == b"II" else ">"
+            magic = struct.unpack(self.endian + "H", f.read(2))[0]
+            self.bigtiff = magic == 43
+            if magic == 42:
+                ifd_offset = struct.unpack(self.endian + "I", f.read(4))[0]
+            elif self.bigtiff:
+                f.read(4)
+                ifd_offset = struct.unpack(self.endian + "Q", f.read(8))[0]
+            else:
+                raise ValueError(f"Fichier TIFF invalide : {path}")
+            self.tags = self._read_ifd(f, ifd_offset)
+
+        tag = self.tags.get
+        self.width = tag(256, [0])[0]
+        self.height = tag(257, [0])[0]
+        bits = tag(258, [1])
+        self.bits = bits[0]
+        self.compression = tag(259, [1])[0]
+        self.photometric = tag(262, [None])[0]
+        self.samples = tag(277, [1])[0]
+        self.rows_per_strip = min(tag(278, [self.height])[0], self.height) or self.height
+        self.strip_offsets = tag(273, [])
+        self.strip_counts = tag(279, [])
+        self.planar = tag(284, [1])[0]
+        self.predictor = tag(317, [1])[0]
+        self.tiled = 322 in self.tags
+        self.mode = _MODES.get((self.photometric, self.samples))
+        icc = tag(34675)
+        self.icc_profile = bytes(icc) if icc else None
+        self.dpi = None
+        if 282 in self.tags and 283 in self.tags:
+            x, y = self.tags[282][0], self.tags[283][0]
+            factor = 2.54 if tag(296, [2])[0] == 3 else 1.0
+            if x[1] and y[1]:
+                self.dpi = (x[0] / x[1] * factor, y[0] / y[1] * factor)
+
+    def _read_ifd(self, f, offset):
+        e = self.endian
+        f.seek(offset)
+        if self.bigtiff:
+            count = struct.unpack(e + "Q", f.read(8))[0]
+            entry_fmt, inline = e + "HHQ", 8
+        else:
+            count = struct.unpack(e + "H", f.read(2))[0]
+            entry_fmt, inline = e + "HHI", 4
+        entry_size = struct.calcsize(entry_fmt) + inline
+        raw_entries = [f.read(entry_size) for _ in range(count)]
+
+        tags = {}
+        for raw in raw_entries:
+            tag, typ, n = struct.unpack(entry_fmt, raw[:-inline])
+            if typ not in _READ_SIZES:
+                continue
+            size = _READ_SIZES[typ] * n
+            if size > inline:
+                pointer = struct.unpack(e + ("Q" if self.bigtiff else "I"), raw[-inline:])[0]
+                f.seek(pointer)
+                data = f.read(size)
+            else:
+                data = raw[-inline:][:size]
+            if typ in (2, 7):
+                tags[tag] = data
+            else:
+                values = struct.unpack(f"{e}{n * (2 if typ in (5, 10) else 1)}{_READ_FORMATS[typ]}", data)
+                if typ in (5, 10):
+                    values = [tuple(values[i:i + 2]) for i in range(0, len(values), 2)]
+                tags[tag] = list(values)
+        return tags
+
+    @property
+    def streamable(self):
+        """
+        True si les bandes peuvent être décodées en flux par un codec natif
+        (8 bits, contigu, sans tuiles, compression sans LZW).
+        """
+        return (self.mode is not None and self.bits == 8 and self.planar == 1 and not self.tiled
+                and self.compression in _DECODERS and self.predictor in (1, 2)
+                and (self.compression != 50000 or zstandard is not None)
+                and len(self.strip_offsets) == len(self.strip_counts) > 0)
+
+    def iter_strips(self):
+        """Génère les bandes décodées (bytes), de haut en bas."""
+        if not self.streamable:
+            raise ValueError(f"TIFF non lisible en flux (compression {self.compression}, "
+                             f"{self.bits} bits, tuiles={self.tiled}) : {self.path}")
+        decode = _DECODERS[self.compression]
+        row_bytes = self.width * self.samples
+        with open(self.path, "rb") as f:
+            for i, (offset, count) in enumerate(zip(self.strip_offsets, self.strip_counts)):
+                rows = min(self.rows_per_strip, self.height - i * self.rows_per_strip)
+                f.seek(offset)
+                raw = decode(f.read(count), row_bytes, rows)[:rows * row_bytes]
+                if self.predictor == 2:
+                    arr = np.frombuffer(raw, dtype=np.uint8).reshape(rows, self.width, self.samples)
+                    raw = np.cumsum(arr, axis=1, dtype=np.uint8).tobytes()
+                yield raw
+
+
+def is_streamable(path):
+    """True si open_strips lira ce fichier en flux, sans charger l'image entière."""
+    try:
+        return TiffReader(path).streamable
+    except (ValueError, OSError, struct.error):
+        return False
+
+
+def open_strips(path, rows_per_chunk=256):
+    """
+    Ouvre une image pour une lecture bande par bande.
+    Les TIFF compatibles sont décodés en flux ; les autres (LZW, tuiles, 16 bits...)
+    et les autres formats passent par Pillow (image chargée une fois, puis découpée).
+
+    Returns:
+        tuple: (infos, générateur de bandes brutes) où infos contient
+               width, height, mode, dpi, icc_profile et streamed.
+    """
+    try:
+        reader = TiffReader(path)
+    except ValueError:
+        reader = None
+    if reader is not None and reader.streamable:
+        info = {"width": reader.width, "height": reader.height, "mode": reader.mode,
+                "dpi": reader.dpi, "icc_profile": reader.icc_profile, "streamed": True}
+        return info, reader.iter_strips()
+
+    img = Image.open(path)
+    info = {"width": img.width, "height": img.height, "mode": img.mode,
+            "dpi": img.info.get("dpi"), "icc_profile": img.info.get("icc_profile"), "streamed": False}
+
+    def chunks():
+        with img:
+            for top in range(0, img.height, rows_per_chunk):
+                yield img.crop((0, top, img.width, min(top + rows_per_chunk, img.height))).tobytes()
+    return info, chunks()
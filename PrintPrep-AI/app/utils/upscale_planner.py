@@ -0,0 +1,129 @@
+# Choix de la chaîne d'upscaling la moins coûteuse pour atteindre le DPI recommandé
+import math
+import os
+from app.utils.upscaling_realesrgan import upscale_image_realesrgan
+from app.utils.backend import upscale_lanczos
+
+# Facteurs proposés par le modèle RealESRGAN
+AI_SCALES = (2, 4)
+
+# Au-delà de ce facteur, l'interpolation Lanczos seule dégrade visiblement l'image
+LANCZOS_MAX_SCALE = 1.5
+
+# Écart toléré au-dessus de la cible avant de réduire (trim) le résultat IA
+TRIM_TOLERANCE = 1.05
+
+# Ancien comportement de /upscale, utilisé comme référence pour les économies
+BASELINE_SCALE = 6
+
+# Coûts estimés en secondes par mégapixel produit
+AI_SECONDS_PER_MP = 1.5
+LANCZOS_SECONDS_PER_MP = 0.08
+# Étapes suivantes (amélioration, CMJN, PDF) : coût par mégapixel final
+DOWNSTREAM_SECONDS_PER_MP = 0.6
+
+
+def _mp(width, height):
+    return width * height / 1e6
+
+
+def _step_cost(step):
+    rate = AI_SECONDS_PER_MP if step["method"] == "ai" else LANCZOS_SECONDS_PER_MP
+    return _mp(*step["output_size"]) * rate
+
+
+def _candidates(width, height, factor, target):
+    """Génère les chaînes possibles atteignant la taille cible."""
+    if factor <= 1.0:
+        yield "no-op", []
+        return
+
+    if factor <= LANCZOS_MAX_SCALE:
+        yield "lanczos", [{"method": "lanczos", "scale": factor, "output_size": target}]
+
+    for scale in AI_SCALES:
+        if scale < factor:
+            continue
+        ai_size = (width * scale, height * scale)
+        steps = [{"method": "ai", "scale": scale, "output_size": ai_size}]
+        if scale / factor > TRIM_TOLERANCE:
+            steps.append({"method": "lanczos", "scale": factor / scale, "output_size": target})
+            yield f"ai_x{scale}+trim", steps
+        else:
+            yield f"ai_x{scale}", steps
+
+    top = max(AI_SCALES)
+    if factor > top:
+        ai_size = (width * top, height * top)
+        if factor / top <= LANCZOS_MAX_SCALE:
+            yield f"ai_x{top}+lanczos", [
+                {"method": "ai", "scale": top, "output_size": ai_size},
+                {"method": "lanczos", "scale": factor / top, "output_size": target},
+            ]
+        else:
+            # Facteur hors des modèles : sortie IA directe au facteur entier supérieur
+            scale = math.ceil(factor)
+            yield f"ai_x{scale}+trim", [
+                {"method": "ai", "scale": scale, "output_size": (width * scale, height * scale)},
+                {"method": "lanczos", "scale": factor / scale, "output_size": target},
+            ]
+
+
+def plan_upscale(check_results):
+    """
+    Choisit la chaîne d'upscaling la moins coûteuse à partir du résultat de check_upscale.
+
+    Args:
+        check_results (dict): retour de dpi_check.check_upscale.
+
+    Returns:
+        dict: chaîne retenue (steps), taille finale et économies par rapport à l'upscale x6.
+    """
+    width = check_results["Image width (px)"]
+    height = check_results["Image height (px)"]
+    factor = check_results["Upscale factor suggested"]
+    target = (math.ceil(width * factor), math.ceil(height * factor)) if factor > 1.0 else (width, height)
+
+    best = None
+    for name, steps in _candidates(width, height, factor, target):
+        final_size = steps[-1]["output_size"] if steps else (width, height)
+        seconds = sum(_step_cost(s) for s in steps) + _mp(*final_size) * DOWNSTREAM_SECONDS_PER_MP
+        if best is None or seconds < best["estimated_seconds"]:
+            best = {"chain": name, "steps": steps, "final_size": final_size, "estimated_seconds": seconds}
+
+    baseline_size = (width * BASELINE_SCALE, height * BASELINE_SCALE)
+    baseline_seconds = (_mp(*baseline_size) * AI_SECONDS_PER_MP
+                        + _mp(*baseline_size) * DOWNSTREAM_SECONDS_PER_MP)
+    final_px = best["final_size"][0] * best["final_size"][1]
+    baseline_px = baseline_size[0] * baseline_size[1]
+
+    return {
+        "support_type": check_results.get("Support type"),
+        "recommended_dpi": check_results.get("Recommended DPI"),
+        "factor_needed": factor,
+        "chain": best["chain"],
+        "steps": best["steps"],
+        "final_size": best["final_size"],
+        "estimated_seconds": round(best["estimated_seconds"], 1),
+        "baseline_size": baseline_size,
+        "baseline_seconds": round(baseline_seconds, 1),
+        "pixels_saved_pct": round(100 * (1 - final_px / baseline_px), 1),
+        "time_saved_seconds": round(baseline_seconds - best["estimated_seconds"], 1),
+    }
+
+
+def execute_plan(plan, image_path, output_dir):
+    """
+    Exécute les étapes d'un plan et retourne le chemin de l'image finale.
+    Sans étape (no-op), l'image d'origine est retournée telle quelle.
+    """
+    current = image_path
+    for step in plan["steps"]:
+        if step["method"] == "ai":
+            current = upscale_image_realesrgan(current, output_dir, outscale=step["scale"])
+        else:
+            name, ext = os.path.splitext(os.path.basename(current))
+            output_path = os.path.join(output_dir, f"{name}_lanczos{ext}")
+            upscale_lanczos(current, output_path, target_size=step["output_size"])
+            current = output_path
+    return current
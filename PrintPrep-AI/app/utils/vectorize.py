@@ -0,0 +1,303 @@
+# Vectorisation des visuels simples (logos, aplats) : quantification, contours, courbes de Bézier
+from PIL import Image, ImageCms
+import numpy as np
+import cv2
+import time
+import os
+from app.utils.pdf_writer import PdfXWriter, DEFAULT_DPI
+
+Image.MAX_IMAGE_PIXELS = None
+
+# Taille maximale de travail : au-delà, l'image est réduite avant le tracé
+# (le résultat vectoriel ne dépend plus de la résolution)
+TRACE_MAX_DIM = 2000
+
+# Pixels échantillonnés pour le K-Means
+KMEANS_SAMPLE = 100_000
+
+# Tolérance de simplification des contours (px de l'image de travail)
+SIMPLIFY_TOLERANCE = 1.0
+
+# Changement de direction (degrés) au-delà duquel un sommet est un angle vif
+CORNER_ANGLE = 60
+
+# Surface minimale d'une zone ou d'un trou (px) ; en dessous c'est du bruit
+MIN_REGION_AREA = 12
+
+
+def _num(value):
+    """Coordonnée compacte (2 décimales, sans zéros superflus)."""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def load_working_image(image_path, max_dim=TRACE_MAX_DIM):
+    """
+    Charge l'image en RGB (+ masque d'opacité) réduite à max_dim.
+
+    Returns:
+        tuple: (rgb uint8 HxWx3, opaque bool HxW, taille d'origine, dpi)
+    """
+    with Image.open(image_path) as img:
+        original_size = img.size
+        dpi = img.info.get("dpi")
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        if max(img.size) > max_dim:
+            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+        data = np.asarray(img)
+
+    rgb = np.ascontiguousarray(data[:, :, :3])
+    opaque = data[:, :, 3] > 127 if has_alpha else np.ones(rgb.shape[:2], dtype=bool)
+    return rgb, opaque, original_size, dpi
+
+
+def quantize_colors(rgb, opaque, n_colors=8):
+    """
+    Réduit l'image à n_colors couleurs (K-Means sur un échantillon, puis
+    affectation de chaque pixel à la couleur la plus proche).
+
+    Returns:
+        tuple: (labels uint8 HxW, 255 = transparent ; palette uint8 Kx3)
+    """
+    samples = rgb[opaque]
+    if len(samples) == 0:
+        raise ValueError("L'image est entièrement transparente.")
+    if len(samples) > KMEANS_SAMPLE:
+        rng = np.random.default_rng(0)
+        samples = samples[rng.choice(len(samples), KMEANS_SAMPLE, replace=False)]
+    k = int(min(n_colors, len(np.unique(samples, axis=0))))
+
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.5)
+    _, _, centers = cv2.kmeans(samples.astype(np.float32), k, None, criteria, 3, cv2.KMEANS_PP_CENTERS)
+
+    # Affectation par blocs de lignes : |p - c|² = |p|² - 2 p·c + |c|²
+    height = rgb.shape[0]
+    labels = np.empty(rgb.shape[:2], dtype=np.uint8)
+    center_norms = (centers ** 2).sum(axis=1)
+    for y in range(0, height, 256):
+        block = rgb[y:y + 256].reshape(-1, 3).astype(np.float32)
+        distances = center_norms[None, :] - 2 * block @ centers.T
+        labels[y:y + 256] = distances.argmin(axis=1).reshape(-1, rgb.shape[1])
+    labels[~opaque] = 255
+
+    # Filtre médian : supprime les pixels isolés (anti-crénelage, bruit JPEG)
+    labels = cv2.medianBlur(labels, 3)
+    return labels, np.clip(centers.round(), 0, 255).astype(np.uint8)
+
+
+def fit_bezier(points):
+    """
+    Convertit un polygone fermé (sommets simplifiés) en segments :
+    droits entre deux angles vifs, courbes de Bézier cubiques (Catmull-Rom) ailleurs.
+
+    Returns:
+        list: ("L", fin) ou ("C", contrôle 1, contrôle 2, fin), après un départ implicite en points[0].
+    """
+    p = points.astype(np.float64)
+    n = len(p)
+    incoming = p - np.roll(p, 1, axis=0)
+    outgoing = np.roll(p, -1, axis=0) - p
+    cos_turn = (incoming * outgoing).sum(axis=1) / (
+        np.linalg.norm(incoming, axis=1) * np.linalg.norm(outgoing, axis=1) + 1e-9)
+    corner = cos_turn < np.cos(np.radians(CORNER_ANGLE))
+
+    segments = []
+    for i in range(n):
+        p0, p1, p2, p3 = p[i - 1], p[i], p[(i + 1) % n], p[(i + 2) % n]
+        if corner[i] and corner[(i + 1) % n]:
+            segments.append(("L", p2))
+            continue
+        c1 = p1 + (p2 - p1) / 3 if corner[i] else p1 + (p2 - p0) / 6
+        c2 = p2 - (p2 - p1) / 3 if corner[(i + 1) % n] else p2 - (p3 - p1) / 6
+        segments.append(("C", c1, c2, p2))
+    return segments
+
+
+def trace_layers(labels, opaque, tolerance=SIMPLIFY_TOLERANCE, min_area=MIN_REGION_AREA):
+    """
+    Trace les zones de chaque couleur en contours (trous compris) simplifiés puis lissés.
+
+    Les couleurs sont empilées de la plus étendue à la plus petite. Si l'image est
+    opaque, la première sert de fond (rectangle) ; les suivantes sont dilatées d'un
+    pixel pour recouvrir les jointures entre zones voisines.
+
+    Returns:
+        tuple: (indice de la couleur de fond ou None, liste de (indice couleur, contours))
+    """
+    indices, counts = np.unique(labels[labels != 255], return_counts=True)
+    order = [int(i) for i in indices[np.argsort(-counts)]]
+    background = order[0] if opaque.all() else None
+    kernel = np.ones((3, 3), np.uint8)
+    opaque_u8 = opaque.astype(np.uint8)
+
+    layers = []
+    for position, index in enumerate(order):
+        if index == background:
+            continue
+        mask = (labels == index).astype(np.uint8)
+        if position > 0:
+            mask = cv2.dilate(mask, kernel) & opaque_u8
+
+        # RETR_CCOMP : contours extérieurs et trous ; en remplissage pair-impair,
+        # les îlots dans les trous redeviennent pleins
+        contours, _ = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
+        paths = []
+        for contour in contours:
+            if abs(cv2.contourArea(contour)) < min_area:
+                continue
+            simplified = cv2.approxPolyDP(contour, tolerance, True).reshape(-1, 2)
+            if len(simplified) < 3:
+                continue
+            # Coordonnées au centre des pixels
+            start = simplified[0] + 0.5
+            paths.append((start, fit_bezier(simplified + 0.5)))
+        if paths:
+            layers.append((index, paths))
+    return background, layers
+
+
+def _path_data(paths, scale, move, line, curve, close):
+    """Écrit les contours dans la syntaxe SVG ou PDF (opérateurs fournis)."""
+    parts = []
+    for start, segments in paths:
+        parts.append(move(start * scale))
+        for segment in segments:
+            if segment[0] == "L":
+                parts.append(line(segment[1] * scale))
+            else:
+                parts.append(curve(segment[1] * scale, segment[2] * scale, segment[3] * scale))
+        parts.append(close)
+    return parts
+
+
+def write_svg(output_svg, palette, background, layers, size, scale, width_m=None, height_m=None):
+    """Écrit le SVG (viewBox en pixels de l'image d'origine, dimensions physiques si fournies)."""
+    width, height = size
+    if width_m and height_m:
+        dims = f'width="{_num(width_m * 1000)}mm" height="{_num(height_m * 1000)}mm"'
+    else:
+        dims = f'width="{width}" height="{height}"'
+
+    def hex_color(index):
+        return "#" + "".join(f"{c:02x}" for c in palette[index])
+
+    with open(output_svg, "w", encoding="utf-8") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" {dims} '
+                f'viewBox="0 0 {width} {height}">\n')
+        if background is not None:
+            f.write(f'<rect width="{width}" height="{height}" fill="{hex_color(background)}"/>\n')
+        for index, paths in layers:
+            d = "".join(_path_data(
+                paths, scale,
+                move=lambda p: f"M{_num(p[0])} {_num(p[1])}",
+                line=lambda p: f"L{_num(p[0])} {_num(p[1])}",
+                curve=lambda a, b, c: f"C{_num(a[0])} {_num(a[1])} {_num(b[0])} {_num(b[1])} {_num(c[0])} {_num(c[1])}",
+                close="Z"))
+            f.write(f'<path fill="{hex_color(index)}" fill-rule="evenodd" d="{d}"/>\n')
+        f.write("</svg>\n")
+
+
+def palette_to_cmyk(palette, cmyk_profile_path):
+    """Convertit la palette sRGB en CMJN (0-1) avec le profil ICC d'impression."""
+    rgb_profile = ImageCms.createProfile("sRGB")
+    cmyk_profile = ImageCms.getOpenProfile(cmyk_profile_path)
+    transform = ImageCms.buildTransform(rgb_profile, cmyk_profile, "RGB", "CMYK")
+    swatch = Image.fromarray(palette.reshape(1, -1, 3), "RGB")
+    cmyk = np.asarray(ImageCms.applyTransform(swatch, transform)).reshape(-1, 4)
+    return cmyk / 255.0
+
+
+def write_pdf(output_pdf, icc_profile_path, palette, background, layers, size, scale, page_size):
+    """Écrit un PDF/X-1a vectoriel : aplats DeviceCMYK, OutputIntent du profil ICC."""
+    width, height = size
+    page_w, page_h = page_size
+    cmyk = palette_to_cmyk(palette, icc_profile_path)
+
+    def fill(index):
+        return " ".join(_num(c) for c in cmyk[index]) + " k"
+
+    # Repère en pixels, origine en haut à gauche comme dans l'image
+    lines = [f"q {page_w / width:.6f} 0 0 {-page_h / height:.6f} 0 {_num(page_h)} cm"]
+    if background is not None:
+        lines.append(f"{fill(background)} 0 0 {width} {height} re f")
+    for index, paths in layers:
+        lines.append(fill(index))
+        lines.extend(_path_data(
+            paths, scale,
+            move=lambda p: f"{_num(p[0])} {_num(p[1])} m",
+            line=lambda p: f"{_num(p[0])} {_num(p[1])} l",
+            curve=lambda a, b, c: f"{_num(a[0])} {_num(a[1])} {_num(b[0])} {_num(b[1])} {_num(c[0])} {_num(c[1])} c",
+            close="h"))
+        lines.append("f*")
+    lines.append("Q")
+
+    with PdfXWriter(output_pdf, icc_profile_path, title="Export vectoriel") as pdf:
+        pdf.add_vector_page(page_w, page_h, "\n".join(lines).encode("ascii"))
+
+
+def vectorize_image(image_path, output_svg, output_pdf=None, icc_profile_path=None, n_colors=8,
+                    width_m=None, height_m=None, tolerance=SIMPLIFY_TOLERANCE, max_dim=TRACE_MAX_DIM):
+    """
+    Vectorise une image à aplats (logo, pictogramme) en SVG et, si demandé, en PDF/X-1a.
+
+    Args:
+        image_path (str): image source.
+        output_svg (str): chemin du SVG.
+        output_pdf (str): chemin du PDF/X-1a vectoriel (optionnel, nécessite icc_profile_path).
+        icc_profile_path (str): profil CMJN pour les couleurs et l'OutputIntent du PDF.
+        n_colors (int): nombre maximal de couleurs.
+        width_m, height_m (float): format d'impression ; sinon déduit du DPI de l'image.
+        tolerance (float): simplification des contours en pixels.
+        max_dim (int): taille maximale de l'image de travail.
+
+    Returns:
+        dict: fichiers produits, nombre de couleurs, chemins et nœuds, tailles, durée.
+    """
+    if output_pdf and not icc_profile_path:
+        raise ValueError("Un profil ICC CMJN est requis pour l'export PDF/X-1a.")
+    start = time.perf_counter()
+
+    rgb, opaque, size, dpi = load_working_image(image_path, max_dim)
+    scale = size[0] / rgb.shape[1]
+    print(f"[INFO] Vectorisation de {os.path.basename(image_path)} ({rgb.shape[1]}x{rgb.shape[0]}px de travail)")
+
+    labels, palette = quantize_colors(rgb, opaque, n_colors)
+    background, layers = trace_layers(labels, opaque, tolerance)
+
+    write_svg(output_svg, palette, background, layers, size, scale, width_m, height_m)
+
+    if output_pdf:
+        if width_m and height_m:
+            page_size = (width_m / 0.0254 * 72, height_m / 0.0254 * 72)
+        else:
+            if not dpi or dpi[0] <= 0 or dpi[1] <= 0:
+                dpi = (DEFAULT_DPI, DEFAULT_DPI)
+            dpi_x, dpi_y = dpi
+            page_size = (size[0] * 72.0 / dpi_x, size[1] * 72.0 / dpi_y)
+        write_pdf(output_pdf, icc_profile_path, palette, background, layers, size, scale, page_size)
+
+    result = {
+        "svg": output_svg,
+        "pdf": output_pdf,
+        "colors": len(palette),
+        "paths": sum(len(paths) for _, paths in layers) + (background is not None),
+        "nodes": sum(len(segments) for _, paths in layers for _, segments in paths),
+        "svg_bytes": os.path.getsize(output_svg),
+        "pdf_bytes": os.path.getsize(output_pdf) if output_pdf else None,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    print(f"[✅] Vectorisation terminée : {result['colors']} couleurs, {result['paths']} chemins, "
+          f"SVG {result['svg_bytes'] / 1024:.1f} Ko")
+    return result
+
+
+if __name__ == "__main__":
+    vectorize_image(
+        "logo.png",
+        "logo_vector.svg",
+        output_pdf="logo_vector.pdf",
+        icc_profile_path="app/utils/profiles/CoatedFOGRA39.icc",
+        width_m=4.0,
+        height_m=3.0
+    )
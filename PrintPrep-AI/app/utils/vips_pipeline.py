@@ -0,0 +1,140 @@
+# Pipeline d'impression en un seul graphe libvips paresseux :
+# resize Lanczos -> accentuation -> conversion ICC -> TIFF (puis PDF/X-1a en flux)
+from pathlib import Path
+
+try:
+    import pyvips
+except (ImportError, OSError):  # pyvips ou libvips absent : backend indisponible
+    pyvips = None
+
+from app.utils.tiff_io import TIFF_PROFILES
+from app.utils.export_pdf_x1a import convert_tiff_to_pdfx1a
+
+# Accentuation appliquée par défaut (masque flou, rayon en pixels de sortie)
+SHARPEN_SIGMA = 1.0
+
+
+def vips_available():
+    """True si pyvips et libvips sont installés."""
+    return pyvips is not None
+
+
+def _require_vips():
+    if pyvips is None:
+        raise RuntimeError("Backend vips indisponible : installer pyvips (et libvips).")
+
+
+def tiff_options(use="delivery"):
+    """Options tiffsave équivalentes au profil tiff_io de cet usage."""
+    profile = TIFF_PROFILES[use]
+    options = {"compression": profile["compression"]}
+    if profile["compression"] in ("deflate", "zstd") and profile.get("level"):
+        options["level"] = profile["level"]
+    if profile.get("predictor"):
+        options["predictor"] = "horizontal"
+    return options
+
+
+def build_graph(image_path, scale_factor=None, target_size=None, sharpen=False, cmyk_profile_path=None):
+    """
+    Construit le graphe d'opérations sans rien calculer.
+
+    La source est ouverte en accès séquentiel : libvips ne décode que les lignes
+    nécessaires aux bandes en cours, réparties sur ses threads (VIPS_CONCURRENCY).
+
+    Args:
+        image_path (str): image source.
+        scale_factor (float) / target_size (tuple): redimensionnement Lanczos (optionnel).
+        sharpen (bool): accentuation (masque flou) après redimensionnement.
+        cmyk_profile_path (str): conversion ICC sRGB -> CMJN (optionnelle).
+
+    Returns:
+        pyvips.Image: image paresseuse.
+    """
+    _require_vips()
+    image = pyvips.Image.new_from_file(str(image_path), access="sequential")
+
+    # Couche alpha : aplatie sur fond blanc (l'impression n'a pas de transparence)
+    if image.hasalpha():
+        image = image.flatten(background=[255] * (image.bands - 1))
+
+    if scale_factor or target_size:
+        # Mêmes dimensions que le backend Pillow (arrondi inférieur pour scale_factor)
+        width, height = target_size or (int(image.width * scale_factor), int(image.height * scale_factor))
+        image = image.resize(width / image.width, vscale=height / image.height, kernel="lanczos3")
+        if (image.width, image.height) != (width, height):
+            # Écart d'un pixel dû à l'arrondi de libvips
+            image = image.embed(0, 0, width, height, extend="copy")
+
+    if sharpen:
+        image = image.sharpen(sigma=SHARPEN_SIGMA)
+
+    if cmyk_profile_path:
+        image = image.icc_transform(str(Path(cmyk_profile_path).resolve()), input_profile="srgb",
+                                    intent="perceptual", embedded=True)
+    return image
+
+
+def save_graph(image, output_path, tiff_use="delivery"):
+    """
+    Évalue le graphe en l'écrivant : TIFF (compression selon l'usage tiff_io),
+    ou tout format reconnu par libvips (JPEG, PNG...) d'après l'extension.
+    """
+    _require_vips()
+    if Path(output_path).suffix.lower() in (".tif", ".tiff"):
+        image.tiffsave(str(output_path), bigtiff=image.width * image.height * image.bands > 0xF0000000,
+                       **tiff_options(tiff_use))
+    else:
+        image.write_to_file(str(output_path))
+    return output_path
+
+
+def upscale_lanczos_vips(image_path, output_path, scale_factor=None, target_size=None):
+    """Équivalent vips de upscaling_with_Lanczos.upscale_lanczos."""
+    if not scale_factor and not target_size:
+        raise ValueError("Tu dois fournir scale_factor ou target_size")
+    image = build_graph(image_path, scale_factor=scale_factor, target_size=target_size)
+    if Path(output_path).suffix.lower() in (".jpg", ".jpeg"):
+        image.jpegsave(str(output_path), Q=100)
+    else:
+        save_graph(image, output_path)
+    print(f"Image redimensionnée en {image.width}x{image.height} avec Lanczos (vips) ✓")
+
+
+def convert_to_cmyk_vips(image_path, output_path, cmyk_profile_path="app/utils/profiles/USWebCoatedSWOP.icc",
+                         tile_size=None, tiff_use="delivery"):
+    """
+    Équivalent vips de color_conversion.convert_to_cmyk.
+    tile_size est ignoré : libvips découpe lui-même le travail en bandes.
+    """
+    print(f"[INFO] Conversion CMJN (vips) : {image_path}")
+    save_graph(build_graph(image_path, cmyk_profile_path=cmyk_profile_path), output_path, tiff_use)
+    print(f"[✅] Fichier enregistré : {output_path}")
+    return output_path
+
+
+def print_pipeline_vips(image_path, output_tiff, cmyk_profile_path, scale_factor=None, target_size=None,
+                        sharpen=True, output_pdf=None):
+    """
+    Resize + accentuation + CMJN + TIFF en une seule évaluation du graphe,
+    puis PDF/X-1a écrit en flux depuis ce TIFF (libvips ne produit pas de PDF).
+
+    Returns:
+        dict: fichiers produits et dimensions finales.
+    """
+    image = build_graph(image_path, scale_factor, target_size, sharpen, cmyk_profile_path)
+    print(f"▶ Pipeline vips : {image.width}x{image.height}px, {image.bands} canaux")
+    save_graph(image, output_tiff)
+    if output_pdf:
+        convert_tiff_to_pdfx1a(output_tiff, output_pdf, cmyk_profile_path)
+    return {"tiff": output_tiff, "pdf": output_pdf, "size": (image.width, image.height)}
+
+
+if __name__ == "__main__":
+    print_pipeline_vips(
+        "../temp_uploads/test.jpeg",
+        "../temp_uploads/test_print_vips.tiff",
+        "profiles/CoatedFOGRA39.icc",
+        scale_factor=4,
+        output_pdf="../temp_uploads/test_print_vips.pdf"
+    )
@@ -0,0 +1,68 @@
+"""
+Compare l'export PDF/X-1a en flux à l'ancienne conversion en mémoire (img2pdf + pikepdf).
+
+Usage (depuis PrintPrep-AI/) :
+    python -m benchmarks.bench_pdfx_export --width 8000 --height 6000
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from app.utils.export_pdf_x1a import convert_tiff_to_pdfx1a, convert_tiff_to_pdfx1a_img2pdf
+from app.utils.tiff_io import save_tiff
+from benchmarks.common import measure, print_table
+
+ICC_PROFILE = os.path.join("app", "utils", "profiles", "CoatedFOGRA39.icc")
+
+
+def make_cmyk_tiff(path, width, height):
+    """Crée un TIFF CMJN synthétique (dégradés + bruit) écrit bande par bande."""
+    rng = np.random.default_rng(0)
+    img = Image.new("CMYK", (width, height))
+    band = 512
+    x = np.arange(width, dtype=np.uint16)
+    for top in range(0, height, band):
+        rows = min(band, height - top)
+        y = np.arange(top, top + rows, dtype=np.uint16)[:, None]
+        base = ((x[None, :] + y) % 256).astype(np.uint8)
+        arr = np.stack([base, base[:, ::-1], (base // 2), np.full_like(base, 40)], axis=-1)
+        arr = arr + rng.integers(0, 6, arr.shape, dtype=np.uint8)
+        img.paste(Image.frombytes("CMYK", (width, rows), arr.tobytes()), (0, top))
+    save_tiff(img, path, use="delivery", dpi=(300, 300))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=6000)
+    parser.add_argument("--height", type=int, default=4000)
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tiff_path = make_cmyk_tiff(os.path.join(tmp, "bench.tiff"), args.width, args.height)
+        raw_mb = args.width * args.height * 4 / 1024**2
+        print(f"TIFF CMJN {args.width}x{args.height} ({raw_mb:.0f} Mo décompressé, "
+              f"{os.path.getsize(tiff_path) / 1024**2:.0f} Mo sur disque)\n")
+
+        rows = []
+        for name, fn in [("streaming", convert_tiff_to_pdfx1a), ("img2pdf+pikepdf", convert_tiff_to_pdfx1a_img2pdf)]:
+            for run in range(args.runs):
+                pdf_path = os.path.join(tmp, f"{name}.pdf")
+                r = measure(fn, tiff_path, pdf_path, ICC_PROFILE)
+                rows.append({
+                    "export": name,
+                    "run": run + 1,
+                    "seconds": f"{r['seconds']:.2f}",
+                    "peak_rss_mb": f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] else "n/a",
+                    "delta_rss_mb": f"{r['peak_rss_mb'] - r['baseline_rss_mb']:.0f}" if r["peak_rss_mb"] else "n/a",
+                    "pdf_mb": f"{os.path.getsize(pdf_path) / 1024**2:.1f}" if not r["error"] else r["error"],
+                })
+        print_table(rows, ["export", "run", "seconds", "peak_rss_mb", "delta_rss_mb", "pdf_mb"])
+
+
+if __name__ == "__main__":
+    main()
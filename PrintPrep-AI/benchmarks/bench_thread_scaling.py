@@ -0,0 +1,96 @@
+"""
+Courbe de montée en charge : débit d'un traitement type (OpenCV + BLAS + LittleCMS)
+selon le nombre de workers, avec et sans budget de threads natifs.
+
+Sans budget, chaque worker laisse OpenCV et BLAS lancer un thread par cœur :
+les cœurs sont sur-souscrits dès que plusieurs workers tournent en parallèle.
+
+Usage (depuis PrintPrep-AI/) :
+    python -m benchmarks.bench_thread_scaling --size 2048 --jobs 16
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.utils.thread_budget import detect_cpu_count, process_pool_options, threads_per_worker
+from benchmarks.common import print_table
+
+ICC_PROFILE = os.path.join("app", "utils", "profiles", "CoatedFOGRA39.icc")
+
+
+def workload(size):
+    """Un traitement représentatif : débruitage léger, accentuation, resize, BLAS, conversion CMJN."""
+    import cv2
+    import numpy as np
+    from PIL import Image, ImageCms
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 255, (size, size, 3), dtype=np.uint8)
+    img = cv2.GaussianBlur(img, (15, 15), 0)
+    img = cv2.filter2D(img, -1, np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]]))
+    img = cv2.resize(img, (size * 2, size * 2), interpolation=cv2.INTER_LANCZOS4)
+
+    matrix = rng.random((size // 2, size // 2))
+    matrix @ matrix
+
+    transform = ImageCms.buildTransform(ImageCms.createProfile("sRGB"), ImageCms.getOpenProfile(ICC_PROFILE),
+                                        "RGB", "CMYK")
+    ImageCms.applyTransform(Image.fromarray(img[:size, :size]), transform)
+    return size
+
+
+def _warmup(_):
+    # Laisse le temps à tous les workers de démarrer avant la mesure
+    time.sleep(0.5)
+
+
+def run_pool(pool_size, budgeted, jobs, size):
+    """Durée (s) de `jobs` traitements répartis sur pool_size processus."""
+    if budgeted:
+        options = process_pool_options(pool_size)
+    else:
+        options = {"max_workers": pool_size, "mp_context": multiprocessing.get_context("spawn")}
+    with ProcessPoolExecutor(**options) as pool:
+        list(pool.map(_warmup, range(pool_size)))
+        start = time.perf_counter()
+        list(pool.map(workload, [size] * jobs))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2048, help="côté de l'image de test (px)")
+    parser.add_argument("--jobs", type=int, default=16, help="traitements par mesure")
+    parser.add_argument("--max-workers", type=int, default=None, help="défaut : 2 x cœurs détectés")
+    args = parser.parse_args()
+
+    # Les workers « sans budget » ne doivent pas hériter de limites du shell
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.pop(name, None)
+
+    cpus = detect_cpu_count()
+    max_workers = args.max_workers or cpus * 2
+    pool_sizes = sorted({1, *[2 ** i for i in range(1, max_workers.bit_length()) if 2 ** i <= max_workers], max_workers})
+    print(f"{cpus} cœurs détectés, {args.jobs} traitements {args.size}x{args.size} par mesure\n")
+
+    rows = []
+    baseline = None
+    for pool_size in pool_sizes:
+        for budgeted in (False, True):
+            seconds = run_pool(pool_size, budgeted, args.jobs, args.size)
+            baseline = baseline or seconds
+            rows.append({
+                "workers": pool_size,
+                "policy": "budget" if budgeted else "unbounded",
+                "threads/worker": threads_per_worker(pool_size, cpus) if budgeted else cpus,
+                "seconds": f"{seconds:.2f}",
+                "jobs/s": f"{args.jobs / seconds:.2f}",
+                "speedup": f"{baseline / seconds:.2f}x",
+            })
+    print_table(rows, ["workers", "policy", "threads/worker", "seconds", "jobs/s", "speedup"])
+
+
+if __name__ == "__main__":
+    main()
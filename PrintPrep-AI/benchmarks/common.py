@@ -0,0 +1,61 @@
+# Outils partagés par les benchmarks : mesure du temps et du pic mémoire
+import multiprocessing as mp
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus courant (Mo), ou None si indisponible."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux : kilo-octets, macOS : octets
+        return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024**2
+    except (ImportError, AttributeError):
+        return None
+
+
+def _child(queue, fn, args, kwargs):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        fn(*args, **kwargs)
+        error = None
+    except Exception as e:
+        error = str(e)
+    queue.put({
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": peak_rss_mb(),
+        "baseline_rss_mb": baseline,
+        "error": error,
+    })
+
+
+def measure(fn, *args, **kwargs):
+    """
+    Exécute fn dans un processus neuf et retourne sa durée et son pic mémoire.
+    Un processus par mesure : le pic RSS d'un run ne pollue pas le suivant.
+    """
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(queue, fn, args, kwargs))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def print_table(rows, columns):
+    """Affiche une liste de dictionnaires sous forme de tableau."""
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
@@ -0,0 +1,314 @@
+"""
+Test de charge HTTP de bout en bout : des utilisateurs virtuels enchaînent le parcours
+upload -> check_print -> upscale -> enhance -> soft_proof -> convert_cmyk
+sur des images synthétiques de tailles réalistes, à plusieurs niveaux de concurrence.
+
+L'upscaler distant (RealESRGAN via Gradio) est remplacé par un stub local :
+latence simulée + agrandissement Lanczos plafonné (--stub-scale), pour mesurer
+l'application et non le réseau ni le service tiers.
+
+Rapporte, par niveau de concurrence et par route : p50 / p95 / p99, débit et taux d'erreur.
+--json enregistre les résultats pour comparer deux versions ou deux configurations.
+
+Usage (depuis PrintPrep-AI/) :
+    python -m benchmarks.load_test --users 1,2,4 --iterations 3 --sizes 1600x1200,3000x2000
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --users 8 --duration 60
+"""
+import argparse
+import glob
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+from PIL import Image, ImageDraw
+
+from benchmarks.common import print_table
+
+ROUTES = ("upload", "check_print", "upscale", "enhance", "soft_proof", "convert_cmyk")
+
+# Préfixe des fichiers créés dans temp_uploads/ (supprimés en fin de test)
+FILE_PREFIX = "loadtest_"
+
+ICC_PROFILE = "CoatedFOGRA39.icc"
+
+# Marqueurs d'une réponse HTML réussie : les pages d'erreur reviennent en 200
+# avec le gabarit précédent, sans ce titre
+SUCCESS_MARKERS = {
+    "upload": "Upscale Image",
+    "upscale": "Upscaling Complete",
+    "enhance": "Enhancement Complete",
+    "soft_proof": "Soft Proofing Preview",
+    "convert_cmyk": "CMYK Conversion Complete",
+}
+
+
+# ============================================================================
+# Serveur : application réelle avec upscaler stub
+# ============================================================================
+
+def install_upscaler_stub(latency, max_scale):
+    """Remplace l'appel RealESRGAN distant par un agrandissement local après `latency` secondes."""
+    import app.main
+    import app.utils.upscale_planner
+    import app.utils.upscaling_realesrgan
+
+    def upscale_stub(image_path, output_dir, outscale=2):
+        time.sleep(latency)
+        name, ext = os.path.splitext(os.path.basename(image_path))
+        output_path = os.path.join(output_dir, f"{name}_upscaled_x{outscale}{ext}")
+        scale = min(outscale, max_scale)
+        with Image.open(image_path) as img:
+            img.resize((int(img.width * scale), int(img.height * scale)), Image.LANCZOS).save(output_path, quality=95)
+        return output_path
+
+    for module in (app.main, app.utils.upscale_planner, app.utils.upscaling_realesrgan):
+        module.upscale_image_realesrgan = upscale_stub
+
+
+def serve(port, stub_latency, stub_scale):
+    import uvicorn
+    install_upscaler_stub(stub_latency, stub_scale)
+    from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(stub_latency, stub_scale, stats_db):
+    """Lance l'application dans un processus séparé (le client ne lui prend pas le GIL)."""
+    port = _free_port()
+    env = dict(os.environ, PRINTPREP_STATS_DB=stats_db)
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.load_test", "--serve", "--port", str(port),
+                                "--stub-latency", str(stub_latency), "--stub-scale", str(stub_scale)], env=env)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrêté au démarrage.")
+        try:
+            requests.get(url, timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError("Le serveur n'a pas démarré en 60 s.")
+
+
+# ============================================================================
+# Client : utilisateurs virtuels
+# ============================================================================
+
+def make_asset(path, width, height):
+    """Image type photo : dégradés, formes et grain (la compression JPEG reste réaliste)."""
+    rng = np.random.default_rng(width * height)
+    y, x = np.mgrid[0:height, 0:width]
+    arr = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    arr = np.clip(arr + rng.normal(0, 12, arr.shape), 0, 255).astype(np.uint8)
+    img = Image.fromarray(arr)
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        size = int(rng.integers(20, max(21, min(width, height) // 4)))
+        draw.ellipse((x0, y0, x0 + size, y0 + size), fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+    img.save(path, "JPEG", quality=90, dpi=(72, 72))
+    return path
+
+
+class Recorder:
+    """Latences et erreurs par route, partagées par les threads clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {route: [] for route in ROUTES}
+        self.errors = {route: 0 for route in ROUTES}
+        self.error_messages = {}
+
+    def add(self, route, seconds, error=None):
+        with self._lock:
+            self.samples[route].append(seconds)
+            if error:
+                self.errors[route] += 1
+                self.error_messages.setdefault(route, error)
+
+
+def _call(session, recorder, base_url, route, data, files=None, expect_json=False):
+    """POST une route, enregistre sa latence ; retourne la réponse ou None en cas d'erreur."""
+    start = time.perf_counter()
+    error = None
+    response = None
+    try:
+        response = session.post(f"{base_url}/{route}", data=data, files=files, timeout=600)
+        if response.status_code >= 400:
+            error = f"HTTP {response.status_code}"
+        elif expect_json and "error" in response.json():
+            error = response.json()["error"]
+        elif not expect_json and SUCCESS_MARKERS[route] not in response.text:
+            error = "page d'erreur"
+    except (requests.RequestException, ValueError) as e:
+        error = str(e)
+    recorder.add(route, time.perf_counter() - start, error)
+    return None if error else response
+
+
+def run_scenario(session, recorder, base_url, asset_path, name, support):
+    """Parcours complet d'un utilisateur ; s'arrête à la première étape en échec."""
+    width_m, height_m, support_type = support
+    with open(asset_path, "rb") as f:
+        if not _call(session, recorder, base_url, "upload", {}, files={"file": (name, f, "image/jpeg")}):
+            return False
+    print_data = {"filename": name, "width_m": width_m, "height_m": height_m, "support_type": support_type}
+    if not _call(session, recorder, base_url, "check_print", print_data, expect_json=True):
+        return False
+
+    upscaled = os.path.splitext(name)[0] + "_upscaled_x6.jpg"
+    if not _call(session, recorder, base_url, "upscale", {"filename": name}):
+        return False
+    if not _call(session, recorder, base_url, "enhance", {"filename": upscaled, "original_filename": name}):
+        return False
+    enhanced = f"enhanced_{upscaled}"
+    if not _call(session, recorder, base_url, "soft_proof",
+                 {"filename": enhanced, "original_filename": name, "icc_profile": ICC_PROFILE}):
+        return False
+    return bool(_call(session, recorder, base_url, "convert_cmyk", {"filename": enhanced, "icc_profile": ICC_PROFILE}))
+
+
+def run_level(base_url, users, assets, iterations, duration, support, tag):
+    """Lance `users` utilisateurs virtuels ; chacun enchaîne les parcours jusqu'à la fin du palier."""
+    recorder = Recorder()
+    completed = [0] * users
+    start = time.perf_counter()
+
+    def user(index):
+        session = requests.Session()
+        iteration = 0
+        while True:
+            if duration:
+                if time.perf_counter() - start >= duration:
+                    break
+            elif iteration >= iterations:
+                break
+            asset = assets[(index + iteration) % len(assets)]
+            name = f"{FILE_PREFIX}{tag}_u{index}_i{iteration}.jpg"
+            if run_scenario(session, recorder, base_url, asset, name, support):
+                completed[index] += 1
+            iteration += 1
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, sum(completed), time.perf_counter() - start
+
+
+def summarize(recorder, users, completed, seconds):
+    """Une ligne par route, plus le total, avec percentiles en secondes."""
+    rows = []
+    all_samples = []
+    for route in ROUTES:
+        samples = recorder.samples[route]
+        if not samples:
+            continue
+        all_samples += samples
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        rows.append({
+            "users": users, "route": route, "requests": len(samples),
+            "errors": recorder.errors[route], "error_pct": round(100 * recorder.errors[route] / len(samples), 1),
+            "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "req/s": round(len(samples) / seconds, 2),
+        })
+    total_errors = sum(recorder.errors.values())
+    if all_samples:
+        p50, p95, p99 = np.percentile(all_samples, [50, 95, 99])
+        rows.append({
+            "users": users, "route": "TOTAL", "requests": len(all_samples), "errors": total_errors,
+            "error_pct": round(100 * total_errors / len(all_samples), 1),
+            "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "req/s": round(len(all_samples) / seconds, 2),
+            "scenarios/s": round(completed / seconds, 3),
+        })
+    return rows
+
+
+def cleanup_uploads(upload_dir="temp_uploads"):
+    """Supprime les fichiers du test (upload et tous leurs dérivés : enhanced_, proof_, cmyk_...)."""
+    for path in glob.glob(os.path.join(upload_dir, f"*{FILE_PREFIX}*")):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="1,2,4", help="niveaux de concurrence, ex. 1,2,4,8")
+    parser.add_argument("--iterations", type=int, default=2, help="parcours par utilisateur et par palier")
+    parser.add_argument("--duration", type=float, default=None, help="durée d'un palier (s), remplace --iterations")
+    parser.add_argument("--sizes", default="1600x1200,3000x2000", help="tailles des images source")
+    parser.add_argument("--support", default="0.6,0.4,poster", help="largeur_m,hauteur_m,support pour check_print")
+    parser.add_argument("--stub-latency", type=float, default=1.0, help="latence simulée de l'upscaler (s)")
+    parser.add_argument("--stub-scale", type=float, default=2.0, help="agrandissement réel du stub (plafond)")
+    parser.add_argument("--url", help="serveur déjà lancé (sans stub : l'upscaler réel est appelé)")
+    parser.add_argument("--json", help="fichier où enregistrer les résultats")
+    parser.add_argument("--keep-files", action="store_true", help="garder les fichiers générés dans temp_uploads/")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.stub_latency, args.stub_scale)
+        return
+
+    width_m, height_m, support_type = args.support.split(",")
+    support = (float(width_m), float(height_m), support_type)
+    levels = [int(u) for u in args.users.split(",")]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        assets = []
+        for size in args.sizes.split(","):
+            width, height = (int(v) for v in size.lower().split("x"))
+            assets.append(make_asset(os.path.join(work_dir, f"asset_{width}x{height}.jpg"), width, height))
+
+        server = None
+        base_url = args.url
+        if not base_url:
+            # Mesures du test isolées de l'historique de débit du serveur (job_stats)
+            server, base_url = start_server(args.stub_latency, args.stub_scale,
+                                            os.path.join(work_dir, "job_stats.sqlite3"))
+        print(f"Cible {base_url}, images {args.sizes}, paliers {levels} utilisateurs\n")
+
+        rows = []
+        errors = {}
+        try:
+            for users in levels:
+                recorder, completed, seconds = run_level(base_url, users, assets, args.iterations,
+                                                         args.duration, support, f"c{users}")
+                rows += summarize(recorder, users, completed, seconds)
+                errors.update({f"{users}:{route}": message for route, message in recorder.error_messages.items()})
+                if not args.keep_files:
+                    cleanup_uploads()
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    print_table(rows, ["users", "route", "requests", "errors", "error_pct", "p50", "p95", "p99", "req/s",
+                       "scenarios/s"])
+    for key, message in errors.items():
+        print(f"[WARN] Première erreur {key} : {message[:200]}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": rows, "errors": errors}, f, indent=2)
+        print(f"\nRésultats enregistrés : {args.json}")
+
+
+if __name__ == "__main__":
+    main()